@@ -0,0 +1,53 @@
+"""Throughput of /process/batch against processing the same files one by one.
+
+Files are synthetic pieces with different seeds, so none of them is served from the result cache. Run from the
+backend directory with ``python -m benchmarks.bench_batch [files] [workers]``, workers default to the core count.
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+from benchmarks.common import make_config, midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.batch import process_batch
+from core.service.pipeline import process_midi
+from core.service.processing_pool import ProcessingPool
+from core.service.result_cache import ResultCache
+
+
+async def run_batch(files: list[tuple[str, bytes]], workers: int) -> float:
+    pool = ProcessingPool(workers, max_pending=4 * workers, task_timeout=600)
+    try:
+        # warm the workers up so process start-up is not counted
+        await asyncio.gather(*(pool.run(process_midi, make_config(), files[0][1]) for _ in range(workers)))
+        start = time.perf_counter()
+        async for _ in process_batch(make_config(), files, pool, ResultCache(0)):
+            pass
+        return time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    files = [
+        (f"{seed}.mid", midi_to_bytes(generate_midi(SyntheticSpec(notes=800, seed=seed))))
+        for seed in range(file_count)
+    ]
+
+    start = time.perf_counter()
+    for _, midi_bytes in files:
+        process_midi(make_config(), midi_bytes)
+    sequential = time.perf_counter() - start
+    batch = asyncio.run(run_batch(files, workers))
+
+    print(f"{file_count} files, {workers} workers")
+    print(f"one by one  {sequential:8.2f} s  {file_count / sequential:8.1f} files/s")
+    print(f"batch       {batch:8.2f} s  {file_count / batch:8.1f} files/s  {sequential / batch:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""Payload size and encode time of the JSON response against the columnar binary encoding.
+
+Run from the backend directory with ``python -m benchmarks.bench_columnar``.
+"""
+
+import os
+
+from benchmarks.common import example_midi_paths, make_config, measure, read_bytes
+from core.service.columnar import build_columnar_body, encode_columns
+from core.service.midi_processing import retrieve_information_from_midi, tokenize_midi_file
+from core.service.pipeline import build_response_body
+from core.service.serializer import serialize_notes, serialize_tokens
+
+TOKENIZERS = ["REMI", "CPWord"]
+
+
+def main() -> None:
+    print(
+        f"{'file':<16}{'tokenizer':<10}{'json [kB]':>11}{'columnar [kB]':>15}{'ratio':>7}"
+        f"{'json [ms]':>11}{'columnar [ms]':>15}"
+    )
+    for path in example_midi_paths():
+        midi_bytes = read_bytes(path)
+        metrics = retrieve_information_from_midi(midi_bytes).model_dump_json().encode("utf-8")
+        for tokenizer in TOKENIZERS:
+            tokens, notes = tokenize_midi_file(make_config(tokenizer=tokenizer), midi_bytes)
+
+            def encode_json() -> bytes:
+                return build_response_body(serialize_tokens(tokens), serialize_notes(notes), metrics)
+
+            def encode_columnar() -> bytes:
+                return build_columnar_body(encode_columns(tokens, notes), metrics)
+
+            json_size, columnar_size = len(encode_json()), len(encode_columnar())
+            print(
+                f"{os.path.basename(path):<16}{tokenizer:<10}{json_size / 1e3:>11.1f}{columnar_size / 1e3:>15.1f}"
+                f"{json_size / columnar_size:>6.1f}x{measure(encode_json) * 1e3:>11.2f}"
+                f"{measure(encode_columnar) * 1e3:>15.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Comparing several tokenizers on one file with /process/compare against one /process pipeline per tokenizer.
+
+Run from the backend directory with ``python -m benchmarks.bench_compare``.
+"""
+
+import os
+
+from benchmarks.common import example_midi_paths, make_config, measure, read_bytes
+from core.service.compare import compare_midi
+from core.service.pipeline import process_midi
+
+TOKENIZERS = ["REMI", "TSD", "MIDILike", "Structured", "CPWord", "Octuple", "PerTok"]
+
+
+def main() -> None:
+    configs = [make_config(tokenizer=tokenizer) for tokenizer in TOKENIZERS]
+    print(f"{len(configs)} tokenizers")
+    print(f"{'file':<16}{'/process [ms]':>15}{'compare [ms]':>14}{'speedup':>9}")
+    for path in example_midi_paths():
+        midi_bytes = read_bytes(path)
+        # builds every tokenizer once so only the processing is measured
+        compare_midi(configs, midi_bytes)
+        separate = measure(lambda: [process_midi(config, midi_bytes) for config in configs])
+        compared = measure(lambda: compare_midi(configs, midi_bytes))
+        print(
+            f"{os.path.basename(path):<16}{separate * 1e3:>15.1f}{compared * 1e3:>14.1f}{separate / compared:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
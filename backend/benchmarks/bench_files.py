@@ -0,0 +1,36 @@
+"""Config changes on a stored file against processing the whole upload again, as the UI does on every option flip.
+
+Every config flips one option of the default one. Results are not cached, so both paths tokenize every time. Run from
+the backend directory with ``python -m benchmarks.bench_files``.
+"""
+
+from benchmarks.common import make_config, measure, midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.files import file_id_for, tokenize_file
+from core.service.pipeline import process_midi
+
+SYNTHETIC_NOTES = 20_000
+CONFIG_CHANGES = [{}, {"use_chords": False}, {"num_velocities": 8}, {"use_rests": True}, {"tokenizer": "TSD"}]
+
+
+def main() -> None:
+    midi_bytes = midi_to_bytes(generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES)))
+    file_id = file_id_for(midi_bytes)
+    configs = [make_config(**changes) for changes in CONFIG_CHANGES]
+    for config in configs:
+        # the tokenizers are built once, the first stored call also parses the file
+        process_midi(config, midi_bytes)
+        tokenize_file(file_id, midi_bytes, config, True, [])
+
+    print(f"{SYNTHETIC_NOTES} notes, mean over {len(configs)} configs")
+    process = measure(lambda: [process_midi(config, midi_bytes) for config in configs], repeat=3) / len(configs)
+    print(f"/process                 {process * 1e3:9.1f} ms")
+    # notes and metrics are kept with the stored file after the first call, only the tokens are computed again
+    stored = measure(
+        lambda: [tokenize_file(file_id, midi_bytes, config, False, None) for config in configs], repeat=3
+    ) / len(configs)
+    print(f"/files/{{id}}/process      {stored * 1e3:9.1f} ms  {process / stored:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
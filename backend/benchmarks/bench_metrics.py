@@ -0,0 +1,46 @@
+"""The five muspy metrics of ``retrieve_metrics`` called one after another against the vectorized engine.
+
+Besides the example files, a synthetic piece of 50k notes is generated. Run from the backend directory with
+``python -m benchmarks.bench_metrics``.
+"""
+
+import math
+import os
+
+import muspy
+
+from benchmarks.common import example_midi_paths, measure, midi_to_bytes, read_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.api.model import MetricsData
+from core.service.metrics import compute_metrics
+from core.service.midi_parsing import parse_midi
+
+SYNTHETIC_NOTES = 50_000
+
+
+def muspy_metrics(music: muspy.Music) -> MetricsData:
+    values = [
+        muspy.pitch_range(music),
+        muspy.n_pitches_used(music),
+        muspy.polyphony(music),
+        muspy.empty_beat_rate(music),
+        muspy.drum_pattern_consistency(music),
+    ]
+    return MetricsData(*(0.0 if isinstance(value, float) and math.isnan(value) else value for value in values))
+
+
+def main() -> None:
+    pieces = [(os.path.basename(path), parse_midi(read_bytes(path)).music) for path in example_midi_paths()]
+    synthetic = midi_to_bytes(generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES)))
+    pieces.append((f"synthetic {SYNTHETIC_NOTES // 1000}k", parse_midi(synthetic).music))
+
+    print(f"{'file':<16}{'muspy [ms]':>12}{'engine [ms]':>13}{'speedup':>9}")
+    for name, music in pieces:
+        assert muspy_metrics(music) == compute_metrics(music)
+        reference = measure(lambda: muspy_metrics(music))
+        engine = measure(lambda: compute_metrics(music))
+        print(f"{name:<16}{reference * 1e3:>12.2f}{engine * 1e3:>13.2f}{reference / engine:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
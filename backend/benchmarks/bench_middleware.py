@@ -0,0 +1,100 @@
+"""Request logging with the former buffering ``BaseHTTPMiddleware`` against the plain ASGI ``LoggingMiddleware``.
+
+A streamed response of ``CHUNKS`` chunks is sent through both; the former one only forwards the first byte once the
+whole body is produced. Run from the backend directory with ``python -m benchmarks.bench_middleware``.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.api.logging_middleware import LoggingMiddleware
+
+CHUNKS = 200
+CHUNK_BYTES = 64 * 1024
+CHUNK_DELAY = 0.001
+REPEAT = 20
+
+
+class BufferingLoggingMiddleware(BaseHTTPMiddleware):
+    """The former middleware: drains the body iterator to log the response, then replays it."""
+
+    async def dispatch(self, request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        body = [section async for section in response.body_iterator]
+
+        async def replay():
+            for section in body:
+                yield section
+
+        response.body_iterator = replay()
+        logging.getLogger("bench").info({"status_code": response.status_code, "time": time.perf_counter() - start})
+        return response
+
+
+def make_app(middleware: type, **options) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/stream")
+    async def stream() -> StreamingResponse:
+        async def chunks():
+            for _ in range(CHUNKS):
+                await asyncio.sleep(CHUNK_DELAY)
+                yield b"x" * CHUNK_BYTES
+
+        return StreamingResponse(chunks())
+
+    app.add_middleware(middleware, **options)
+    return app
+
+
+async def request(app: FastAPI) -> tuple[float, float]:
+    """Time to the first body byte and to the end of the response, in seconds."""
+    scope = {"type": "http", "method": "GET", "path": "/stream", "raw_path": b"/stream", "query_string": b""}
+    scope.update({"headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80), "scheme": "http"})
+    scope.update({"http_version": "1.1", "root_path": "", "app": app})
+    start = time.perf_counter()
+    first_byte = None
+
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    disconnected = asyncio.Event()
+
+    async def receive() -> dict:
+        if requests:
+            return requests.pop()
+        # the client stays connected until the response is over
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal first_byte
+        if message["type"] == "http.response.body" and message.get("body") and first_byte is None:
+            first_byte = time.perf_counter() - start
+
+    await app(scope, receive, send)
+    return first_byte or 0.0, time.perf_counter() - start
+
+
+def main() -> None:
+    logging.getLogger("bench").disabled = True
+    apps = {
+        "buffering": make_app(BufferingLoggingMiddleware),
+        "asgi": make_app(LoggingMiddleware, logger=logging.getLogger("bench")),
+    }
+    print(f"{CHUNKS} chunks of {CHUNK_BYTES // 1024} kB, {CHUNK_DELAY * 1e3:.0f} ms apart")
+    print(f"{'middleware':<12}{'first byte [ms]':>17}{'total [ms]':>12}")
+    for name, app in apps.items():
+        timings = [asyncio.run(request(app)) for _ in range(REPEAT)]
+        first_byte = statistics.median(timing[0] for timing in timings)
+        total = statistics.median(timing[1] for timing in timings)
+        print(f"{name:<12}{first_byte * 1e3:>17.2f}{total * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
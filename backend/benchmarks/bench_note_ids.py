@@ -0,0 +1,57 @@
+"""Note id assignment with the former per-tokenizer loops against the table-driven engine.
+
+Run from the backend directory with ``python -m benchmarks.bench_note_ids``.
+"""
+
+import copy
+import os
+import statistics
+import time
+from typing import Any, Callable
+
+from benchmarks.common import example_midi_paths, make_config, read_bytes
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes
+from core.service.note_ids import assign_note_ids
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+from tests.legacy_note_ids import add_notes_id, add_notes_id_use_programs
+
+COMBINATIONS = [("REMI", False), ("MIDILike", False), ("CPWord", False), ("Octuple", False), ("TSD", True)]
+REPEAT = 15
+
+
+def measure_fresh(func: Callable[[Any], object], tokens: Any) -> float:
+    """Median wall time of annotating a fresh copy of ``tokens``, in seconds.
+
+    Annotating tokens a second time only overwrites attributes and is cheaper, so every call gets its own copy.
+    """
+    copies = [copy.deepcopy(tokens) for _ in range(REPEAT)]
+    timings = []
+    for tokens_copy in copies:
+        start = time.perf_counter()
+        func(tokens_copy)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main() -> None:
+    print(f"{'file':<16}{'tokenizer':<16}{'legacy [ms]':>13}{'engine [ms]':>13}{'speedup':>9}")
+    for path in example_midi_paths():
+        midi = parse_midi(read_bytes(path)).midi
+        notes = midi_to_notes(midi)
+        for tokenizer, use_programs in COMBINATIONS:
+            config = make_config(tokenizer=tokenizer, use_programs=use_programs)
+            tokens = TokenizerFactory().get_cached_tokenizer(config)(midi)
+            legacy_func = add_notes_id_use_programs if use_programs else add_notes_id
+            note_lists, track_lengths = notes.to_notes(), notes.track_lengths.tolist()
+            legacy = measure_fresh(lambda t: legacy_func(t, note_lists, tokenizer), tokens)
+            engine = measure_fresh(lambda t: assign_note_ids(t, track_lengths, tokenizer), tokens)
+            name = tokenizer + ("+programs" if use_programs else "")
+            print(
+                f"{os.path.basename(path):<16}{name:<16}{legacy * 1e3:>13.2f}{engine * 1e3:>13.2f}"
+                f"{legacy / engine:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Note extraction and serialization with one ``Note`` object per note against the array-backed ``NoteStore``.
+
+Besides the example files, a synthetic piece of 50k notes is generated. Run from the backend directory with
+``python -m benchmarks.bench_notes``.
+"""
+
+import os
+import tracemalloc
+from typing import Callable
+
+import orjson
+from miditoolkit import MidiFile
+
+from benchmarks.common import example_midi_paths, measure, read_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.api.model import Note
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes
+from core.service.serializer import serialize_notes
+
+SYNTHETIC_NOTES = 50_000
+
+
+def notes_as_objects(midi: MidiFile) -> list[list[Note]]:
+    notes = []
+    for instrument in midi.instruments:
+        track_notes = []
+        for note in instrument.notes:
+            names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+            name = f"{names[note.pitch % 12]}{note.pitch // 12 - 1}"
+            track_notes.append(Note(note.pitch, name, note.start, note.end, note.velocity))
+        notes.append(track_notes)
+    return notes
+
+
+def serialize_objects(notes: list[list[Note]]) -> bytes:
+    serialized_notes = []
+    note_id = 1
+    for track_notes in notes:
+        serialized_notes.append([{**note.__dict__, "note_id": note_id + i} for i, note in enumerate(track_notes)])
+        note_id += len(track_notes)
+    return orjson.dumps(serialized_notes)
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    """Peak of the memory allocated while building the result, in bytes, the result being kept alive."""
+    tracemalloc.start()
+    result = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main() -> None:
+    pieces = [(os.path.basename(path), parse_midi(read_bytes(path)).midi) for path in example_midi_paths()]
+    pieces.append((f"synthetic {SYNTHETIC_NOTES // 1000}k", generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES))))
+
+    print(f"{'file':<16}{'objects [ms]':>14}{'arrays [ms]':>13}{'speedup':>9}{'objects [kB]':>14}{'arrays [kB]':>13}")
+    for name, midi in pieces:
+        assert serialize_objects(notes_as_objects(midi)) == serialize_notes(midi_to_notes(midi))
+        objects = measure(lambda: serialize_objects(notes_as_objects(midi)))
+        arrays = measure(lambda: serialize_notes(midi_to_notes(midi)))
+        objects_memory = peak_memory(lambda: notes_as_objects(midi))
+        arrays_memory = peak_memory(lambda: midi_to_notes(midi))
+        print(
+            f"{name:<16}{objects * 1e3:>14.2f}{arrays * 1e3:>13.2f}{objects / arrays:>8.1f}x"
+            f"{objects_memory / 1024:>14.0f}{arrays_memory / 1024:>13.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Parse time of an upload before and after sharing one parsed representation.
+
+Run from the backend directory with ``python -m benchmarks.bench_parsing``.
+"""
+
+import os
+from io import BytesIO
+
+import muspy
+from miditoolkit import MidiFile
+from mido import MidiFile as MidoMidiFile
+
+from benchmarks.common import example_midi_paths, measure, read_bytes
+from core.service.midi_parsing import parse_midi
+
+
+def parse_separately(midi_bytes: bytes) -> None:
+    MidiFile(file=BytesIO(midi_bytes))
+    muspy.from_mido(MidoMidiFile(file=BytesIO(midi_bytes)))
+
+
+def parse_once(midi_bytes: bytes) -> None:
+    parsed_midi = parse_midi(midi_bytes)
+    parsed_midi.midi
+    parsed_midi.music
+
+
+def main() -> None:
+    print(f"{'file':<16}{'separate [ms]':>15}{'shared [ms]':>15}{'saved':>8}")
+    for path in example_midi_paths():
+        midi_bytes = read_bytes(path)
+        separate = measure(lambda: parse_separately(midi_bytes))
+        shared = measure(lambda: parse_once(midi_bytes))
+        print(f"{os.path.basename(path):<16}{separate * 1e3:>15.2f}{shared * 1e3:>15.2f}{1 - shared / separate:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Latency and memory of the /process pipeline against the note count of synthetic pieces.
+
+Pieces come from ``benchmarks.synthetic`` with every feature the config flags act on. Memory is the peak of the
+Python allocations traced by ``tracemalloc`` during one run. Run from the backend directory with
+``python -m benchmarks.bench_scaling [--output scaling.json]``.
+"""
+
+import argparse
+import tracemalloc
+
+import orjson
+
+from benchmarks.common import make_config, measure, midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.pipeline import process_midi
+
+NOTE_COUNTS = [1_000, 5_000, 10_000, 50_000, 100_000]
+
+
+def scaling_spec(notes: int) -> SyntheticSpec:
+    return SyntheticSpec(
+        notes=notes, polyphony=3, drums=True, tempo_changes=16, time_signature_changes=4, pedals=True, pitch_bends=True
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, nargs="+", default=NOTE_COUNTS)
+    parser.add_argument("--output", help="file the JSON results are written to")
+    args = parser.parse_args()
+    # miditok names pedal and pitch bend tokens after the program of their track, so programs are on
+    config = make_config(use_programs=True, use_time_signatures=True, use_sustain_pedals=True, use_pitch_bends=True)
+
+    results = []
+    print(f"{'notes':>8}{'file [kB]':>11}{'time [ms]':>11}{'peak [MB]':>11}{'response [kB]':>15}")
+    for notes in args.notes:
+        midi_bytes = midi_to_bytes(generate_midi(scaling_spec(notes)))
+        wall = measure(lambda: process_midi(config, midi_bytes), repeat=3)
+        tracemalloc.start()
+        body, _ = process_midi(config, midi_bytes)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append(
+            {
+                "notes": notes,
+                "file_bytes": len(midi_bytes),
+                "time": wall,
+                "peak_bytes": peak,
+                "response_bytes": len(body),
+            }
+        )
+        print(
+            f"{notes:>8}{len(midi_bytes) / 1024:>11.0f}{wall * 1e3:>11.1f}{peak / 2**20:>11.1f}"
+            f"{len(body) / 1024:>15.0f}"
+        )
+
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+
+
+if __name__ == "__main__":
+    main()
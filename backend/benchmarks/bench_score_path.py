@@ -0,0 +1,44 @@
+"""Tokens and notes of an upload loaded straight into a symusic score, against the miditoolkit conversion it replaced.
+
+Both paths start from the upload bytes and end with the tokens and the notes of the piece. Run from the backend
+directory with ``python -m benchmarks.bench_score_path``.
+"""
+
+import symusic
+
+from benchmarks.common import make_config, measure, midi_to_bytes
+from benchmarks.suite import TOKENIZERS
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes, score_to_notes
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+
+SYNTHETIC_NOTES = 20_000
+
+
+def through_miditoolkit(tokenizer, midi_bytes: bytes) -> None:
+    # tokenizers convert a miditoolkit file to a score themselves
+    midi = parse_midi(midi_bytes).midi
+    tokenizer(midi)
+    midi_to_notes(midi)
+
+
+def through_score(tokenizer, midi_bytes: bytes) -> None:
+    score = symusic.Score.from_midi(midi_bytes)
+    score_to_notes(score)
+    tokenizer(score.copy())
+
+
+def main() -> None:
+    midi_bytes = midi_to_bytes(generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES)))
+    print(f"{SYNTHETIC_NOTES} notes")
+    print(f"{'tokenizer':<12}{'miditoolkit [ms]':>18}{'score [ms]':>12}{'speedup':>9}")
+    for name in TOKENIZERS:
+        tokenizer = TokenizerFactory().get_cached_tokenizer(make_config(tokenizer=name))
+        before = measure(lambda: through_miditoolkit(tokenizer, midi_bytes), repeat=3)
+        after = measure(lambda: through_score(tokenizer, midi_bytes), repeat=3)
+        print(f"{name:<12}{before * 1e3:>18.1f}{after * 1e3:>12.1f}{before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
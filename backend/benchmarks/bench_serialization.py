@@ -0,0 +1,61 @@
+"""Response serialization with ``TokSequenceEncoder`` (dumps, loads, dumps) against the single-pass orjson path.
+
+Run from the backend directory with ``python -m benchmarks.bench_serialization``.
+"""
+
+import json
+import os
+
+from benchmarks.common import example_midi_paths, make_config, measure, read_bytes
+from core.service.midi_processing import retrieve_information_from_midi, tokenize_midi_file
+from core.service.pipeline import build_response_body
+from core.service.serializer import TokSequenceEncoder, serialize_notes, serialize_tokens
+
+TOKENIZERS = ["REMI", "CPWord"]
+
+
+def serialize_with_encoder(tokens, notes, metrics) -> bytes:
+    serialized_tokens = json.dumps(tokens, cls=TokSequenceEncoder)
+    note_id = 1
+    serialized_notes = []
+    for track_notes in notes.to_notes():
+        serialized_notes.append([{**note.__dict__, "note_id": note_id + i} for i, note in enumerate(track_notes)])
+        note_id += len(track_notes)
+    content = {
+        "success": True,
+        "data": {
+            "tokens": json.loads(serialized_tokens),
+            "notes": serialized_notes,
+            "metrics": json.loads(metrics.model_dump_json()),
+        },
+        "error": None,
+    }
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def serialize_single_pass(tokens, notes, metrics) -> bytes:
+    return build_response_body(
+        serialize_tokens(tokens), serialize_notes(notes), metrics.model_dump_json().encode("utf-8")
+    )
+
+
+def main() -> None:
+    print(f"{'file':<16}{'tokenizer':<10}{'encoder [ms]':>14}{'orjson [ms]':>13}{'speedup':>9}")
+    for path in example_midi_paths():
+        midi_bytes = read_bytes(path)
+        metrics = retrieve_information_from_midi(midi_bytes)
+        for tokenizer in TOKENIZERS:
+            tokens, notes = tokenize_midi_file(make_config(tokenizer=tokenizer), midi_bytes)
+            assert json.loads(serialize_with_encoder(tokens, notes, metrics)) == json.loads(
+                serialize_single_pass(tokens, notes, metrics)
+            )
+            encoder = measure(lambda: serialize_with_encoder(tokens, notes, metrics))
+            single_pass = measure(lambda: serialize_single_pass(tokens, notes, metrics))
+            print(
+                f"{os.path.basename(path):<16}{tokenizer:<10}{encoder * 1e3:>14.2f}{single_pass * 1e3:>13.2f}"
+                f"{encoder / single_pass:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
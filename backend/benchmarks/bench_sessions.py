@@ -0,0 +1,43 @@
+"""Scrolling through a long piece with a token session against fetching the whole /process result.
+
+The piece is synthetic, about 30 minutes at 120 bpm. A viewport is 8 bars, every window of the piece is requested
+once. Run from the backend directory with ``python -m benchmarks.bench_sessions``.
+"""
+
+import time
+
+import orjson
+
+from benchmarks.common import make_config, measure, midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.pipeline import process_midi
+from core.service.sessions import build_session
+
+SYNTHETIC_NOTES = 100_000
+VIEWPORT_BARS = 8
+
+
+def main() -> None:
+    config = make_config()
+    midi_bytes = midi_to_bytes(generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES, density=4)))
+
+    whole = measure(lambda: process_midi(config, midi_bytes), repeat=3)
+    whole_size = len(process_midi(config, midi_bytes)[0])
+
+    start = time.perf_counter()
+    session = build_session(config, midi_bytes)
+    build = time.perf_counter() - start
+
+    windows = [session.bar_range(bar, bar + VIEWPORT_BARS) for bar in range(0, session.bar_count, VIEWPORT_BARS)]
+    start = time.perf_counter()
+    sizes = [len(orjson.dumps(session.window(*window))) for window in windows]
+    per_window = (time.perf_counter() - start) / len(windows)
+
+    print(f"{SYNTHETIC_NOTES} notes, {session.bar_count} bars, {len(windows)} windows of {VIEWPORT_BARS} bars")
+    print(f"whole /process   {whole * 1e3:9.1f} ms  {whole_size / 1024:9.0f} kB")
+    print(f"session build    {build * 1e3:9.1f} ms")
+    print(f"window           {per_window * 1e3:9.2f} ms  {sum(sizes) / len(sizes) / 1024:9.1f} kB (mean)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Piano-roll tiles against the notes of the /process result, for drawing a long piece zoomed out.
+
+The piece is synthetic, about 30 minutes at 120 bpm. Run from the backend directory with
+``python -m benchmarks.bench_tiles``.
+"""
+
+import time
+
+import orjson
+
+from benchmarks.common import make_config, measure, midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.pipeline import process_midi
+from core.service.tiles import build_tiles
+
+SYNTHETIC_NOTES = 100_000
+
+
+def main() -> None:
+    midi_bytes = midi_to_bytes(generate_midi(SyntheticSpec(notes=SYNTHETIC_NOTES, density=4)))
+
+    whole = process_midi(make_config(), midi_bytes)[0]
+    notes_size = len(orjson.dumps(orjson.loads(whole)["data"]["notes"]))
+
+    start = time.perf_counter()
+    pyramid = build_tiles(midi_bytes)
+    build = time.perf_counter() - start
+
+    overview = [pyramid.tiles[track, 0, 0] for track in range(pyramid.track_count)]
+    finest = [tile for (_, zoom, _), tile in pyramid.tiles.items() if zoom == pyramid.max_zoom]
+    build_notes = measure(lambda: process_midi(make_config(), midi_bytes), repeat=3)
+
+    print(f"{SYNTHETIC_NOTES} notes, {pyramid.track_count} tracks, {pyramid.max_zoom + 1} zoom levels")
+    print(f"/process notes   {build_notes * 1e3:9.1f} ms  {notes_size / 1024:9.0f} kB")
+    print(f"tile pyramid     {build * 1e3:9.1f} ms  {pyramid.weight() / 1024:9.0f} kB ({len(pyramid.tiles)} tiles)")
+    print(f"zoom 0 overview  {'':12}  {sum(map(len, overview)) / 1024:9.1f} kB")
+    print(f"finest tile      {'':12}  {sum(map(len, finest)) / len(finest) / 1024:9.1f} kB (mean)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import glob
+import os
+import statistics
+import timeit
+from io import BytesIO
+from typing import Callable
+
+from miditoolkit import MidiFile
+
+from core.api.model import ConfigModel
+from core.constants import DEFAULT_TOKENIZER_PARAMS, EXAMPLE_MIDI_FILE_PATH, ROOT_DIR
+
+EXAMPLE_FILES_DIR = os.path.realpath(os.path.join(ROOT_DIR, "..", "..", "example_files"))
+
+
+def example_midi_paths() -> list[str]:
+    return sorted(glob.glob(os.path.join(EXAMPLE_FILES_DIR, "*.mid"))) + [EXAMPLE_MIDI_FILE_PATH]
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def measure(func: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    """Median wall time of a single call, in seconds."""
+    timings = timeit.repeat(func, repeat=repeat, number=number)
+    return statistics.median(timings) / number
+
+
+DEFAULT_CONFIG = {"tokenizer": "REMI", **DEFAULT_TOKENIZER_PARAMS}
+
+
+def make_config(**overrides) -> ConfigModel:
+    return ConfigModel(**{**DEFAULT_CONFIG, **overrides})
+
+
+def midi_to_bytes(midi: MidiFile) -> bytes:
+    buffer = BytesIO()
+    midi.dump(file=buffer)
+    return buffer.getvalue()
@@ -0,0 +1,245 @@
+"""Benchmark suite of the /process pipeline, stage by stage, with results kept as JSON to compare commits.
+
+Every case runs on the example files and on synthetic pieces of increasing size. Run from the backend directory::
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json --compare before.json
+
+``--compare`` prints the ratio of every case to the earlier run and exits with status 1 when one got slower by more
+than ``--threshold``. ``--case`` and ``--sizes`` narrow the run down.
+"""
+
+import argparse
+import copy
+import datetime
+import fnmatch
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Optional
+
+import orjson
+from fastapi.testclient import TestClient
+
+from benchmarks.bench_serialization import serialize_single_pass, serialize_with_encoder
+from benchmarks.common import example_midi_paths, make_config, midi_to_bytes, read_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.api.api import app
+from core.api.model import MusicInformationData
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import retrieve_information_from_midi, retrieve_metrics, score_to_notes
+from core.service.note_ids import assign_note_ids
+from core.service.notes import NoteStore
+from core.service.result_cache import result_cache
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+
+RESULTS_VERSION = 1
+SYNTHETIC_SIZES = [1_000, 10_000, 50_000]
+# chords, a drum track and tempo and time signature changes, like real pieces
+SYNTHETIC_SPEC = partial(SyntheticSpec, polyphony=3, drums=True, tempo_changes=8, time_signature_changes=2)
+# the tokenizers of TokenizerFactory, but MMM which needs a base tokenizer the visualizer does not let users choose
+TOKENIZERS = ["REMI", "MIDILike", "TSD", "Structured", "CPWord", "Octuple", "MuMIDI", "PerTok"]
+
+
+@dataclass
+class Piece:
+    name: str
+    midi_bytes: bytes
+
+
+@dataclass
+class Case:
+    name: str
+    # builds the function to time from a piece and the number of calls it will get, setup work done here is not timed
+    prepare: Callable[[Piece, int], Callable[[], object]]
+
+
+def _parse(piece: Piece, calls: int) -> Callable[[], object]:
+    def run() -> None:
+        parsed_midi = parse_midi(piece.midi_bytes)
+        parsed_midi.score
+        parsed_midi.music
+
+    return run
+
+
+def _tokenize(tokenizer: str) -> Callable[[Piece, int], Callable[[], object]]:
+    def prepare(piece: Piece, calls: int) -> Callable[[], object]:
+        config = make_config(tokenizer=tokenizer)
+        score = parse_midi(piece.midi_bytes).score
+        tokenizer_instance = TokenizerFactory().get_cached_tokenizer(config)
+        # tokenizers preprocess the score in place
+        return lambda: tokenizer_instance(score.copy())
+
+    return prepare
+
+
+def _note_ids(piece: Piece, calls: int) -> Callable[[], object]:
+    config = make_config()
+    score = parse_midi(piece.midi_bytes).score
+    track_lengths = score_to_notes(score).track_lengths.tolist()
+    tokens = TokenizerFactory().get_cached_tokenizer(config)(score)
+    # annotated tokens are cheaper to annotate again, so every call gets a fresh copy made ahead of time
+    copies = [copy.deepcopy(tokens) for _ in range(calls)]
+    return lambda: assign_note_ids(copies.pop(), track_lengths, config.tokenizer)
+
+
+def _metrics(piece: Piece, calls: int) -> Callable[[], object]:
+    music = parse_midi(piece.midi_bytes).music
+    return lambda: retrieve_metrics(music)
+
+
+def _serialize(
+    serializer: Callable[[Any, NoteStore, MusicInformationData], bytes]
+) -> Callable[[Piece, int], Callable[[], object]]:
+    def prepare(piece: Piece, calls: int) -> Callable[[], object]:
+        parsed_midi = parse_midi(piece.midi_bytes)
+        notes = score_to_notes(parsed_midi.score)
+        tokens = TokenizerFactory().get_cached_tokenizer(make_config())(parsed_midi.score.copy())
+        tokens = assign_note_ids(tokens, notes.track_lengths.tolist(), "REMI")
+        metrics = retrieve_information_from_midi(parsed_midi)
+        return lambda: serializer(tokens, notes, metrics)
+
+    return prepare
+
+
+def _process_endpoint(piece: Piece, calls: int) -> Callable[[], object]:
+    client = TestClient(app)
+    config = orjson.dumps(make_config().model_dump()).decode("utf-8")
+
+    def run() -> None:
+        # every call goes through the whole pipeline instead of hitting the result cache
+        result_cache.clear()
+        response = client.post(
+            "/process",
+            files={"file": (piece.name, piece.midi_bytes, "audio/midi")},
+            data={"config": config},
+        )
+        response.raise_for_status()
+
+    return run
+
+
+CASES = [
+    Case("parse", _parse),
+    *[Case(f"tokenize:{tokenizer}", _tokenize(tokenizer)) for tokenizer in TOKENIZERS],
+    Case("note_ids", _note_ids),
+    Case("metrics", _metrics),
+    Case("serialize", _serialize(serialize_single_pass)),
+    # the TokSequenceEncoder path the single-pass serializer replaced, as a baseline
+    Case("serialize:legacy", _serialize(serialize_with_encoder)),
+    Case("process_endpoint", _process_endpoint),
+]
+
+
+def pieces(sizes: list[int]) -> list[Piece]:
+    examples = [Piece(os.path.basename(path), read_bytes(path)) for path in example_midi_paths()]
+    synthetic = [Piece(f"synthetic-{size}", midi_to_bytes(generate_midi(SYNTHETIC_SPEC(size)))) for size in sizes]
+    return examples + synthetic
+
+
+def time_case(func: Callable[[], object], repeat: int, max_time: float) -> list[float]:
+    """Wall times of up to ``repeat`` calls after a warm-up call, stopping once ``max_time`` seconds are spent."""
+    func()
+    timings: list[float] = []
+    while len(timings) < repeat and sum(timings) < max_time:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_suite(cases: list[Case], suite_pieces: list[Piece], repeat: int, max_time: float) -> list[dict[str, Any]]:
+    results = []
+    for case in cases:
+        for piece in suite_pieces:
+            try:
+                timings = time_case(case.prepare(piece, repeat + 1), repeat, max_time)
+            except Exception as e:
+                results.append({"case": case.name, "piece": piece.name, "error": str(e)})
+                print(f"{case.name:<24}{piece.name:<20}{'failed':>12}  {e}", file=sys.stderr)
+                continue
+            median = statistics.median(timings)
+            results.append(
+                {
+                    "case": case.name,
+                    "piece": piece.name,
+                    "size": len(piece.midi_bytes),
+                    "runs": len(timings),
+                    "median": median,
+                    "min": min(timings),
+                }
+            )
+            print(f"{case.name:<24}{piece.name:<20}{median * 1e3:>12.2f} ms")
+    return results
+
+
+def compare(results: list[dict[str, Any]], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Print the ratio of every case to ``baseline``, return the cases slower by more than ``threshold``."""
+    previous = {(entry["case"], entry["piece"]): entry for entry in baseline["results"] if "median" in entry}
+    regressions = []
+    print(f"\ncompared to {baseline['commit'] or 'unknown commit'}")
+    for entry in results:
+        before = previous.get((entry["case"], entry["piece"]))
+        if before is None or "median" not in entry:
+            continue
+        ratio = entry["median"] / before["median"]
+        name = f"{entry['case']} on {entry['piece']}"
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  slower"
+        print(f"{entry['case']:<24}{entry['piece']:<20}{before['median'] * 1e3:>12.2f} ms -> {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="file the JSON results are written to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression")
+    parser.add_argument("--case", default="*", help="glob of the case names to run, e.g. 'tokenize*'")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SYNTHETIC_SIZES, help="notes of synthetic pieces")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per case and piece")
+    parser.add_argument("--max-time", type=float, default=5.0, help="seconds after which a case stops repeating")
+    args = parser.parse_args()
+
+    cases = [case for case in CASES if fnmatch.fnmatch(case.name, args.case)]
+    results = run_suite(cases, pieces(args.sizes), args.repeat, args.max_time)
+    report = {
+        "version": RESULTS_VERSION,
+        "commit": current_commit(),
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "wb") as f:
+            f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    if args.compare:
+        with open(args.compare, "rb") as f:
+            regressions = compare(results, orjson.loads(f.read()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
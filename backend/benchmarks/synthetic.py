@@ -0,0 +1,164 @@
+"""Seeded generator of synthetic MIDI files for scaling measurements.
+
+A ``SyntheticSpec`` sets the size and the content of a piece: note count, tracks, note density and polyphony, and the
+tempo changes, time signature changes, sustain pedals and pitch bends the ``ConfigModel`` flags act on. The same spec
+always gives the same file. From the backend directory::
+
+    python -m benchmarks.synthetic out/ --notes 1000 10000 100000 --tempo-changes 8 --pedals --pitch-bends
+"""
+
+import argparse
+import os
+import random
+from dataclasses import dataclass, fields
+
+from miditoolkit import ControlChange, Instrument, MidiFile
+from miditoolkit import Note as MidiNote
+from miditoolkit import PitchBend, TempoChange, TimeSignature
+
+from benchmarks.common import midi_to_bytes
+
+SUSTAIN_PEDAL = 64
+TIME_SIGNATURES = [(4, 4), (3, 4), (6, 8), (2, 4), (5, 4), (7, 8), (12, 8)]
+# durations of the notes, in quarters
+DURATIONS = [0.25, 0.5, 0.5, 1, 1, 1, 2, 4]
+DRUM_PITCHES = [35, 36, 38, 40, 42, 44, 46, 49, 51]
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    notes: int
+    tracks: int = 8
+    seed: int = 0
+    ticks_per_quarter: int = 480
+    # note onsets per quarter and per track, a chord counting as one onset
+    density: float = 2.0
+    # largest chord, chords get 1 to ``polyphony`` notes
+    polyphony: int = 1
+    # the last track plays drums when set
+    drums: bool = False
+    tempo_changes: int = 0
+    time_signature_changes: int = 0
+    pedals: bool = False
+    pitch_bends: bool = False
+
+
+def generate_midi(spec: SyntheticSpec) -> MidiFile:
+    """A piece following ``spec``, with exactly ``spec.notes`` notes spread over the tracks."""
+    rng = random.Random(spec.seed)
+    midi = MidiFile(ticks_per_beat=spec.ticks_per_quarter)
+    tracks = max(spec.tracks, 1)
+    for track in range(tracks):
+        note_count = spec.notes // tracks + (track < spec.notes % tracks)
+        is_drum = spec.drums and track == tracks - 1
+        instrument = Instrument(program=0 if is_drum else (track * 8) % 128, is_drum=is_drum, name=f"track {track}")
+        instrument.notes = _track_notes(rng, spec, note_count, is_drum)
+        midi.instruments.append(instrument)
+
+    end_tick = max((note.end for instrument in midi.instruments for note in instrument.notes), default=0)
+    midi.tempo_changes = _tempo_changes(rng, spec.tempo_changes, end_tick)
+    midi.time_signature_changes = _time_signature_changes(rng, spec, end_tick)
+    for instrument in midi.instruments:
+        if instrument.is_drum:
+            continue
+        if spec.pedals:
+            instrument.control_changes = _pedals(rng, spec.ticks_per_quarter, end_tick)
+        if spec.pitch_bends:
+            instrument.pitch_bends = _pitch_bends(rng, spec.ticks_per_quarter, end_tick)
+    midi.max_tick = end_tick
+    return midi
+
+
+def _track_notes(rng: random.Random, spec: SyntheticSpec, note_count: int, is_drum: bool) -> list[MidiNote]:
+    tpq = spec.ticks_per_quarter
+    # onsets fall on a grid of a twelfth of a quarter, fine enough for triplets and sixteenths
+    step = max(tpq // 12, 1)
+    mean_gap = 1 / max(spec.density, 1e-3)
+    center = rng.randrange(36, 85)
+    notes: list[MidiNote] = []
+    onset = 0
+    while len(notes) < note_count:
+        chord_size = min(rng.randint(1, max(spec.polyphony, 1)), note_count - len(notes))
+        duration = max(int(rng.choice(DURATIONS) * tpq), 1)
+        if is_drum:
+            pitches = rng.sample(DRUM_PITCHES, min(chord_size, len(DRUM_PITCHES)))
+        else:
+            low, high = max(center - 12, 0), min(center + 12, 127)
+            pitches = rng.sample(range(low, high + 1), min(chord_size, high - low + 1))
+        for pitch in pitches:
+            notes.append(MidiNote(rng.randrange(40, 128), pitch, onset, onset + duration))
+        onset += max(round(rng.expovariate(1 / mean_gap) * tpq / step), 1) * step
+    return notes
+
+
+def _tempo_changes(rng: random.Random, count: int, end_tick: int) -> list[TempoChange]:
+    changes = [TempoChange(120.0, 0)]
+    for time in sorted(rng.randrange(1, max(end_tick, 2)) for _ in range(count)):
+        changes.append(TempoChange(float(rng.randrange(60, 200)), time))
+    return changes
+
+
+def _time_signature_changes(rng: random.Random, spec: SyntheticSpec, end_tick: int) -> list[TimeSignature]:
+    """Changes on bar lines, every signature lasting about as long."""
+    changes = [TimeSignature(4, 4, 0)]
+    if not spec.time_signature_changes:
+        return changes
+    segment = max(end_tick // (spec.time_signature_changes + 1), 1)
+    time, numerator, denominator = 0, 4, 4
+    for _ in range(spec.time_signature_changes):
+        bar = spec.ticks_per_quarter * 4 * numerator // denominator
+        time += max(segment // bar, 1) * bar
+        numerator, denominator = rng.choice([signature for signature in TIME_SIGNATURES if signature != changes[-1]])
+        changes.append(TimeSignature(numerator, denominator, time))
+    return changes
+
+
+def _pedals(rng: random.Random, tpq: int, end_tick: int) -> list[ControlChange]:
+    """Sustain pedal pressed for one to four quarters every two to eight quarters."""
+    changes = []
+    time = rng.randrange(0, 4) * tpq
+    while time < end_tick:
+        release = time + rng.randint(1, 4) * tpq
+        changes += [ControlChange(SUSTAIN_PEDAL, 127, time), ControlChange(SUSTAIN_PEDAL, 0, release)]
+        time = release + rng.randint(1, 4) * tpq
+    return changes
+
+
+def _pitch_bends(rng: random.Random, tpq: int, end_tick: int) -> list[PitchBend]:
+    """Bends up or down and back over a quarter, every four to sixteen quarters."""
+    bends = []
+    time = rng.randint(4, 16) * tpq
+    while time < end_tick:
+        depth = rng.choice([-1, 1]) * rng.randrange(512, 8192)
+        for position in range(5):
+            bends.append(PitchBend(int(depth * (1 - abs(position - 2) / 2)), time + position * tpq // 4))
+        time += rng.randint(4, 16) * tpq
+    return bends
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir", help="directory the files are written to")
+    parser.add_argument("--notes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="one file per count")
+    for spec_field in fields(SyntheticSpec):
+        if spec_field.name == "notes":
+            continue
+        option = "--" + spec_field.name.replace("_", "-")
+        if spec_field.type is bool:
+            parser.add_argument(option, action="store_true")
+        else:
+            parser.add_argument(option, type=spec_field.type, default=spec_field.default)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = {spec_field.name: getattr(args, spec_field.name) for spec_field in fields(SyntheticSpec)[1:]}
+    for note_count in args.notes:
+        midi_bytes = midi_to_bytes(generate_midi(SyntheticSpec(notes=note_count, **options)))
+        path = os.path.join(args.output_dir, f"synthetic-{note_count}-seed{args.seed}.mid")
+        with open(path, "wb") as f:
+            f.write(midi_bytes)
+        print(f"{path}  {len(midi_bytes) / 1024:.0f} kB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,76 @@
-import json
+import asyncio
 import logging.config
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
-from fastapi import Body, FastAPI, File, HTTPException, UploadFile
+from fastapi import Body, FastAPI, File, Header, HTTPException, Query, UploadFile
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
-from core.api.logging_middleware import LoggingMiddleware, log_config
-from core.api.model import ConfigModel, MusicInformationData
-from core.service.midi_processing import retrieve_information_from_midi, tokenize_midi_file
-from core.service.serializer import TokSequenceEncoder
+from core.api.errors import error_message, error_response
+from core.api.logging_middleware import LoggingMiddleware, QueuedLogging, log_config
+from core.api.model import CompareModel, ConfigModel
+from core.api.uploads import InvalidMidiError, UploadTooLargeError, read_midi_upload, read_upload
+from core.constants import BATCH_MAX_BYTES, PREWARM_TOKENIZERS, UPLOAD_MAX_BYTES
+from core.service.batch import BatchTooLargeError, check_batch_size, process_batch, unpack_zip
+from core.service.columnar import COLUMNAR_MEDIA_TYPE
+from core.service.compare import build_comparison_body, compare_midi, prepare_comparison, tokenize_stage
+from core.service.files import file_store, tokenize_file
+from core.service.instrumentation import PROMETHEUS_MEDIA_TYPE, record_stages, render_metrics
+from core.service.jobs import JobRunner, make_job_runner
+from core.service.pipeline import (
+    COLUMNAR_FORMAT,
+    JSON_FORMAT,
+    build_body,
+    build_response_body,
+    metrics_stage,
+    process_midi,
+    stream_stage,
+    tokens_stage,
+)
+from core.service.processing_pool import TaskStream, processing_pool
+from core.service.result_cache import etag_for, etag_matches, result_cache, result_cache_key
+from core.service.serializer import render_json, render_ndjson_line
+from core.service.sessions import build_session, session_store
+from core.service.tiles import TILE_MEDIA_TYPE, build_tiles, tile_cache, tiles_id_for
+from core.service.timing import StageTimer, server_timing_header
 
 logging.config.dictConfig(log_config)
+queued_logging = QueuedLogging(log_config["loggers"])
+queued_logging.start()
+logger = logging.getLogger(__name__)
+
+MIDI_CONTENT_TYPES = ["audio/mid", "audio/midi", "audio/x-mid", "audio/x-midi"]
+ZIP_CONTENT_TYPES = ["application/zip", "application/x-zip-compressed"]
+# created by the lifespan, its store and semaphore belong to the server that runs the jobs
+job_runner: Optional[JobRunner] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_runner
+    queued_logging.start()
+    job_runner = make_job_runner()
+    if PREWARM_TOKENIZERS:
+        await processing_pool.warm_up()
+    yield
+    await job_runner.cancel_all()
+    job_runner = None
+    processing_pool.shutdown()
+    queued_logging.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def get_job_runner() -> JobRunner:
+    if job_runner is None:
+        raise RuntimeError("Jobs only run while the app lifespan is running")
+    return job_runner
 
-app = FastAPI()
 
 origins = [
     "http://localhost:3000",
@@ -23,10 +80,15 @@ origins = [
 
 
 app.add_middleware(
-    CORSMiddleware, allow_origins=origins, allow_credentials=True, allow_methods=["*"], allow_headers=["*"]
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After", "Server-Timing"],
 )
 
-app.add_middleware(LoggingMiddleware, logger=logging.getLogger(__name__))
+app.add_middleware(LoggingMiddleware, logger=logger)
 
 
 @app.exception_handler(RequestValidationError)
@@ -41,36 +103,361 @@ def save_to_file(data, filename):  # debug function
         f.write(str(data))
 
 
+@app.get("/health")
+async def health() -> dict:
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    return Response(content=render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
+
+
 @app.post("/process")
-async def process(config: ConfigModel = Body(...), file: UploadFile = File(...)) -> JSONResponse:
+async def process(
+    config: ConfigModel = Body(...),
+    file: UploadFile = File(...),
+    if_none_match: Optional[str] = Header(None),
+    accept: Optional[str] = Header(None),
+) -> Response:
     try:
-        if file.content_type not in ["audio/mid", "audio/midi", "audio/x-mid", "audio/x-midi"]:
+        if file.content_type not in MIDI_CONTENT_TYPES:
             raise HTTPException(status_code=415, detail="Unsupported file type")
-        midi_bytes: bytes = await file.read()
-        tokens, notes = tokenize_midi_file(config, midi_bytes)
-        serialized_tokens = json.dumps(tokens, cls=TokSequenceEncoder)
-        note_id = 1
-        serialized_notes = []
-        for track_notes in notes:
-            serialized_track = [{**note.__dict__, "note_id": note_id + i} for i, note in enumerate(track_notes)]
-            serialized_notes.append(serialized_track)
-            note_id += len(track_notes)
-
-        metrics: MusicInformationData = retrieve_information_from_midi(midi_bytes)
-        return JSONResponse(
-            content={
-                "success": True,
-                "data": {
-                    "tokens": json.loads(serialized_tokens),
-                    "notes": serialized_notes,
-                    "metrics": json.loads(metrics.model_dump_json()),
-                },
-                "error": None,
-            }
+        timer = StageTimer()
+        with timer.stage("upload"):
+            midi_bytes = await read_midi_upload(file)
+
+        # the columnar binary encoding is only sent to clients asking for it, JSON stays the default
+        output_format = COLUMNAR_FORMAT if accept and COLUMNAR_MEDIA_TYPE in accept else JSON_FORMAT
+        media_type = COLUMNAR_MEDIA_TYPE if output_format == COLUMNAR_FORMAT else "application/json"
+        cache_key = result_cache_key(midi_bytes, config, output_format)
+        etag = etag_for(cache_key)
+        headers = {"ETag": etag, "Vary": "Accept"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        cached_body = result_cache.get(cache_key)
+        if cached_body is not None:
+            return Response(content=cached_body, media_type=media_type, headers=headers)
+
+        start = time.perf_counter()
+        if processing_pool.parallelism > 1:
+            # tokenization and metrics are independent, running them in two workers bounds latency by the slower one.
+            # Each worker reads the upload again but builds a different view of it: the symusic score for the tokens,
+            # the mido and muspy objects for the metrics. Parsing once first, as /compare does, would only save
+            # reading the bytes twice, while adding a step before both stages and pickling its result to them.
+            (encoded_tokens, tokens_timings), (metrics, metrics_timings) = await asyncio.gather(
+                processing_pool.run(tokens_stage, config, midi_bytes, output_format),
+                processing_pool.run(metrics_stage, midi_bytes, config.metrics),
+            )
+            body = build_body(encoded_tokens, metrics, output_format)
+            timer.update(tokens_timings)
+            timer.update(metrics_timings)
+        else:
+            body, timings = await processing_pool.run(process_midi, config, midi_bytes, output_format)
+            timer.update(timings)
+        timer.timings["total"] = time.perf_counter() - start
+        logger.debug({"message": "Processed MIDI file", "timings": timer.timings})
+        record_stages("process", timer.timings)
+
+        result_cache.put(cache_key, body)
+        return Response(
+            content=body,
+            media_type=media_type,
+            headers={**headers, "Server-Timing": server_timing_header(timer.timings)},
         )
-    except HTTPException as e:
-        return JSONResponse(
-            content={"success": False, "data": None, "error": str(e.detail)}, status_code=e.status_code
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/process/stream")
+async def process_stream(config: ConfigModel = Body(...), file: UploadFile = File(...)) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        timer = StageTimer()
+        with timer.stage("upload"):
+            midi_bytes = await read_midi_upload(file)
+        # the worker sends every line as soon as it is rendered, failures before the first one get a status code
+        lines = processing_pool.stream(stream_stage, config, midi_bytes)
+        first_line = await anext(lines)
+    except Exception as e:
+        return error_response(e)
+
+    return StreamingResponse(
+        _send_stream(first_line, lines, timer),
+        media_type="application/x-ndjson",
+        headers={"Server-Timing": server_timing_header(timer.timings)},
+        # also stops the worker when the client goes away before the last line
+        background=BackgroundTask(lines.aclose),
+    )
+
+
+async def _send_stream(first_line: bytes, lines: TaskStream, timer: StageTimer) -> AsyncIterator[bytes]:
+    try:
+        yield first_line
+        async for line in lines:
+            yield line
+        timer.update(lines.result)
+        record_stages("stream", timer.timings)
+    except Exception as e:
+        yield render_ndjson_line({"type": "error", "error": error_message(e)})
+    finally:
+        await lines.aclose()
+
+
+async def read_batch(files: list[UploadFile]) -> list[tuple[str, bytes]]:
+    """MIDI files of a batch upload, counted as they are read so reading stops once a batch limit is passed."""
+    batch: list[tuple[str, bytes]] = []
+    batch_bytes = 0
+    for file in files:
+        remaining = BATCH_MAX_BYTES - batch_bytes
+        if file.content_type in MIDI_CONTENT_TYPES:
+            check_batch_size(len(batch) + 1, batch_bytes)
+            filename = file.filename or f"{len(batch)}.mid"
+            try:
+                midi_bytes = await read_midi_upload(file, min(UPLOAD_MAX_BYTES, remaining))
+            except InvalidMidiError as e:
+                raise InvalidMidiError(f"{filename}: {e}") from e
+            except UploadTooLargeError:
+                if remaining < UPLOAD_MAX_BYTES:
+                    # the read was capped by what is left of the batch budget
+                    raise BatchTooLargeError(f"A batch holds at most {BATCH_MAX_BYTES} bytes of MIDI files")
+                raise
+            entries = [(filename, midi_bytes)]
+        elif file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip"):
+            entries = unpack_zip(await read_upload(file, BATCH_MAX_BYTES), len(batch), batch_bytes)
+        else:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        batch.extend(entries)
+        batch_bytes += sum(len(midi_bytes) for _, midi_bytes in entries)
+    return batch
+
+
+@app.post("/process/batch")
+async def process_batch_files(config: ConfigModel = Body(...), files: list[UploadFile] = File(...)) -> Response:
+    try:
+        batch = await read_batch(files)
+    except Exception as e:
+        return error_response(e)
+
+    return StreamingResponse(
+        process_batch(config, batch, processing_pool, result_cache), media_type="application/x-ndjson"
+    )
+
+
+@app.post("/process/compare")
+async def process_compare(
+    config: ConfigModel = Body(...), tokenizers: CompareModel = Body(...), file: UploadFile = File(...)
+) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        timer = StageTimer()
+        with timer.stage("upload"):
+            midi_bytes = await read_midi_upload(file)
+        configs = tokenizers.configs(config)
+
+        start = time.perf_counter()
+        if processing_pool.parallelism > 1:
+            # the file is parsed and converted once, then every tokenizer encodes the shared score in its own worker
+            score, track_lengths, notes, metrics, timings = await processing_pool.run(
+                prepare_comparison, midi_bytes, config.metrics
+            )
+            timer.update(timings)
+            results = await asyncio.gather(
+                *(processing_pool.run(tokenize_stage, entry, score, track_lengths) for entry in configs)
+            )
+            for _, tokenize_timings in results:
+                timer.update(tokenize_timings)
+            body = build_comparison_body(notes, metrics, [entry for entry, _ in results])
+        else:
+            body, timings = await processing_pool.run(compare_midi, configs, midi_bytes, config.metrics)
+            timer.update(timings)
+        timer.timings["total"] = time.perf_counter() - start
+        logger.debug({"message": "Compared tokenizers", "timings": timer.timings})
+        record_stages("compare", timer.timings)
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"Server-Timing": server_timing_header(timer.timings)},
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/sessions", status_code=201)
+async def create_session(config: ConfigModel = Body(...), file: UploadFile = File(...)) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        midi_bytes = await read_midi_upload(file)
+        session = await processing_pool.run(build_session, config, midi_bytes)
+        session_id = session_store.add(session)
+        return Response(
+            content=b'{"success":true,"data":%b,"error":null}' % session.summary(session_id),
+            media_type="application/json",
+            status_code=201,
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.get("/sessions/{session_id}/window")
+async def session_window(
+    session_id: str,
+    start: Optional[int] = Query(None, ge=0),
+    end: Optional[int] = Query(None, ge=0),
+    start_bar: Optional[int] = Query(None, ge=0),
+    end_bar: Optional[int] = Query(None, ge=0),
+) -> Response:
+    try:
+        session = session_store.get(session_id)
+        if start_bar is not None and end_bar is not None:
+            start, end = session.bar_range(start_bar, end_bar)
+        elif start is None or end is None:
+            raise HTTPException(status_code=400, detail="A window needs start and end ticks or start_bar and end_bar")
+        return Response(
+            content=render_json({"success": True, "data": session.window(start, end), "error": None}),
+            media_type="application/json",
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str) -> Response:
+    try:
+        session_store.remove(session_id)
+    except Exception as e:
+        return error_response(e)
+    return JSONResponse(content={"success": True, "data": None, "error": None})
+
+
+@app.post("/files", status_code=201)
+async def create_file(file: UploadFile = File(...)) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        file_id, stored = file_store.add(await read_midi_upload(file))
+        return JSONResponse(content={"success": True, "data": stored.summary(file_id), "error": None}, status_code=201)
+    except Exception as e:
+        return error_response(e)
+
+
+@app.post("/files/{file_id}/process")
+async def process_file(
+    file_id: str, config: ConfigModel = Body(...), if_none_match: Optional[str] = Header(None)
+) -> Response:
+    try:
+        stored = file_store.get(file_id)
+        # the same key as /process, both endpoints share cached results and ETags
+        cache_key = result_cache_key(stored.midi_bytes, config, JSON_FORMAT)
+        etag = etag_for(cache_key)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        cached_body = result_cache.get(cache_key)
+        if cached_body is not None:
+            return Response(content=cached_body, media_type="application/json", headers={"ETag": etag})
+
+        start = time.perf_counter()
+        metric_names = tuple(config.metrics)
+        tokens, notes, metrics, timings = await processing_pool.run(
+            tokenize_file,
+            file_id,
+            stored.midi_bytes,
+            config,
+            stored.notes is None,
+            None if metric_names in stored.metrics else metric_names,
+        )
+        file_store.add_results(file_id, notes, metric_names, metrics)
+        body = build_response_body(
+            tokens,
+            stored.notes if notes is None else notes,
+            stored.metrics[metric_names] if metrics is None else metrics,
+        )
+        timings["total"] = time.perf_counter() - start
+        record_stages("files", timings)
+
+        result_cache.put(cache_key, body)
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"ETag": etag, "Server-Timing": server_timing_header(timings)},
+        )
+    except Exception as e:
+        return error_response(e)
+
+
+@app.delete("/files/{file_id}")
+async def delete_file(file_id: str) -> Response:
+    try:
+        file_store.remove(file_id)
+    except Exception as e:
+        return error_response(e)
+    return JSONResponse(content={"success": True, "data": None, "error": None})
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(config: ConfigModel = Body(...), file: UploadFile = File(...)) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        midi_bytes = await read_midi_upload(file)
+        job = get_job_runner().submit(config, midi_bytes)
+        return Response(
+            content=b'{"success":true,"data":%b,"error":null}' % job.state(),
+            media_type="application/json",
+            status_code=202,
+            headers={"Location": f"/jobs/{job.job_id}"},
         )
     except Exception as e:
-        return JSONResponse(content={"success": False, "data": None, "error": str(e)}, status_code=500)
+        return error_response(e)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Response:
+    try:
+        job = get_job_runner().get(job_id)
+    except Exception as e:
+        return error_response(e)
+    return Response(content=b'{"success":true,"data":%b,"error":null}' % job.summary(), media_type="application/json")
+
+
+@app.post("/tiles")
+async def create_tiles(file: UploadFile = File(...)) -> Response:
+    try:
+        if file.content_type not in MIDI_CONTENT_TYPES:
+            raise HTTPException(status_code=415, detail="Unsupported file type")
+        midi_bytes = await read_midi_upload(file)
+        tiles_id = tiles_id_for(midi_bytes)
+        pyramid = tile_cache.get(tiles_id)
+        if pyramid is None:
+            pyramid = await processing_pool.run(build_tiles, midi_bytes)
+            tile_cache.put(tiles_id, pyramid)
+        return JSONResponse(content={"success": True, "data": pyramid.summary(tiles_id), "error": None})
+    except Exception as e:
+        return error_response(e)
+
+
+@app.get("/tiles/{tiles_id}/{track}/{zoom}/{index}")
+async def get_tile(
+    tiles_id: str, track: int, zoom: int, index: int, if_none_match: Optional[str] = Header(None)
+) -> Response:
+    # tiles ids are content hashes, a tile never changes once built
+    headers = {
+        "ETag": etag_for(f"{tiles_id}-{track}-{zoom}-{index}"),
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    pyramid = tile_cache.get(tiles_id)
+    if pyramid is None:
+        return JSONResponse(
+            content={"success": False, "data": None, "error": "Tiles not found, upload the file again"},
+            status_code=404,
+        )
+    tile = pyramid.tiles.get((track, zoom, index))
+    if tile is None:
+        return JSONResponse(content={"success": False, "data": None, "error": "Tile out of range"}, status_code=404)
+    return Response(content=tile, media_type=TILE_MEDIA_TYPE, headers=headers)
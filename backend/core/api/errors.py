@@ -0,0 +1,62 @@
+"""Error responses of the endpoints.
+
+Endpoints catch every exception and answer with ``error_response``, which maps it to a status code and the usual
+``{"success": false, "data": null, "error": ...}`` body. Unknown errors are answered with a 500.
+"""
+
+import asyncio
+import zipfile
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+
+from core.api.uploads import InvalidMidiError, UploadTooLargeError
+from core.constants import PROCESS_POOL_RETRY_AFTER
+from core.service.batch import BatchTooLargeError
+from core.service.files import FileNotFoundInStoreError
+from core.service.jobs import JobNotFoundError, TooManyJobsError
+from core.service.processing_pool import PoolSaturatedError
+from core.service.sessions import SessionNotFoundError, SessionTooLargeError
+
+# status code of every known error, and the message sent instead of the error's own when it is not for clients
+ERRORS: dict[type[Exception], tuple[int, Optional[str]]] = {
+    InvalidMidiError: (400, None),
+    zipfile.BadZipFile: (400, "Invalid zip archive"),
+    FileNotFoundInStoreError: (404, None),
+    SessionNotFoundError: (404, None),
+    JobNotFoundError: (404, None),
+    UploadTooLargeError: (413, None),
+    BatchTooLargeError: (413, None),
+    SessionTooLargeError: (413, None),
+    RequestValidationError: (422, "Invalid request parameters"),
+    PoolSaturatedError: (503, None),
+    TooManyJobsError: (503, None),
+    asyncio.TimeoutError: (504, "Processing timed out"),
+}
+
+
+def error_response(error: Exception) -> JSONResponse:
+    status_code, message = _status(error)
+    # busy servers tell clients when to come back
+    headers = {"Retry-After": str(PROCESS_POOL_RETRY_AFTER)} if status_code == 503 else None
+    return JSONResponse(
+        content={"success": False, "data": None, "error": message},
+        status_code=status_code,
+        headers=headers,
+    )
+
+
+def error_message(error: Exception) -> str:
+    """Message of ``error_response``, for errors reported once a response has started."""
+    return _status(error)[1]
+
+
+def _status(error: Exception) -> tuple[int, str]:
+    if isinstance(error, HTTPException):
+        return error.status_code, str(error.detail)
+    status_code, message = next(
+        (status for error_type, status in ERRORS.items() if isinstance(error, error_type)), (500, None)
+    )
+    return status_code, message if message is not None else str(error)
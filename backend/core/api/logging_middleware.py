@@ -1,91 +1,113 @@
 import logging
+import queue
 import time
-from typing import Any, Callable, Dict, Tuple
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterable
 from uuid import uuid4
 
-from fastapi import FastAPI, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from core.service.instrumentation import request_duration
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app: FastAPI, *, logger: logging.Logger) -> None:
-        self._logger = logger
-        super().__init__(app)
-
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        request_id: str = str(uuid4())
 
-        logging_dict: Dict[str, Any] = {"X-API-REQUEST-ID": request_id}
+class LoggingMiddleware:
+    """Logs every HTTP request with its status and duration, and tags the response with a request id.
 
-        response, response_dict = await self._log_response(call_next, request, request_id)
-
-        request_dict = await self._log_request(request)
-        logging_dict["request"] = request_dict
-        logging_dict["response"] = response_dict
-
-        self._logger.info(logging_dict)
+    Plain ASGI: the status is read from the ``http.response.start`` message on its way out and body chunks are
+    passed through untouched, so streamed responses stay streamed. The duration runs until the last chunk is sent.
+    """
 
-        return response
+    def __init__(self, app: ASGIApp, *, logger: logging.Logger) -> None:
+        self.app = app
+        self._logger = logger
 
-    async def _log_request(self, request: Request) -> Dict[str, Any]:
-        path = request.url.path
-        if request.query_params:
-            path += f"?{request.query_params}"
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        request_logging = {
-            "method": request.method,
-            "path": path,
-            "ip": request.client.host if request.client is not None else None,
-        }
+        request_id: str = str(uuid4())
+        status_code = 500
+        response_started = False
 
-        return request_logging
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-API-Request-ID", request_id)
+            await send(message)
 
-    async def _log_response(
-        self, call_next: Callable, request: Request, request_id: str
-    ) -> Tuple[Response, Dict[str, Any]]:
         start_time = time.perf_counter()
-        response: Response = await self._execute_request(call_next, request, request_id)
-        finish_time = time.perf_counter()
-
-        overall_status = "successful" if response.status_code < 400 else "failed"
-
-        execution_time = finish_time - start_time
-
-        response_logging = {
-            "status": overall_status,
-            "status_code": response.status_code,
-            "time_taken": f"{execution_time:0.4f}s",
-        }
-
-        resp_body = [section async for section in response.__dict__["body_iterator"]]
-        response.__setattr__("body_iterator", AsyncIteratorWrapper(resp_body))
-
-        return response, response_logging
-
-    async def _execute_request(self, call_next: Callable, request: Request, request_id: str) -> Response:
         try:
-            response: Response = await call_next(request)
-            response.headers["X-API-Request-ID"] = request_id
-            return response
-
+            await self.app(scope, receive, send_with_request_id)
         except Exception as e:
-            self._logger.exception({"path": request.url.path, "method": request.method, "reason": e})
-            return Response(content="Internal Server Error", status_code=500)
-
-
-class AsyncIteratorWrapper:
-    def __init__(self, obj):
-        self._it = iter(obj)
-
-    def __aiter__(self):
-        return self
+            self._logger.exception({"path": scope["path"], "method": scope["method"], "reason": e})
+            if response_started:
+                raise
+            await Response(content="Internal Server Error", status_code=500)(scope, receive, send_with_request_id)
+        finally:
+            self._log(scope, request_id, status_code, time.perf_counter() - start_time)
+
+    def _log(self, scope: Scope, request_id: str, status_code: int, execution_time: float) -> None:
+        route = scope.get("route")
+        # the route template rather than the path, so ids in paths do not make a series each
+        request_duration.observe(
+            execution_time, scope["method"], getattr(route, "path", "unmatched"), str(status_code)
+        )
+
+        logging_dict: Dict[str, Any] = {
+            "X-API-REQUEST-ID": request_id,
+            "request": self._request_dict(scope),
+            "response": {
+                "status": "successful" if status_code < 400 else "failed",
+                "status_code": status_code,
+                "time_taken": f"{execution_time:0.4f}s",
+            },
+        }
+        self._logger.info(logging_dict)
 
-    async def __anext__(self):
-        try:
-            value = next(self._it)
-        except StopIteration:
-            raise StopAsyncIteration
-        return value
+    @staticmethod
+    def _request_dict(scope: Scope) -> Dict[str, Any]:
+        path = scope["path"]
+        if scope.get("query_string"):
+            path += f"?{scope['query_string'].decode('latin-1')}"
+        client = scope.get("client")
+        return {"method": scope["method"], "path": path, "ip": client[0] if client else None}
+
+
+class QueuedLogging:
+    """Moves the handlers of some loggers behind queues, emptied by listener threads.
+
+    Logging from the event loop then only enqueues the record, writing the log file never blocks a request.
+    Each logger keeps its own handlers through its own queue.
+    """
+
+    def __init__(self, logger_names: Iterable[str]) -> None:
+        self._listeners = []
+        for name in logger_names:
+            logger = logging.getLogger(name)
+            if not logger.handlers:
+                continue
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            self._listeners.append(QueueListener(log_queue, *logger.handlers, respect_handler_level=True))
+            logger.handlers = [QueueHandler(log_queue)]
+        self._running = False
+
+    def start(self) -> None:
+        if not self._running:
+            for listener in self._listeners:
+                listener.start()
+            self._running = True
+
+    def stop(self) -> None:
+        """Write the queued records and stop the listener threads."""
+        if self._running:
+            for listener in self._listeners:
+                listener.stop()
+            self._running = False
 
 
 log_config = {
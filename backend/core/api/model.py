@@ -1,17 +1,43 @@
 import json
 from dataclasses import dataclass
-from typing import Literal, Optional
-
-from pydantic import BaseModel, Field, NonNegativeFloat, NonNegativeInt, PositiveInt, StrictBool, model_validator
+from typing import Any, Literal, Optional, Union
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import (
+    BaseModel,
+    Field,
+    NonNegativeFloat,
+    NonNegativeInt,
+    PositiveInt,
+    StrictBool,
+    ValidationError,
+    model_serializer,
+    model_validator,
+)
 from typing_extensions import Annotated
 
+from core.constants import COMPARE_MAX_TOKENIZERS
+
+TokenizerName = Literal[
+    "REMI", "REMIPlus", "MIDILike", "TSD", "Structured", "CPWord", "Octuple", "MuMIDI", "MMM", "PerTok"
+]
+# metrics computed on request on top of the ones of MusicInformationData, see core/service/metrics.py
+MetricName = Literal[
+    "pitch_entropy",
+    "pitch_class_entropy",
+    "scale_consistency",
+    "polyphony_rate",
+    "empty_measure_rate",
+    "groove_consistency",
+    "note_density",
+    "track_stats",
+]
+
 
 class ConfigModel(
     BaseModel
 ):  # TODO: dynamic beat_res, beat_res_rest, chord_maps, chord_tokens_with_root_note, chord_unknown, time_signature_range
-    tokenizer: Literal[
-        "REMI", "REMIPlus", "MIDILike", "TSD", "Structured", "CPWord", "Octuple", "MuMIDI", "MMM", "PerTok"
-    ]
+    tokenizer: TokenizerName
     pitch_range: Annotated[list[Annotated[int, Field(ge=0, le=127)]], Field(min_length=2, max_length=2)]
     num_velocities: Annotated[int, Field(ge=0, le=127)]
     special_tokens: list[str]
@@ -37,6 +63,8 @@ class ConfigModel(
     ticks_per_quarter: Annotated[int, Field(ge=24, le=960)]
     max_microtiming_shift: Annotated[float, Field(ge=0, le=1)]
     num_microtiming_bins: Annotated[int, Field(ge=1, le=64)]
+    # opt-in metrics, sent back in metrics.extended_metrics
+    metrics: list[MetricName] = []
 
     @model_validator(mode="before")
     @classmethod
@@ -66,6 +94,35 @@ class ConfigModel(
         return values
 
 
+class CompareModel(BaseModel):
+    # a tokenizer name uses the base config with that tokenizer, a dict overrides fields of the base config
+    tokenizers: Annotated[
+        list[Union[TokenizerName, dict[str, Any]]], Field(min_length=1, max_length=COMPARE_MAX_TOKENIZERS)
+    ]
+
+    @model_validator(mode="before")
+    @classmethod
+    def validate_to_json(cls, value):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if isinstance(value, list):
+            return {"tokenizers": value}
+        return value
+
+    def configs(self, base: ConfigModel) -> list[ConfigModel]:
+        """Config of every entry, invalid override values are request errors like the rest of the body."""
+        base_config = base.model_dump()
+        try:
+            return [
+                ConfigModel(
+                    **{**base_config, "tokenizer": entry} if isinstance(entry, str) else {**base_config, **entry}
+                )
+                for entry in self.tokenizers
+            ]
+        except ValidationError as e:
+            raise RequestValidationError(e.errors()) from e
+
+
 class MusicInformationData(BaseModel):
     # Basic MIDI file information
     title: str
@@ -82,6 +139,17 @@ class MusicInformationData(BaseModel):
     empty_beat_rate: NonNegativeFloat
     drum_pattern_consistency: NonNegativeFloat
 
+    # metrics requested in the config, by name
+    extended_metrics: Optional[dict[str, Any]] = None
+
+    @model_serializer(mode="wrap")
+    def drop_missing_extended_metrics(self, handler):
+        # responses without requested metrics keep their former shape
+        data = handler(self)
+        if self.extended_metrics is None:
+            data.pop("extended_metrics", None)
+        return data
+
 
 @dataclass
 class BasicInfoData:
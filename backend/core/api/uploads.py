@@ -0,0 +1,71 @@
+"""Size-capped reading of uploaded files.
+
+The multipart parser spools uploads to a temporary file once they outgrow 1 MB. Endpoints read them from there a
+chunk at a time and give up as soon as the limit is crossed, so an oversized upload never sits whole in memory. MIDI
+uploads are also rejected from their first bytes when they do not start with a MIDI header chunk.
+
+Both checks only bound what the endpoints load: Starlette has already received and spooled the whole body when they
+run. Uploads are returned as one ``bytes`` object rather than a memoryview, the processing pool pickles its
+arguments and a memoryview cannot be pickled. Each worker gets its own copy, and mido and symusic build their own
+representations from it.
+"""
+
+import struct
+from typing import Optional
+
+from fastapi import UploadFile
+
+from core.constants import UPLOAD_MAX_BYTES
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MIDI_HEADER_MAGIC = b"MThd"
+# magic, chunk length, then the format, track count and division fields
+MIDI_HEADER_SIZE = 14
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class InvalidMidiError(Exception):
+    pass
+
+
+async def read_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Content of ``file``, at most ``max_bytes`` (``UPLOAD_MAX_BYTES`` by default)."""
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    _check_declared_size(file, max_bytes)
+    return await _read_chunks(file, max_bytes, [])
+
+
+async def read_midi_upload(file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Content of ``file`` like ``read_upload``, once its first bytes were checked to be a MIDI header."""
+    max_bytes = UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    _check_declared_size(file, max_bytes)
+    header = await file.read(MIDI_HEADER_SIZE)
+    check_midi_header(header)
+    return await _read_chunks(file, max_bytes, [header])
+
+
+def check_midi_header(header: bytes) -> None:
+    """Same checks as mido on the header chunk, which is the first thing a standard MIDI file holds."""
+    if len(header) < MIDI_HEADER_SIZE or header[:4] != MIDI_HEADER_MAGIC:
+        raise InvalidMidiError("Not a MIDI file")
+    (length,) = struct.unpack_from(">I", header, 4)
+    if length < 6:
+        raise InvalidMidiError("Invalid MIDI header")
+
+
+def _check_declared_size(file: UploadFile, max_bytes: int) -> None:
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLargeError(f"Uploads are limited to {max_bytes} bytes")
+
+
+async def _read_chunks(file: UploadFile, max_bytes: int, chunks: list[bytes]) -> bytes:
+    size = sum(len(chunk) for chunk in chunks)
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(f"Uploads are limited to {max_bytes} bytes")
+        chunks.append(chunk)
+    return b"".join(chunks)
@@ -6,16 +6,80 @@ DATA_DIR = os.path.join(ROOT_DIR, "data")
 EXAMPLE_MIDI_FILE_NAME = "example.mid"
 EXAMPLE_MIDI_FILE_PATH = os.path.join(DATA_DIR, EXAMPLE_MIDI_FILE_NAME)
 
+# settings the frontend starts with, pre-built tokenizers use them as most requests keep them
 DEFAULT_TOKENIZER_PARAMS = {
-    "pitch_range": (21, 109),
-    "beat_res": {(0, 4): 8, (4, 12): 4},
-    "nb_velocities": 32,
+    "pitch_range": [21, 109],
+    "num_velocities": 32,
     "special_tokens": ["PAD", "BOS", "EOS", "MASK"],
     "use_chords": True,
     "use_rests": False,
     "use_tempos": True,
     "use_time_signatures": False,
+    "use_sustain_pedals": False,
+    "use_pitch_bends": False,
     "use_programs": False,
     "nb_tempos": 32,
-    "tempo_range": (40, 250),
+    "tempo_range": [40, 250],
+    "log_tempos": False,
+    "delete_equal_successive_tempo_changes": False,
+    "delete_equal_successive_time_sig_changes": False,
+    "sustain_pedal_duration": False,
+    "pitch_bend_range": [-8192, 8191, 32],
+    "programs": None,
+    "one_token_stream_for_programs": None,
+    "program_changes": None,
+    "use_microtiming": True,
+    "ticks_per_quarter": 320,
+    "max_microtiming_shift": 0.125,
+    "num_microtiming_bins": 30,
 }
+
+TOKENIZER_CACHE_SIZE = int(os.environ.get("TOKENIZER_CACHE_SIZE", 16))
+# tokenizers every pool worker builds with DEFAULT_TOKENIZER_PARAMS when it starts, e.g. "REMI,TSD,MIDILike"
+PREWARM_TOKENIZERS = [name.strip() for name in os.environ.get("PREWARM_TOKENIZERS", "").split(",") if name.strip()]
+
+# largest MIDI file the endpoints accept, larger uploads get a 413 once the limit is read past
+UPLOAD_MAX_BYTES = int(os.environ.get("UPLOAD_MAX_BYTES", 32 * 1024 * 1024))
+
+# bump whenever the /process response format changes, so stale cached results and ETags are not served
+RESULT_CACHE_VERSION = "2"
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_DISK = os.environ.get("RESULT_CACHE_DISK", "false").lower() in ("1", "true", "yes")
+RESULT_CACHE_DIR = os.path.join(DATA_DIR, "result_cache")
+RESULT_CACHE_DISK_MAX_BYTES = int(os.environ.get("RESULT_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024))
+
+PROCESS_POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", min(4, os.cpu_count() or 1)))
+PROCESS_POOL_MAX_PENDING = int(os.environ.get("PROCESS_POOL_MAX_PENDING", 4 * max(PROCESS_POOL_WORKERS, 1)))
+PROCESS_POOL_TASK_TIMEOUT = float(os.environ.get("PROCESS_POOL_TASK_TIMEOUT", 60))
+PROCESS_POOL_START_METHOD = os.environ.get("PROCESS_POOL_START_METHOD", "spawn")
+PROCESS_POOL_RETRY_AFTER = int(os.environ.get("PROCESS_POOL_RETRY_AFTER", 5))
+
+# tokens or notes per line of a streamed /process/stream response
+STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 2048))
+
+# tokenized pieces kept for /sessions window requests, dropped this many seconds after their last use
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 600))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", 256 * 1024 * 1024))
+
+# columns of a piano-roll tile, the columns of the finest zoom level of a track, and the byte budget of the tile
+# pyramids kept for /tiles requests
+TILE_COLUMNS = int(os.environ.get("TILE_COLUMNS", 256))
+TILE_MAX_COLUMNS = int(os.environ.get("TILE_MAX_COLUMNS", 32768))
+TILE_CACHE_MAX_BYTES = int(os.environ.get("TILE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# uploaded files kept for /files, and the parsed files every pool worker keeps to tokenize them again
+FILE_TTL = float(os.environ.get("FILE_TTL", 1800))
+FILE_STORE_MAX_BYTES = int(os.environ.get("FILE_STORE_MAX_BYTES", 256 * 1024 * 1024))
+PREPARED_FILE_CACHE_SIZE = int(os.environ.get("PREPARED_FILE_CACHE_SIZE", 8))
+
+# jobs kept in memory per server process, or in a directory shared by the processes of a host with JOB_STORE=disk
+JOB_STORE = os.environ.get("JOB_STORE", "memory").lower()
+JOB_STORE_DIR = os.path.join(DATA_DIR, "jobs")
+JOB_STORE_MAX_BYTES = int(os.environ.get("JOB_STORE_MAX_BYTES", 256 * 1024 * 1024))
+JOB_TTL = float(os.environ.get("JOB_TTL", 3600))
+JOB_MAX_ACTIVE = int(os.environ.get("JOB_MAX_ACTIVE", 100))
+
+COMPARE_MAX_TOKENIZERS = int(os.environ.get("COMPARE_MAX_TOKENIZERS", 10))
+
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", 1000))
+BATCH_MAX_BYTES = int(os.environ.get("BATCH_MAX_BYTES", 256 * 1024 * 1024))
@@ -0,0 +1,97 @@
+import asyncio
+import io
+import zipfile
+from typing import AsyncIterator
+
+from core.api.model import ConfigModel
+from core.api.uploads import MIDI_HEADER_SIZE, InvalidMidiError, check_midi_header
+from core.constants import BATCH_MAX_BYTES, BATCH_MAX_FILES
+from core.service.pipeline import JSON_FORMAT, process_midi
+from core.service.processing_pool import PoolSaturatedError, ProcessingPool
+from core.service.result_cache import ResultCache, result_cache_key
+from core.service.serializer import render_json
+
+MIDI_EXTENSIONS = (".mid", ".midi")
+# wait before trying again a file the pool turned down because other requests filled it
+_SATURATED_RETRY_DELAY = 0.5
+
+
+class BatchTooLargeError(Exception):
+    pass
+
+
+def unpack_zip(archive: bytes, file_count: int = 0, total_bytes: int = 0) -> list[tuple[str, bytes]]:
+    """MIDI files of a zip archive as ``(name, bytes)`` pairs, other entries are skipped.
+
+    ``file_count`` and ``total_bytes`` are the files of the batch read before the archive, they count towards its
+    limits. Every entry must start with a MIDI header, like the MIDI files uploaded on their own.
+    """
+    with zipfile.ZipFile(io.BytesIO(archive)) as zip_file:
+        entries = [
+            entry
+            for entry in zip_file.infolist()
+            if not entry.is_dir() and entry.filename.lower().endswith(MIDI_EXTENSIONS)
+        ]
+        # checked on the sizes declared in the archive before anything is decompressed
+        check_batch_size(file_count + len(entries), total_bytes + sum(entry.file_size for entry in entries))
+        for entry in entries:
+            with zip_file.open(entry) as member:
+                _check_entry_header(entry.filename, member.read(MIDI_HEADER_SIZE))
+        return [(entry.filename, zip_file.read(entry)) for entry in entries]
+
+
+def _check_entry_header(filename: str, header: bytes) -> None:
+    try:
+        check_midi_header(header)
+    except InvalidMidiError as e:
+        raise InvalidMidiError(f"{filename}: {e}") from e
+
+
+def check_batch_size(file_count: int, total_bytes: int) -> None:
+    if file_count > BATCH_MAX_FILES:
+        raise BatchTooLargeError(f"A batch holds at most {BATCH_MAX_FILES} files")
+    if total_bytes > BATCH_MAX_BYTES:
+        raise BatchTooLargeError(f"A batch holds at most {BATCH_MAX_BYTES} bytes of MIDI files")
+
+
+async def process_batch(
+    config: ConfigModel, files: list[tuple[str, bytes]], pool: ProcessingPool, cache: ResultCache
+) -> AsyncIterator[bytes]:
+    """Process every file with the same config and yield one NDJSON line per file as soon as it is done::
+
+        {"index": 0, "filename": "a.mid", "result": {"success": true, "data": {...}, "error": null}}
+
+    ``result`` is the body /process would return for that file, lines come in completion order. At most
+    ``pool.parallelism`` files are in the pool at once so a large batch does not take every slot, a file the pool
+    turns down because other requests filled it is tried again. Each worker builds the tokenizer once, its tokenizer
+    cache serves the rest of the batch.
+    """
+    slots = asyncio.Semaphore(pool.parallelism)
+
+    async def process_file(index: int, filename: str, midi_bytes: bytes) -> bytes:
+        try:
+            cache_key = result_cache_key(midi_bytes, config, JSON_FORMAT)
+            body = cache.get(cache_key)
+            if body is None:
+                async with slots:
+                    while True:
+                        try:
+                            body, _ = await pool.run(process_midi, config, midi_bytes, JSON_FORMAT)
+                            break
+                        except PoolSaturatedError:
+                            await asyncio.sleep(_SATURATED_RETRY_DELAY)
+                cache.put(cache_key, body)
+        except asyncio.TimeoutError:
+            body = render_json({"success": False, "data": None, "error": "Processing timed out"})
+        except Exception as e:
+            body = render_json({"success": False, "data": None, "error": str(e)})
+        return b'{"index":%d,"filename":%b,"result":%b}\n' % (index, render_json(filename), body)
+
+    tasks = [asyncio.create_task(process_file(index, *file)) for index, file in enumerate(files)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # the client went away, files still waiting for a slot are not processed
+        for task in tasks:
+            task.cancel()
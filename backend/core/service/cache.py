@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    capacity: int
+    weight: int = 0
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe, bounded least-recently-used cache with hit/miss/eviction counters.
+
+    Without a ``weigher`` the capacity is a number of entries, with one it bounds the summed weight of entries
+    (e.g. their size in bytes). Entries heavier than the whole capacity are not stored. With a ``ttl`` entries expire
+    that many seconds after they were last put, expired entries count as misses and are dropped. Every entry lives
+    as long, so entries expire in the order they were put and only the oldest ones are checked.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        weigher: Optional[Callable[[V], int]] = None,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if capacity < 0:
+            raise ValueError("capacity must be non-negative")
+        self._capacity = capacity
+        self._weigher = weigher if weigher is not None else lambda _: 1
+        self._weight = 0
+        self._data: OrderedDict[K, V] = OrderedDict()
+        self._ttl = ttl
+        self._clock = clock
+        # expiry time of every entry, in the order they were put
+        self._expires: OrderedDict[K, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        with self._lock:
+            if self._ttl is not None:
+                self._drop_expired()
+            return key in self._data
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            if self._ttl is not None:
+                self._drop_expired()
+            try:
+                value = self._data[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        weight = self._weigher(value)
+        if weight > self._capacity:
+            return
+        with self._lock:
+            if self._ttl is not None:
+                self._drop_expired()
+                self._expires.pop(key, None)
+                self._expires[key] = self._clock() + self._ttl
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._weight -= self._weigher(previous)
+            self._data[key] = value
+            self._weight += weight
+            while self._weight > self._capacity:
+                evicted_key, evicted = self._data.popitem(last=False)
+                self._expires.pop(evicted_key, None)
+                self._weight -= self._weigher(evicted)
+                self._evictions += 1
+
+    def pop(self, key: K) -> Optional[V]:
+        with self._lock:
+            value = self._data.pop(key, None)
+            self._expires.pop(key, None)
+            if value is not None:
+                self._weight -= self._weigher(value)
+            return value
+
+    def get_or_create(self, key: K, factory: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is not None:
+            return value
+        # built outside the lock so a slow factory does not block lookups of other keys
+        value = factory()
+        self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            self._weight = 0
+            self._hits = self._misses = self._evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._data), self._capacity, self._weight)
+
+    def _drop_expired(self) -> None:
+        now = self._clock()
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now:
+                break
+            del self._expires[key]
+            self._weight -= self._weigher(self._data.pop(key))
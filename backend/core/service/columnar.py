@@ -0,0 +1,213 @@
+"""Columnar binary encoding of the /process payload.
+
+Every token of the JSON payload repeats its seven key names, this format stores each field as one typed array
+instead. Token types, values and descriptions become indices into small string tables. Layout::
+
+    magic     4 bytes      b"MTKC"
+    length    uint32 LE    byte length of the header
+    header    JSON         {"version", "metrics", "tokens", "arrays"}
+    padding                zeros up to a multiple of 8 bytes
+    data                   little-endian arrays, each starting at a multiple of 8 bytes
+
+Every array uses the smallest integer type holding its values. ``header["arrays"]`` maps its name to its numpy
+``dtype``, ``offset`` (relative to the data section) and ``length``. ``header["tokens"]`` describes how to rebuild
+the nested token lists: ``shape`` is ``"none"`` when the tokenizer output is missing, ``"sequence"`` for a single
+token stream and ``"sequences"`` for one per track; ``compound`` is set when tokens are groups of sub-tokens (CPWord,
+Octuple...). A ``note_id`` or ``track_id`` of -1 stands for ``null``. Note ids are the note position across all tracks plus one and note names follow from pitches,
+so neither is stored.
+"""
+
+import struct
+from dataclasses import dataclass, field
+from itertools import repeat
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Iterable, NamedTuple, Optional
+
+import numpy as np
+import orjson
+
+from core.service.lazy_import import lazy_import
+from core.service.notes import NOTE_FIELDS, NoteStore
+from core.service.serializer import render_json
+
+if TYPE_CHECKING:
+    import miditok
+else:
+    miditok = lazy_import("miditok")
+
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.miditok.columnar"
+COLUMNAR_MAGIC = b"MTKC"
+COLUMNAR_VERSION = 1
+_ALIGNMENT = 8
+
+TOKEN_COLUMNS = (
+    "token_type",
+    "token_value",
+    "token_time",
+    "token_program",
+    "token_desc",
+    "token_note_id",
+    "token_track_id",
+)
+
+
+@dataclass
+class ColumnarTokens:
+    """Tokens and notes encoded as arrays, everything of the payload except the metrics."""
+
+    tokens: dict[str, Any]
+    arrays: dict[str, np.ndarray] = field(default_factory=dict)
+
+
+def encode_columns(tokens: Any, notes: NoteStore) -> ColumnarTokens:
+    if tokens is None:
+        shape, sequences = "none", []
+    elif isinstance(tokens, list):
+        shape, sequences = "sequences", tokens
+    else:
+        shape, sequences = "sequence", [tokens]
+    sequences = [sequence.events if isinstance(sequence, miditok.TokSequence) else sequence for sequence in sequences]
+    compound = any(sequence and isinstance(sequence[0], list) for sequence in sequences)
+
+    if compound:
+        group_sizes = [len(entry) for sequence in sequences for entry in sequence]
+        events = [event for sequence in sequences for entry in sequence for event in entry]
+    else:
+        events = [event for sequence in sequences for event in sequence]
+    # every column is gathered by a C-level map over the events, without a Python tuple or dict per token
+    types = _codes(list(map(attrgetter("type_"), events)))
+    values = _typed_codes(list(map(attrgetter("value"), events)))
+    descs = _typed_codes(list(map(attrgetter("desc"), events)))
+    arrays = {
+        "token_type": types.codes,
+        "token_value": values.codes,
+        "token_time": np.fromiter(map(attrgetter("time"), events), dtype=np.int64, count=len(events)),
+        "token_program": np.fromiter(map(attrgetter("program"), events), dtype=np.int64, count=len(events)),
+        "token_desc": descs.codes,
+        # note and track ids are only set on the events assign_note_ids annotated
+        "token_note_id": _or_null(map(getattr, events, repeat("note_id"), repeat(None))),
+        "token_track_id": _or_null(map(getattr, events, repeat("track_id"), repeat(None))),
+    }
+    arrays = {name: _narrow(arrays[name]) for name in TOKEN_COLUMNS}
+    arrays["token_sequence_lengths"] = _narrow(np.array([len(sequence) for sequence in sequences], dtype=np.int64))
+    if compound:
+        arrays["token_group_sizes"] = _narrow(np.array(group_sizes, dtype=np.int64))
+
+    arrays["note_track_lengths"] = _narrow(notes.track_lengths)
+    for name in NOTE_FIELDS:
+        arrays[f"note_{name}"] = _narrow(getattr(notes, name))
+
+    header = {
+        "shape": shape,
+        "compound": compound,
+        "types": types.table,
+        "values": values.table,
+        "descs": descs.table,
+    }
+    return ColumnarTokens(header, arrays)
+
+
+def build_columnar_body(columns: ColumnarTokens, metrics: bytes) -> bytes:
+    """Assemble the binary payload from the encoded tokens and the serialized metrics."""
+    descriptors = {}
+    chunks = []
+    offset = 0
+    for name, array in columns.arrays.items():
+        data = array.tobytes()
+        descriptors[name] = {"dtype": array.dtype.str, "offset": offset, "length": len(array)}
+        padding = -len(data) % _ALIGNMENT
+        chunks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+
+    header = b'{"version":%d,"metrics":%b,"tokens":%b,"arrays":%b}' % (
+        COLUMNAR_VERSION,
+        metrics,
+        render_json(columns.tokens),
+        render_json(descriptors),
+    )
+    preamble = COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header
+    preamble += b"\0" * (-len(preamble) % _ALIGNMENT)
+    return preamble + b"".join(chunks)
+
+
+def decode_columnar(body: bytes) -> dict[str, Any]:
+    """Decode a columnar payload back into the ``data`` object of the JSON response."""
+    if body[:4] != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar payload")
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    header = orjson.loads(body[8 : 8 + header_length])
+    data_start = 8 + header_length + (-(8 + header_length) % _ALIGNMENT)
+    arrays = {
+        name: np.frombuffer(body, dtype=d["dtype"], count=d["length"], offset=data_start + d["offset"])
+        for name, d in header["arrays"].items()
+    }
+    tokens_header = header["tokens"]
+
+    events = [
+        {
+            "type": tokens_header["types"][type_],
+            "value": tokens_header["values"][value],
+            "time": time,
+            "program": program,
+            "desc": tokens_header["descs"][desc],
+            "note_id": None if note_id < 0 else note_id,
+            "track_id": None if track_id < 0 else track_id,
+        }
+        for type_, value, time, program, desc, note_id, track_id in zip(
+            *(arrays[name].tolist() for name in TOKEN_COLUMNS)
+        )
+    ]
+    entries: list[Any] = events
+    if tokens_header["compound"]:
+        entries, position = [], 0
+        for size in arrays["token_group_sizes"].tolist():
+            entries.append(events[position : position + size])
+            position += size
+    sequences, position = [], 0
+    for length in arrays["token_sequence_lengths"].tolist():
+        sequences.append(entries[position : position + length])
+        position += length
+    tokens: Optional[Any] = {"none": None, "sequence": sequences[0] if sequences else [], "sequences": sequences}[
+        tokens_header["shape"]
+    ]
+
+    notes = NoteStore(
+        *(arrays[f"note_{name}"] for name in NOTE_FIELDS), track_lengths=arrays["note_track_lengths"]
+    ).track_dicts()
+
+    return {"tokens": tokens, "notes": notes, "metrics": header["metrics"]}
+
+
+class _Codes(NamedTuple):
+    table: list[Any]
+    codes: np.ndarray
+
+
+def _codes(keys: list[Any]) -> _Codes:
+    """Distinct ``keys`` in order of first appearance, and the position of every key in them."""
+    table = list(dict.fromkeys(keys))
+    positions = {key: position for position, key in enumerate(table)}
+    return _Codes(table, np.fromiter(map(positions.__getitem__, keys), dtype=np.int64, count=len(keys)))
+
+
+def _typed_codes(keys: list[Any]) -> _Codes:
+    """``_codes`` telling apart keys that are equal across types, 1, 1.0 and True each keep their JSON rendering."""
+    # only keys of different types besides strings can be equal, e.g. int and numpy integers
+    if len(set(map(type, keys)) - {str}) < 2:
+        return _codes(keys)
+    codes = _codes(list(zip(map(type, keys), keys)))
+    return _Codes([key for _, key in codes.table], codes.codes)
+
+
+def _narrow(array: np.ndarray) -> np.ndarray:
+    if len(array) == 0:
+        return array.astype(np.uint8)
+    dtype = np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max()))
+    return array.astype(dtype.newbyteorder("<"))
+
+
+def _or_null(values: Iterable[Optional[int]]) -> np.ndarray:
+    ids = np.array(list(values), dtype=object)
+    ids[np.equal(ids, None)] = -1
+    return ids.astype(np.int64)
@@ -0,0 +1,90 @@
+from typing import TYPE_CHECKING, Any, Sequence
+
+from core.api.model import ConfigModel, MusicInformationData
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import retrieve_information_from_midi, score_to_notes, tokenize_score
+from core.service.serializer import render_json, serialize_notes, serialize_tokens
+from core.service.timing import StageTimer
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+
+if TYPE_CHECKING:
+    from symusic import Score
+
+
+# The public functions below run in the processing pool workers, so they only take and return picklable values.
+
+
+def prepare_comparison(
+    midi_bytes: bytes, metric_names: Sequence[str] = ()
+) -> "tuple[Score, list[int], bytes, bytes, dict[str, float]]":
+    """Parse the upload once and compute what does not depend on the tokenizer, with the extra ``metric_names``.
+
+    Returns the symusic score every tokenizer encodes, the note count of every track, the serialized notes and
+    metrics, and the stage timings.
+    """
+    timer = StageTimer()
+    with timer.stage("parse"):
+        parsed_midi = parse_midi(midi_bytes)
+    with timer.stage("score"):
+        score = parsed_midi.score
+    with timer.stage("notes"):
+        notes = score_to_notes(score)
+        serialized_notes = serialize_notes(notes)
+    with timer.stage("metrics"):
+        metrics: MusicInformationData = retrieve_information_from_midi(parsed_midi, metric_names)
+        serialized_metrics = metrics.model_dump_json().encode("utf-8")
+    return score, notes.track_lengths.tolist(), serialized_notes, serialized_metrics, timer.timings
+
+
+def tokenize_stage(config: ConfigModel, score: "Score", track_lengths: list[int]) -> tuple[bytes, dict[str, float]]:
+    """Tokenize the shared score with one config, return its entry of the comparison with the stage timings."""
+    timer = StageTimer()
+    # tokenizers preprocess the score in place, the other configs still need the original
+    tokens = tokenize_score(config, score.copy(), track_lengths, timer)
+    encode_time = timer.timings["tokenize"] + timer.timings["note_ids"]
+    tokenizer = TokenizerFactory().get_cached_tokenizer(config)
+    with timer.stage("tokens_serialize"):
+        sequence_lengths = _sequence_lengths(tokens)
+        summary = {
+            "tokenizer": config.tokenizer,
+            "sequence_length": sum(sequence_lengths),
+            "sequence_lengths": sequence_lengths,
+            "vocab_size": len(tokenizer),
+            "encode_time": round(encode_time * 1000, 3),
+        }
+        entry = b'{"config":%b,"summary":%b,"tokens":%b}' % (
+            config.model_dump_json().encode("utf-8"),
+            render_json(summary),
+            serialize_tokens(tokens),
+        )
+    return entry, timer.timings
+
+
+def compare_midi(
+    configs: list[ConfigModel], midi_bytes: bytes, metric_names: Sequence[str] = ()
+) -> tuple[bytes, dict[str, float]]:
+    """Run the whole comparison in one worker, return the response body with the stage timings."""
+    score, track_lengths, notes, metrics, timings = prepare_comparison(midi_bytes, metric_names)
+    timer = StageTimer()
+    timer.update(timings)
+    results = []
+    for config in configs:
+        entry, tokenize_timings = tokenize_stage(config, score, track_lengths)
+        timer.update(tokenize_timings)
+        results.append(entry)
+    return build_comparison_body(notes, metrics, results), timer.timings
+
+
+def build_comparison_body(notes: bytes, metrics: bytes, results: list[bytes]) -> bytes:
+    """Join the shared notes and metrics with the entries of ``tokenize_stage``, in the order of the configs."""
+    return b'{"success":true,"data":{"notes":%b,"metrics":%b,"results":[%b]},"error":null}' % (
+        notes,
+        metrics,
+        b",".join(results),
+    )
+
+
+def _sequence_lengths(tokens: Any) -> list[int]:
+    if tokens is None:
+        return []
+    return [len(sequence) for sequence in (tokens if isinstance(tokens, list) else [tokens])]
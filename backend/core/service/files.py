@@ -0,0 +1,140 @@
+"""Uploaded files kept server side, tokenized again with new configs without being uploaded or parsed again.
+
+A file is kept in ``file_store`` under a ``file_id`` derived from its content, and expires ``FILE_TTL`` seconds after
+its last use. What does not depend on the config is computed once. The serialized notes, and the metrics of every set
+of extra metrics, are kept with the file in the server process. Every pool worker keeps the parsed score and notes of
+the files it tokenized last in ``prepared_files``. A config change then only runs the tokenizer, the note ids and
+the serialization of the tokens.
+"""
+
+import hashlib
+from dataclasses import dataclass, field, replace
+from typing import Optional, Sequence
+
+from core.api.model import ConfigModel, MusicInformationData
+from core.constants import FILE_STORE_MAX_BYTES, FILE_TTL, PREPARED_FILE_CACHE_SIZE
+from core.service.cache import LRUCache
+from core.service.midi_parsing import ParsedMidi, parse_midi
+from core.service.midi_processing import retrieve_information_from_midi, score_to_notes, tokenize_score
+from core.service.notes import NoteStore
+from core.service.serializer import serialize_notes, serialize_tokens
+from core.service.timing import StageTimer
+
+
+class FileNotFoundInStoreError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    midi_bytes: bytes
+    # serialized notes, once a worker sent them
+    notes: Optional[bytes] = None
+    # serialized metrics by the extra metric names they were computed with
+    metrics: dict[tuple[str, ...], bytes] = field(default_factory=dict)
+
+    def weight(self) -> int:
+        return len(self.midi_bytes) + len(self.notes or b"") + sum(len(metrics) for metrics in self.metrics.values())
+
+    def summary(self, file_id: str) -> dict:
+        return {"file_id": file_id, "size": len(self.midi_bytes)}
+
+
+@dataclass
+class PreparedFile:
+    parsed_midi: ParsedMidi
+    notes: NoteStore
+
+
+class FileStore:
+    """Files by id, bounded by their size with what was computed for them. Each use restarts the ttl of a file.
+
+    Stored files are replaced rather than changed, so the cache weighs every version once.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self._files: LRUCache[str, StoredFile] = LRUCache(max_bytes, weigher=StoredFile.weight, ttl=ttl)
+
+    def add(self, midi_bytes: bytes) -> tuple[str, StoredFile]:
+        file_id = file_id_for(midi_bytes)
+        stored = self._files.get(file_id)
+        if stored is None:
+            stored = StoredFile(midi_bytes)
+            self._files.put(file_id, stored)
+        return file_id, stored
+
+    def get(self, file_id: str) -> StoredFile:
+        stored = self._files.get(file_id)
+        if stored is None:
+            raise FileNotFoundInStoreError("File not found or expired")
+        self._files.put(file_id, stored)
+        return stored
+
+    def add_results(
+        self, file_id: str, notes: Optional[bytes], metric_names: Sequence[str], metrics: Optional[bytes]
+    ) -> None:
+        """Keep the notes and metrics a worker computed for the file, if it is still stored."""
+        stored = self._files.get(file_id)
+        if stored is None or (notes is None and metrics is None):
+            return
+        self._files.put(
+            file_id,
+            replace(
+                stored,
+                notes=stored.notes if notes is None else notes,
+                metrics=stored.metrics if metrics is None else {**stored.metrics, tuple(metric_names): metrics},
+            ),
+        )
+
+    def remove(self, file_id: str) -> None:
+        if self._files.pop(file_id) is None:
+            raise FileNotFoundInStoreError("File not found or expired")
+
+
+def file_id_for(midi_bytes: bytes) -> str:
+    return hashlib.sha256(midi_bytes).hexdigest()
+
+
+# parsed files of this worker process, the most recently tokenized ones
+prepared_files: LRUCache[str, PreparedFile] = LRUCache(PREPARED_FILE_CACHE_SIZE)
+
+
+def tokenize_file(
+    file_id: str, midi_bytes: bytes, config: ConfigModel, with_notes: bool, metric_names: Optional[Sequence[str]]
+) -> tuple[bytes, Optional[bytes], Optional[bytes], dict[str, float]]:
+    """Tokenize a stored file with ``config``, runs in a processing pool worker.
+
+    Returns the serialized tokens, then the serialized notes when ``with_notes`` is set and the metrics with the
+    extra ``metric_names`` unless they are ``None``, and the stage timings. The file is only parsed when this worker
+    does not have it prepared yet.
+    """
+    timer = StageTimer()
+    prepared = prepared_files.get(file_id)
+    if prepared is None:
+        with timer.stage("parse"):
+            parsed_midi = parse_midi(midi_bytes)
+        with timer.stage("notes"):
+            prepared = PreparedFile(parsed_midi, score_to_notes(parsed_midi.score))
+        prepared_files.put(file_id, prepared)
+
+    with timer.stage("score"):
+        # tokenizers preprocess the score in place, later configs still need the original
+        score = prepared.parsed_midi.score.copy()
+    tokens = tokenize_score(config, score, prepared.notes.track_lengths.tolist(), timer)
+    with timer.stage("tokens_serialize"):
+        serialized_tokens = serialize_tokens(tokens)
+
+    serialized_notes = None
+    if with_notes:
+        with timer.stage("notes_serialize"):
+            serialized_notes = serialize_notes(prepared.notes)
+    serialized_metrics = None
+    if metric_names is not None:
+        with timer.stage("metrics"):
+            metrics: MusicInformationData = retrieve_information_from_midi(prepared.parsed_midi, metric_names)
+        with timer.stage("metrics_serialize"):
+            serialized_metrics = metrics.model_dump_json().encode("utf-8")
+    return serialized_tokens, serialized_notes, serialized_metrics, timer.timings
+
+
+file_store = FileStore(FILE_STORE_MAX_BYTES, FILE_TTL)
@@ -0,0 +1,128 @@
+"""Request and pipeline stage metrics, rendered in the Prometheus text exposition format for ``GET /metrics``.
+
+Stage durations are the ``StageTimer`` timings the endpoints already send in the ``Server-Timing`` header, so both
+views report the same numbers. Metrics are kept per server process.
+"""
+
+import bisect
+import threading
+from typing import Sequence
+
+from core.service.cache import CacheStats
+from core.service.result_cache import result_cache
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# stages recorded by the tokenizer lookup, telling whether the tokenizer had to be built
+TOKENIZER_CACHE_STAGES = {"tokenizer_hit": "hit", "tokenizer_miss": "miss"}
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # per label values: the count of every bucket (not cumulative), then the sum of the observations
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            counts, total = self._series.setdefault(label_values, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip([*self.buckets, float("inf")], counts):
+                    cumulative += count
+                    labels = _labels((*self.label_names, "le"), (*label_values, _number(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {_number(total[0])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+request_duration = Histogram(
+    "miditok_request_duration_seconds", "Time to answer an HTTP request.", ("method", "route", "status")
+)
+stage_duration = Histogram(
+    "miditok_stage_duration_seconds", "Time spent in a stage of the processing pipeline.", ("endpoint", "stage")
+)
+tokenizer_cache_lookups = Counter(
+    "miditok_tokenizer_cache_lookups_total", "Tokenizer lookups, by whether the tokenizer was cached.", ("result",)
+)
+
+
+def record_stages(endpoint: str, timings: dict[str, float]) -> None:
+    for stage, duration in timings.items():
+        stage_duration.observe(duration, endpoint, stage)
+        if stage in TOKENIZER_CACHE_STAGES:
+            tokenizer_cache_lookups.inc(TOKENIZER_CACHE_STAGES[stage])
+
+
+def render_metrics() -> bytes:
+    lines = [
+        *request_duration.render(),
+        *stage_duration.render(),
+        *tokenizer_cache_lookups.render(),
+        *_cache_lines("miditok_result_cache", result_cache.stats()),
+    ]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _cache_lines(prefix: str, stats: CacheStats) -> list[str]:
+    lines = []
+    for name, kind, documentation, value in [
+        ("hits_total", "counter", "Lookups answered from the cache.", stats.hits),
+        ("misses_total", "counter", "Lookups not found in the cache.", stats.misses),
+        ("evictions_total", "counter", "Entries dropped to make room.", stats.evictions),
+        ("entries", "gauge", "Entries in the cache.", stats.size),
+        ("bytes", "gauge", "Size of the entries in the cache.", stats.weight),
+    ]:
+        lines += [
+            f"# HELP {prefix}_{name} {documentation}",
+            f"# TYPE {prefix}_{name} {kind}",
+            f"{prefix}_{name} {value}",
+        ]
+    return lines
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
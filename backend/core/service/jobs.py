@@ -0,0 +1,294 @@
+"""Jobs: /process run in the background, polled for progress and fetched once done.
+
+``JobRunner.submit`` returns a queued ``Job`` at once. The token and metrics stages then run as two processing pool
+tasks, and the job is saved to its ``JobStore`` whenever a stage starts or ends. Once done, the job holds the body
+/process would have returned. ``MemoryJobStore`` keeps jobs in the server process. ``DiskJobStore`` keeps them in a
+directory, so every uvicorn worker of a host can answer for jobs run by another. Both forget a job ``JOB_TTL``
+seconds after its last update.
+
+A job runs in the server process that accepted it. If that process stops, the job stays ``running`` until it
+expires.
+"""
+
+import asyncio
+import contextlib
+import os
+import secrets
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Protocol
+
+import orjson
+
+from core.api.model import ConfigModel
+from core.constants import JOB_MAX_ACTIVE, JOB_STORE, JOB_STORE_DIR, JOB_STORE_MAX_BYTES, JOB_TTL
+from core.service.cache import LRUCache
+from core.service.instrumentation import record_stages
+from core.service.pipeline import JSON_FORMAT, build_body, metrics_stage, tokens_stage
+from core.service.processing_pool import PoolSaturatedError, ProcessingPool, processing_pool
+from core.service.result_cache import ResultCache, result_cache, result_cache_key
+from core.service.serializer import render_json
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+PENDING = "pending"
+JOB_STAGES = ("tokens", "metrics")
+# wait before trying again a stage the pool turned down because interactive requests filled it
+_SATURATED_RETRY_DELAY = 0.5
+
+
+class JobNotFoundError(Exception):
+    pass
+
+
+class TooManyJobsError(Exception):
+    pass
+
+
+class JobTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    job_id: str
+    status: str = QUEUED
+    # per stage: its status and the seconds it took once done
+    stages: dict[str, dict[str, Any]] = field(
+        default_factory=lambda: {stage: {"status": PENDING, "seconds": None} for stage in JOB_STAGES}
+    )
+    # pipeline timings reported by the workers, the same as the Server-Timing header of /process
+    timings: dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+    # the /process response body
+    result: Optional[bytes] = None
+
+    def state(self) -> bytes:
+        return render_json(
+            {
+                "job_id": self.job_id,
+                "status": self.status,
+                "stages": self.stages,
+                "timings": self.timings,
+                "error": self.error,
+            }
+        )
+
+    def summary(self) -> bytes:
+        """The job state, with the /process body as ``result`` once done."""
+        state = self.state()
+        if self.result is None:
+            return state
+        return b'%b,"result":%b}' % (state[:-1], self.result)
+
+    def encode(self) -> bytes:
+        """State line followed by the result, as the stores keep it."""
+        return self.state() + b"\n" + (self.result or b"")
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Job":
+        state, _, result = data.partition(b"\n")
+        return cls(**orjson.loads(state), result=result or None)
+
+
+class JobStore(Protocol):
+    def get(self, job_id: str) -> Optional[Job]: ...
+
+    def put(self, job: Job) -> None:
+        """Save ``job``, raises ``JobTooLargeError`` when the store cannot keep it."""
+
+
+class MemoryJobStore:
+    """Jobs of this server process, bounded by their size."""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self._max_bytes = max_bytes
+        # encoded like on disk, readers get a snapshot while the runner keeps updating the job
+        self._jobs: LRUCache[str, bytes] = LRUCache(max_bytes, weigher=len, ttl=ttl)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        data = self._jobs.get(job_id)
+        return Job.decode(data) if data is not None else None
+
+    def put(self, job: Job) -> None:
+        data = job.encode()
+        if len(data) > self._max_bytes:
+            # the cache would skip it and keep serving the previous state of the job
+            raise JobTooLargeError("Job result is too large to keep")
+        self._jobs.put(job.job_id, data)
+
+
+class DiskJobStore:
+    """One file per job in a directory shared by the server processes, files older than ``ttl`` are removed."""
+
+    def __init__(self, directory: str, ttl: float, clock: Callable[[], float] = time.time) -> None:
+        self._directory = directory
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_prune = clock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self._directory, f"{job_id}.job")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        path = self._path(job_id)
+        try:
+            if os.stat(path).st_mtime + self._ttl <= self._clock():
+                return None
+            with open(path, "rb") as f:
+                return Job.decode(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put(self, job: Job) -> None:
+        # written to a temporary file first so readers in other processes never see a partial job
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(job.encode())
+            os.replace(tmp_path, self._path(job.job_id))
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if self._clock() - self._last_prune >= self._ttl / 10:
+                self._last_prune = self._clock()
+                self._prune()
+
+    def _prune(self) -> None:
+        expired = self._clock() - self._ttl
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".job"):
+                    continue
+                try:
+                    if entry.stat().st_mtime <= expired:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+class JobRunner:
+    """Runs jobs on ``pool`` as asyncio tasks of the event loop, at most ``max_active`` unfinished at once.
+
+    Like batches, jobs have at most as many stages in the pool at once as ``slots`` allows, ``pool.parallelism``
+    by default, so they do not take the slots of interactive requests. A stage the pool turns down is tried again
+    until it gets a slot.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        pool: ProcessingPool,
+        cache: ResultCache,
+        max_active: int,
+        slots: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        self.store = store
+        self._pool = pool
+        self._cache = cache
+        self._max_active = max_active
+        self._tasks: set[asyncio.Task] = set()
+        self._slots = slots if slots is not None else asyncio.Semaphore(pool.parallelism)
+
+    def submit(self, config: ConfigModel, midi_bytes: bytes) -> Job:
+        job = Job(secrets.token_urlsafe(16))
+        cache_key = result_cache_key(midi_bytes, config, JSON_FORMAT)
+        cached_body = self._cache.get(cache_key)
+        if cached_body is not None:
+            job.status = DONE
+            job.stages = {stage: {"status": DONE, "seconds": 0.0} for stage in JOB_STAGES}
+            job.result = cached_body
+            self._save(job)
+            return job
+
+        if len(self._tasks) >= self._max_active:
+            raise TooManyJobsError("Too many jobs are running, try again later")
+        self._save(job)
+        task = asyncio.create_task(self._run(job, config, midi_bytes, cache_key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        job = self.store.get(job_id)
+        if job is None:
+            raise JobNotFoundError("Job not found or expired")
+        return job
+
+    async def cancel_all(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _save(self, job: Job) -> None:
+        try:
+            self.store.put(job)
+        except JobTooLargeError as e:
+            # the state is kept without the result, so the job reads as failed instead of stuck
+            job.status = FAILED
+            job.error = str(e)
+            job.result = None
+            self.store.put(job)
+
+    async def _run(self, job: Job, config: ConfigModel, midi_bytes: bytes, cache_key: str) -> None:
+        job.status = RUNNING
+        self._save(job)
+        try:
+            encoded_tokens, metrics = await asyncio.gather(
+                self._run_stage(job, "tokens", tokens_stage, config, midi_bytes, JSON_FORMAT),
+                self._run_stage(job, "metrics", metrics_stage, midi_bytes, config.metrics),
+            )
+            body = build_body(encoded_tokens, metrics, JSON_FORMAT)
+            self._cache.put(cache_key, body)
+            job.result = body
+            job.status = DONE
+            record_stages("job", job.timings)
+        except asyncio.TimeoutError:
+            job.status = FAILED
+            job.error = "Processing timed out"
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+        self._save(job)
+
+    async def _run_stage(
+        self, job: Job, stage: str, func: Callable[..., tuple[Any, dict[str, float]]], *args: Any
+    ) -> Any:
+        async with self._slots:
+            job.stages[stage]["status"] = RUNNING
+            self._save(job)
+            start = time.perf_counter()
+            try:
+                while True:
+                    try:
+                        result, timings = await self._pool.run(func, *args)
+                        break
+                    except PoolSaturatedError:
+                        await asyncio.sleep(_SATURATED_RETRY_DELAY)
+            except Exception:
+                job.stages[stage] = {"status": FAILED, "seconds": time.perf_counter() - start}
+                self._save(job)
+                raise
+        job.stages[stage] = {"status": DONE, "seconds": time.perf_counter() - start}
+        job.timings.update(timings)
+        self._save(job)
+        return result
+
+
+def _make_store() -> JobStore:
+    if JOB_STORE == "disk":
+        return DiskJobStore(JOB_STORE_DIR, JOB_TTL)
+    return MemoryJobStore(JOB_STORE_MAX_BYTES, JOB_TTL)
+
+
+def make_job_runner() -> JobRunner:
+    """The runner of the /jobs endpoints, built by the app lifespan like the pool's workers."""
+    return JobRunner(_make_store(), processing_pool, result_cache, JOB_MAX_ACTIVE)
@@ -0,0 +1,39 @@
+import importlib
+import threading
+from types import ModuleType
+from typing import Any
+
+
+class LazyModule:
+    """Stands for a module that is only imported on first attribute access.
+
+    muspy and miditok take most of the start-up time of the server while the web process itself never tokenizes,
+    the work runs in the processing pool. After the import the module attributes are copied on the proxy, so later
+    lookups cost as much as on the module. Annotations naming lazy module types are written as strings so defining a
+    function does not import anything.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.__dict__["_lazy_name"] = name
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def __getattr__(self, attribute: str) -> Any:
+        return getattr(self._lazy_load(), attribute)
+
+    def _lazy_load(self) -> ModuleType:
+        with self._lazy_lock:
+            module = self.__dict__.get("_lazy_module")
+            if module is None:
+                module = importlib.import_module(self._lazy_name)
+                self.__dict__.update(vars(module))
+                self.__dict__["_lazy_module"] = module
+            return module
+
+    def __repr__(self) -> str:
+        state = "loaded" if "_lazy_module" in self.__dict__ else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name: str) -> Any:
+    """``name`` imported on first use. Typed as ``Any``, type checkers see the real module under ``TYPE_CHECKING``."""
+    return LazyModule(name)
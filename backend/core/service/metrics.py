@@ -0,0 +1,367 @@
+"""Music metrics computed from one note array, evaluated lazily through a registry.
+
+muspy walks every note of the piece again for each metric, and ``muspy.polyphony`` fills a boolean piano roll with a
+row per tick. Here the notes are read once into arrays and every metric is a few vectorized operations on them:
+covered ticks are unions of note intervals instead of piano roll cells, covered beats a bincount of interval
+boundaries. The results are the same numbers muspy returns, NaN included.
+
+Every metric is registered with the intermediates it is computed from (``music``, ``notes``, ``beat_grid``). A
+``MetricContext`` builds an intermediate the first time a metric asks for it and keeps it for the other metrics of
+the request, so only the five metrics of ``MetricsData`` are computed unless more are requested, and asking for
+several costs little more than asking for the most expensive one.
+"""
+
+import math
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+import numpy as np
+
+from core.api.model import MetricsData
+from core.service.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    import muspy
+else:
+    muspy = lazy_import("muspy")
+
+
+_NOTE_FIELDS = ("time", "duration", "pitch")
+
+
+@dataclass
+class MusicNotes:
+    """Notes of every track of a ``muspy.Music`` as one array per field."""
+
+    time: np.ndarray
+    end: np.ndarray
+    pitch: np.ndarray
+    is_drum: np.ndarray
+    track_lengths: np.ndarray
+    # time of the last event of the piece, the piano roll length of muspy
+    length: int
+    resolution: int
+
+    @classmethod
+    def from_music(cls, music: "muspy.Music") -> "MusicNotes":
+        if not music.tracks:
+            # what muspy raises for a piece without tracks
+            raise ValueError("max() arg is an empty sequence")
+        track_lengths = np.array([len(track.notes) for track in music.tracks], dtype=np.int64)
+        time, duration, pitch = (
+            np.fromiter(
+                (value for track in music.tracks for value in map(attrgetter(name), track.notes)),
+                dtype=np.int64,
+                count=int(track_lengths.sum()),
+            )
+            for name in _NOTE_FIELDS
+        )
+        is_drum = np.repeat(np.array([track.is_drum for track in music.tracks], dtype=bool), track_lengths)
+        end = time + duration
+        length = max(int(end.max(initial=0)), *(_end_time_without_notes(track) for track in music.tracks))
+        return cls(time, end, pitch, is_drum, track_lengths, length, music.resolution)
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+@dataclass
+class BeatGrid:
+    """Beat and measure lengths in ticks, from the first time signature (4/4 without one)."""
+
+    resolution: int
+    measure_resolution: int
+    length: int
+
+    @classmethod
+    def from_music(cls, music: "muspy.Music", length: int) -> "BeatGrid":
+        numerator, denominator = 4, 4
+        if music.time_signatures:
+            numerator, denominator = music.time_signatures[0].numerator, music.time_signatures[0].denominator
+        return cls(music.resolution, max(music.resolution * 4 * numerator // denominator, 1), length)
+
+    @property
+    def measure_count(self) -> int:
+        return self.length // self.measure_resolution + 1
+
+
+@dataclass(frozen=True)
+class Computation:
+    """A metric or an intermediate, ``func`` is called with the intermediates named in ``requires``."""
+
+    func: Callable[..., Any]
+    requires: tuple[str, ...]
+
+
+INTERMEDIATES: dict[str, Computation] = {}
+METRICS: dict[str, Computation] = {}
+# the metrics of MetricsData, always computed
+BASE_METRICS = ("pitch_range", "n_pitches_used", "polyphony", "empty_beat_rate", "drum_pattern_consistency")
+
+
+def intermediate(name: str, *requires: str) -> Callable:
+    def register(func: Callable) -> Callable:
+        INTERMEDIATES[name] = Computation(func, requires)
+        return func
+
+    return register
+
+
+def metric(*requires: str) -> Callable:
+    def register(func: Callable) -> Callable:
+        METRICS[func.__name__] = Computation(func, requires)
+        return func
+
+    return register
+
+
+class MetricContext:
+    """Metrics of one piece, intermediates are built on first use and kept for the other metrics."""
+
+    def __init__(self, music: "muspy.Music") -> None:
+        self._values: dict[str, Any] = {"music": music}
+
+    def get(self, name: str) -> Any:
+        if name not in self._values:
+            computation = INTERMEDIATES[name]
+            self._values[name] = computation.func(*(self.get(required) for required in computation.requires))
+        return self._values[name]
+
+    def evaluate(self, names: Iterable[str]) -> dict[str, Any]:
+        values = {}
+        for name in names:
+            computation = METRICS.get(name)
+            if computation is None:
+                raise ValueError(f"Unknown metric: {name}")
+            values[name] = computation.func(*(self.get(required) for required in computation.requires))
+        return values
+
+    def base_metrics(self) -> MetricsData:
+        """The metrics of ``MetricsData``, NaN are replaced with 0 like ``retrieve_metrics`` always did."""
+        values = self.evaluate(BASE_METRICS)
+        return MetricsData(**{name: _nan_to_zero(value) for name, value in values.items()})
+
+
+def compute_metrics(music: "muspy.Music") -> MetricsData:
+    """``pitch_range``, ``n_pitches_used``, ``polyphony``, ``empty_beat_rate`` and ``drum_pattern_consistency`` of
+    muspy in one pass over the notes."""
+    return MetricContext(music).base_metrics()
+
+
+@intermediate("notes", "music")
+def _music_notes(music: "muspy.Music") -> MusicNotes:
+    return MusicNotes.from_music(music)
+
+
+@intermediate("beat_grid", "music", "notes")
+def _beat_grid(music: "muspy.Music", notes: MusicNotes) -> BeatGrid:
+    return BeatGrid.from_music(music, notes.length)
+
+
+@metric("notes")
+def pitch_range(notes: MusicNotes) -> int:
+    if len(notes) == 0:
+        return 0
+    pitches = notes.pitch[~notes.is_drum]
+    # muspy starts from 0 and 127, a piece with only drums gets -127
+    return int(pitches.max(initial=0)) - int(pitches.min(initial=127))
+
+
+@metric("notes")
+def n_pitches_used(notes: MusicNotes) -> int:
+    return len(np.unique(notes.pitch[~notes.is_drum]))
+
+
+@metric("notes")
+def polyphony(notes: MusicNotes) -> float:
+    """Covered piano roll cells over ticks where at least one pitch is on, without building the piano roll."""
+    pitched = ~notes.is_drum
+    time, end, pitch = notes.time[pitched], notes.end[pitched], notes.pitch[pitched]
+    active_ticks = _union_length(time, end)
+    if active_ticks < 1:
+        return math.nan
+    # shifting every pitch to its own time range makes the union of all notes the sum of the per pitch unions
+    offset = pitch * (notes.length + 1)
+    return _union_length(time + offset, end + offset) / active_ticks
+
+
+@metric("notes")
+def empty_beat_rate(notes: MusicNotes) -> float:
+    return _empty_rate(notes, notes.resolution)
+
+
+@metric("notes")
+def drum_pattern_consistency(notes: MusicNotes) -> float:
+    drum_positions = notes.time[notes.is_drum] % notes.resolution
+    if len(drum_positions) == 0:
+        return math.nan
+    duple = np.count_nonzero(_drum_pattern(notes.resolution, "duple")[drum_positions]) / len(drum_positions)
+    triple = np.count_nonzero(_drum_pattern(notes.resolution, "triple")[drum_positions]) / len(drum_positions)
+    return duple if duple > triple else triple
+
+
+@metric("notes")
+def pitch_entropy(notes: MusicNotes) -> float:
+    return _entropy(np.bincount(notes.pitch[~notes.is_drum], minlength=128))
+
+
+@metric("notes")
+def pitch_class_entropy(notes: MusicNotes) -> float:
+    return _entropy(np.bincount(notes.pitch[~notes.is_drum] % 12, minlength=12))
+
+
+@metric("notes")
+def scale_consistency(notes: MusicNotes) -> float:
+    """Largest share of pitched notes in one of the 24 major and minor scales."""
+    pitch_classes = np.bincount(notes.pitch[~notes.is_drum] % 12, minlength=12)
+    note_count = int(pitch_classes.sum())
+    if note_count < 1:
+        return math.nan
+    scales = np.array([np.roll(mode, root) for mode in (_MAJOR_SCALE, _MINOR_SCALE) for root in range(12)])
+    return int((scales.astype(np.int64) @ pitch_classes).max()) / note_count
+
+
+@metric("notes")
+def polyphony_rate(notes: MusicNotes) -> float:
+    """Share of ticks where more than two pitches are on, counted on the per pitch unions of the notes instead of
+    the piano roll of muspy."""
+    if notes.length < 1:
+        return math.nan
+    pitched = ~notes.is_drum & (notes.end > notes.time)
+    # every pitch in its own time range, so overlapping notes of one pitch are merged and different pitches are not
+    offset = notes.pitch[pitched] * (notes.length + 1)
+    start, end = _union(notes.time[pitched] + offset, notes.end[pitched] + offset)
+    offset = start - start % (notes.length + 1)
+    # +1 where a pitch starts sounding, -1 where it stops: the running sum is the number of pitches on
+    boundaries = np.concatenate((start - offset, end - offset))
+    order = np.argsort(boundaries, kind="stable")
+    pitches_on = np.cumsum(np.repeat(np.array([1, -1]), len(start))[order])
+    spans = np.diff(boundaries[order])
+    return int(spans[pitches_on[:-1] > 2].sum()) / notes.length
+
+
+@metric("notes", "beat_grid")
+def empty_measure_rate(notes: MusicNotes, beat_grid: BeatGrid) -> float:
+    return _empty_rate(notes, beat_grid.measure_resolution)
+
+
+@metric("notes", "beat_grid")
+def groove_consistency(notes: MusicNotes, beat_grid: BeatGrid) -> float:
+    """One minus the mean hamming distance between the onset patterns of successive measures."""
+    measure_count, measure_resolution = beat_grid.measure_count, beat_grid.measure_resolution
+    if measure_count < 2:
+        return math.nan
+    patterns = np.zeros((measure_count, measure_resolution), dtype=bool)
+    measures, positions = np.divmod(notes.time, measure_resolution)
+    patterns[measures, positions] = True
+    hamming_distance = np.count_nonzero(patterns[:-1] != patterns[1:])
+    return 1 - hamming_distance / (measure_resolution * (measure_count - 1))
+
+
+@metric("notes", "beat_grid")
+def note_density(notes: MusicNotes, beat_grid: BeatGrid) -> list[int]:
+    """Number of notes starting in every measure, drums included."""
+    return np.bincount(notes.time // beat_grid.measure_resolution, minlength=beat_grid.measure_count).tolist()
+
+
+@metric("music", "notes")
+def track_stats(music: "muspy.Music", notes: MusicNotes) -> list[dict[str, Any]]:
+    """Program, note count, pitch bounds, mean pitch and mean duration (in ticks) of every track."""
+    stats = []
+    bounds = np.concatenate((np.zeros(1, dtype=np.int64), np.cumsum(notes.track_lengths))).tolist()
+    for track, start, stop in zip(music.tracks, bounds[:-1], bounds[1:]):
+        pitches, durations = notes.pitch[start:stop], notes.end[start:stop] - notes.time[start:stop]
+        has_notes = stop > start
+        stats.append(
+            {
+                "name": track.name,
+                "program": track.program,
+                "is_drum": track.is_drum,
+                "note_count": stop - start,
+                "pitch_min": int(pitches.min()) if has_notes else None,
+                "pitch_max": int(pitches.max()) if has_notes else None,
+                "pitch_mean": float(pitches.mean()) if has_notes else None,
+                "duration_mean": float(durations.mean()) if has_notes else None,
+            }
+        )
+    return stats
+
+
+_MAJOR_SCALE = np.array([1, 0, 1, 0, 1, 1, 0, 1, 0, 1, 0, 1], dtype=bool)
+_MINOR_SCALE = np.array([1, 0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0], dtype=bool)
+
+
+def _drum_pattern(resolution: int, meter: str) -> np.ndarray:
+    pattern = np.zeros(resolution, dtype=bool)
+    pattern[0] = True
+    if meter == "duple":
+        if resolution % 4 == 0:
+            pattern[:: resolution // 4] = True
+        if resolution % 2 == 0:
+            pattern[:: resolution // 2] = True
+    elif resolution % 3 == 0:
+        pattern[:: resolution // 3] = True
+    return pattern
+
+
+def _empty_rate(notes: MusicNotes, unit: int) -> float:
+    """Share of the ``unit`` long steps of the piece (beats, measures) where no note sounds."""
+    if notes.length < 1:
+        return math.nan
+    step_count = notes.length // unit + 1
+    first_step = notes.time // unit
+    last_step = notes.end // unit
+    sounding = first_step <= last_step
+    # +1 at the first step of every note, -1 after its last one: steps with a positive running sum are not empty
+    boundaries = np.bincount(first_step[sounding], minlength=step_count + 1) - np.bincount(
+        last_step[sounding] + 1, minlength=step_count + 1
+    )
+    filled_steps = np.count_nonzero(np.cumsum(boundaries)[:step_count] > 0)
+    return 1 - (int(filled_steps) / step_count)
+
+
+def _entropy(counts: np.ndarray) -> float:
+    total = counts.sum()
+    if total < 1:
+        return math.nan
+    prob = counts / total
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(-np.nansum(prob * np.log2(prob)))
+
+
+def _union_length(start: np.ndarray, end: np.ndarray) -> int:
+    """Number of integer points covered by the intervals ``[start, end)``."""
+    if len(start) == 0:
+        return 0
+    order = np.argsort(start, kind="stable")
+    start, end = start[order], end[order]
+    # the part of each interval past the furthest end of the intervals starting before it is new
+    covered_until = np.maximum.accumulate(end)
+    previous_end = np.concatenate(((start[0],), covered_until[:-1]))
+    return int(np.clip(end - np.maximum(start, previous_end), 0, None).sum())
+
+
+def _union(start: np.ndarray, end: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """The intervals ``[start, end)`` merged into disjoint ones, sorted."""
+    if len(start) == 0:
+        return start, end
+    order = np.argsort(start, kind="stable")
+    start, end = start[order], end[order]
+    covered_until = np.maximum.accumulate(end)
+    # an interval starting after every interval before it ended opens a new union
+    opens = np.concatenate(((True,), start[1:] > covered_until[:-1]))
+    last = np.concatenate((np.flatnonzero(opens)[1:] - 1, (len(start) - 1,)))
+    return start[opens], covered_until[last]
+
+
+def _end_time_without_notes(track: "muspy.Track") -> int:
+    return max(
+        muspy.classes.get_end_time(track.chords, attr="end"),
+        muspy.classes.get_end_time(track.lyrics),
+        muspy.classes.get_end_time(track.annotations),
+    )
+
+
+def _nan_to_zero(value: float) -> float:
+    return 0.0 if math.isnan(value) else value
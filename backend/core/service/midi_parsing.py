@@ -0,0 +1,116 @@
+import threading
+from io import BytesIO
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from core.service.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    import miditoolkit
+    import mido
+    import muspy
+    import symusic
+else:
+    miditoolkit = lazy_import("miditoolkit")
+    mido = lazy_import("mido")
+    muspy = lazy_import("muspy")
+    symusic = lazy_import("symusic")
+
+
+class ParsedMidi:
+    """A MIDI upload, every view of it built lazily and once.
+
+    The symusic score (tokenization, notes) is loaded straight from the bytes, the way miditok reads files itself.
+    symusic keeps the notes in the order it reads them from the file, they are sorted by time, pitch, duration and
+    velocity like miditok sorts them before tokenizing, so the notes are in the order of their tokens. The
+    miditoolkit view (session bars) and the muspy view (basic data, metrics) are both built from the same mido
+    object, parsed once.
+    """
+
+    def __init__(self, midi_bytes: bytes) -> None:
+        self.midi_bytes = midi_bytes
+        self._mido: "Optional[mido.MidiFile]" = None
+        self._midi: "Optional[miditoolkit.MidiFile]" = None
+        self._music: "Optional[muspy.Music]" = None
+        self._score: "Optional[symusic.Score]" = None
+        # reentrant as the miditoolkit and muspy views parse the mido object under it
+        self._lock = threading.RLock()
+
+    @property
+    def mido(self) -> "mido.MidiFile":
+        with self._lock:
+            if self._mido is None:
+                self._mido = mido.MidiFile(file=BytesIO(self.midi_bytes))
+            return self._mido
+
+    @property
+    def midi(self) -> "miditoolkit.MidiFile":
+        with self._lock:
+            if self._midi is None:
+                self._midi = miditoolkit_from_mido(self.mido)
+            return self._midi
+
+    @property
+    def music(self) -> "muspy.Music":
+        with self._lock:
+            if self._music is None:
+                self._music = muspy.from_mido(self.mido)
+            return self._music
+
+    @property
+    def score(self) -> "symusic.Score":
+        """What miditok tokenizes. Tokenizers preprocess scores in place, pass them a ``copy()``."""
+        with self._lock:
+            if self._score is None:
+                self._score = symusic.Score.from_midi(self.midi_bytes)
+                sort_notes(self._score)
+            return self._score
+
+
+def parse_midi(midi_bytes: bytes) -> ParsedMidi:
+    return ParsedMidi(midi_bytes)
+
+
+def sort_notes(score: "symusic.Score") -> None:
+    """Sort the notes of every track of ``score`` in place, in the order of ``MusicTokenizer.preprocess_score``."""
+    for track in score.tracks:
+        notes = track.notes.numpy()
+        order = np.lexsort((notes["velocity"], notes["duration"], notes["pitch"], notes["time"]))
+        if np.any(order != np.arange(len(order))):
+            track.notes = symusic.core.NoteTickList.from_numpy(
+                *(notes[field][order] for field in ("time", "duration", "pitch", "velocity"))
+            )
+
+
+def miditoolkit_from_mido(mido_obj: "mido.MidiFile") -> "miditoolkit.MidiFile":
+    """Build a ``miditoolkit.MidiFile`` from an already parsed mido object, mirroring ``MidiFile.__init__``.
+
+    miditoolkit converts message times to cumulative ticks in place, they are turned back into deltas afterwards so
+    the mido object can still be read by muspy.
+    """
+    midi = miditoolkit.MidiFile(ticks_per_beat=mido_obj.ticks_per_beat)
+    miditoolkit.MidiFile._convert_delta_to_cumulative(mido_obj)
+    try:
+        midi.tempo_changes = miditoolkit.MidiFile._load_tempo_changes(mido_obj)
+        midi.key_signature_changes = miditoolkit.MidiFile._load_key_signatures(mido_obj)
+        midi.time_signature_changes = miditoolkit.MidiFile._load_time_signatures(mido_obj)
+        midi.markers = miditoolkit.MidiFile._load_markers(mido_obj)
+        midi.lyrics = miditoolkit.MidiFile._load_lyrics(mido_obj)
+
+        midi.time_signature_changes.sort(key=lambda ts: ts.time)
+        midi.key_signature_changes.sort(key=lambda ks: ks.time)
+        midi.lyrics.sort(key=lambda lyc: lyc.time)
+
+        midi.max_tick = max([max([e.time for e in t]) for t in mido_obj.tracks]) + 1
+        midi.instruments = miditoolkit.MidiFile._load_instruments(mido_obj)
+    finally:
+        _convert_cumulative_to_delta(mido_obj)
+    return midi
+
+
+def _convert_cumulative_to_delta(mido_obj: "mido.MidiFile") -> None:
+    for track in mido_obj.tracks:
+        tick = 0
+        for event in track:
+            event.time, tick = event.time - tick, event.time
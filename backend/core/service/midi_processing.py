@@ -1,75 +1,82 @@
-import math
-from io import BytesIO
-from typing import Any, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple, Union
 
-import muspy
 import pydantic
-from miditok import TokenizerConfig
-from miditoolkit import MidiFile
-from mido import MidiFile as MidoMidiFile
 
-from core.api.model import BasicInfoData, ConfigModel, MetricsData, MusicInformationData, Note
+from core.api.model import BasicInfoData, ConfigModel, MetricsData, MusicInformationData
+from core.service.metrics import MetricContext, compute_metrics
+from core.service.midi_parsing import ParsedMidi, parse_midi
+from core.service.note_ids import assign_note_ids
+from core.service.notes import NOTE_NAMES, PITCH_NAMES, NoteStore
+from core.service.timing import StageTimer
+from core.service.tokenizers.tokenizer_config import tokenizer_cache_key
 from core.service.tokenizers.tokenizer_factory import TokenizerFactory
 
+if TYPE_CHECKING:
+    import miditoolkit
+    import muspy
+    import symusic
+    from miditok import MusicTokenizer
 
-def tokenize_midi_file(user_config: ConfigModel, midi_bytes: bytes) -> tuple[Any, list[list[Note]]]:
-    tokenizer_params = {
-        "pitch_range": tuple(user_config.pitch_range),
-        "beat_res": {(0, 4): 8, (4, 12): 4},
-        "num_velocities": user_config.num_velocities,
-        "special_tokens": user_config.special_tokens,
-        "use_chords": user_config.use_chords,
-        "use_rests": user_config.use_rests,
-        "use_tempos": user_config.use_tempos,
-        "use_time_signatures": user_config.use_time_signatures,
-        "use_sustain_pedals": user_config.use_sustain_pedals,
-        "use_pitch_bends": user_config.use_pitch_bends,
-        "nb_tempos": user_config.nb_tempos,
-        "tempo_range": tuple(user_config.tempo_range),
-        "log_tempos": user_config.log_tempos,
-        "delete_equal_successive_tempo_changes": user_config.delete_equal_successive_tempo_changes,
-        "sustain_pedal_duration": user_config.sustain_pedal_duration,
-        "pitch_bend_range": user_config.pitch_bend_range,
-        "delete_equal_successive_time_sig_changes": user_config.delete_equal_successive_time_sig_changes,
-        # added for pertok
-        "use_programs": user_config.use_programs,
-        "use_microtiming": user_config.use_microtiming,
-        "ticks_per_quarter": user_config.ticks_per_quarter,
-        "max_microtiming_shift": user_config.max_microtiming_shift,
-        "num_microtiming_bins": user_config.num_microtiming_bins,
-        # TODO: dynamic config preparation as not all tokenizers are compatible with program parameters
-        # "programs": list(range(user_config.programs[0], user_config.programs[1])),
-        # "one_token_stream_for_programs": user_config.one_token_stream_for_programs,
-        # "program_changes": user_config.program_changes,
-    }
-    tokenizer_config = TokenizerConfig(**tokenizer_params)
-
-    tokenizer_factory = TokenizerFactory()
-    tokenizer = tokenizer_factory.get_tokenizer(user_config.tokenizer, tokenizer_config)
-
-    midi = MidiFile(file=BytesIO(midi_bytes))
-
-    tokens = tokenizer(midi)
-    notes = midi_to_notes(midi)
-    if not user_config.use_programs:
-        tokens = add_notes_id(tokens, notes, user_config.tokenizer)
-    else:
-        tokens = add_notes_id_use_programs(tokens, notes, user_config.tokenizer)
+
+def tokenize_midi_file(
+    user_config: ConfigModel, midi_file: Union[bytes, ParsedMidi], timer: Optional[StageTimer] = None
+) -> tuple[Any, NoteStore]:
+    timer = timer if timer is not None else StageTimer()
+    tokenizer = get_tokenizer(user_config, timer)
+
+    parsed_midi = parse_midi(midi_file) if isinstance(midi_file, bytes) else midi_file
+    with timer.stage("score"):
+        score = parsed_midi.score
+
+    with timer.stage("notes"):
+        notes = score_to_notes(score)
+    with timer.stage("tokenize"):
+        # tokenizers preprocess the score in place, the parsed upload keeps the original
+        tokens = tokenizer(score.copy())
+    with timer.stage("note_ids"):
+        tokens = assign_note_ids(tokens, notes.track_lengths.tolist(), user_config.tokenizer)
 
     return tokens, notes
 
 
-def retrieve_information_from_midi(midi_bytes: bytes) -> MusicInformationData:
-    midi = MidoMidiFile(file=BytesIO(midi_bytes))
-    midi_file_music = muspy.from_mido(midi)
+def tokenize_score(
+    user_config: ConfigModel, score: "symusic.Score", track_lengths: Sequence[int], timer: Optional[StageTimer] = None
+) -> Any:
+    """Tokenize an already loaded score, ``track_lengths`` are the note counts of ``score_to_notes``."""
+    timer = timer if timer is not None else StageTimer()
+    tokenizer = get_tokenizer(user_config, timer)
+    with timer.stage("tokenize"):
+        tokens = tokenizer(score)
+    with timer.stage("note_ids"):
+        return assign_note_ids(tokens, track_lengths, user_config.tokenizer)
+
+
+def get_tokenizer(user_config: ConfigModel, timer: StageTimer) -> "MusicTokenizer":
+    """The cached tokenizer of the config, timed as ``tokenizer_hit`` or as ``tokenizer_miss`` when it is built."""
+    factory = TokenizerFactory()
+    cached = tokenizer_cache_key(user_config) in factory.cache
+    with timer.stage("tokenizer_hit" if cached else "tokenizer_miss"):
+        return factory.get_cached_tokenizer(user_config)
+
+
+def retrieve_information_from_midi(
+    midi_file: Union[bytes, ParsedMidi], metric_names: Sequence[str] = ()
+) -> MusicInformationData:
+    """Basic information and metrics of a MIDI file, ``metric_names`` are the extra metrics to compute."""
+    parsed_midi = parse_midi(midi_file) if isinstance(midi_file, bytes) else midi_file
+    midi_file_music = parsed_midi.music
 
     basic_data = retrieve_basic_data(midi_file_music)
-    metrics = retrieve_metrics(midi_file_music)
+    # the extra metrics reuse the intermediates of the base ones
+    metric_context = MetricContext(midi_file_music)
+    metrics = metric_context.base_metrics()
     music_info_data = create_music_info_data(basic_data, metrics)
 
     if music_info_data is None:
         raise ValueError("Couldn't handle music information data")
 
+    if metric_names:
+        music_info_data.extended_metrics = metric_context.evaluate(metric_names)
     return music_info_data
 
 
@@ -93,7 +100,7 @@ def create_music_info_data(basic_info: BasicInfoData, metrics_data: MetricsData)
         return None
 
 
-def retrieve_basic_data(music_file: muspy.Music) -> BasicInfoData:
+def retrieve_basic_data(music_file: "muspy.Music") -> BasicInfoData:
     tempos: List[Tuple[int, float]] = []
     for tempo in music_file.tempos:
         tempo_data: Tuple[int, float] = (tempo.time, tempo.qpm)
@@ -112,237 +119,19 @@ def retrieve_basic_data(music_file: muspy.Music) -> BasicInfoData:
     return BasicInfoData(music_file.metadata.title, music_file.resolution, tempos, key_signatures, time_signatures)
 
 
-def retrieve_metrics(music_file: muspy.Music) -> MetricsData:
-    pitch_range = muspy.pitch_range(music_file)
-    n_pitches_used = muspy.n_pitches_used(music_file)
-
-    polyphony_rate = muspy.polyphony(music_file)
-    if math.isnan(polyphony_rate):
-        polyphony_rate = 0.0
-
-    empty_beat_rate = muspy.empty_beat_rate(music_file)
-    if math.isnan(empty_beat_rate):
-        empty_beat_rate = 0.0
+def retrieve_metrics(music_file: "muspy.Music") -> MetricsData:
+    return compute_metrics(music_file)
 
-    drum_pattern_consistency = muspy.drum_pattern_consistency(music_file)
-    if math.isnan(drum_pattern_consistency):
-        drum_pattern_consistency = 0.0
 
-    return MetricsData(pitch_range, n_pitches_used, polyphony_rate, empty_beat_rate, drum_pattern_consistency)
+def midi_to_notes(midi: "miditoolkit.MidiFile") -> NoteStore:
+    return NoteStore.from_midi(midi)
 
 
-def midi_to_notes(midi: MidiFile) -> List[List[Note]]:
-    notes = []
-    for instrument in midi.instruments:
-        track_notes = []
-        for note in instrument.notes:
-            note_name = pitch_to_name(note.pitch)
-            track_notes.append(Note(note.pitch, note_name, note.start, note.end, note.velocity))
-        notes.append(track_notes)
-    return notes
+def score_to_notes(score: "symusic.Score") -> NoteStore:
+    return NoteStore.from_score(score)
 
 
 def pitch_to_name(pitch: int) -> str:
-    note_names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-    octave = pitch // 12 - 1
-    note = note_names[pitch % 12]
-    return f"{note}{octave}"
-
-
-def add_notes_id(tokens, notes, tokenizer):
-    notes_ids = []
-    i = 0
-    tracks_len = []
-    for row in notes:
-        tracks_len.append(len(row))
-        for _ in row:
-            notes_ids.append(i)
-            i += 1
-
-    note_to_track = []
-    current_track_id = 0
-    for track_len in tracks_len:
-        for _ in range(track_len):
-            note_to_track.append(current_track_id)
-        current_track_id += 1
-
-    if tokenizer in ["REMI", "PerTok", "Structured", "TSD"]:
-        i = -1
-        current_track_id = 0
-        for token_list in tokens:
-            for token in token_list.events:
-                if token.type_ == "Pitch":
-                    i += 1
-                    current_note_id = notes_ids[i] + 1
-                    current_track_id = note_to_track[i]
-                    token.note_id = current_note_id
-                    token.track_id = current_track_id
-                elif token.type_ in ["Velocity", "Duration", "MicroTiming"]:
-                    if current_note_id is not None:
-                        token.note_id = current_note_id
-                        token.track_id = current_track_id
-                else:
-                    token.note_id = None
-                    token.track_id = current_track_id
-        return tokens
-
-    elif tokenizer == "CPWord":
-        i = -1
-        for token_list in tokens:
-            current_note_id = None
-            for compound_token in token_list.events:
-                if compound_token[0].value == "Note":
-                    for token in compound_token:
-                        if token.type_ == "Pitch":
-                            i += 1
-                            current_note_id = notes_ids[i] + 1
-                            current_track_id = note_to_track[i]
-                            token.note_id = current_note_id
-                            token.track_id = current_track_id
-                        elif token.type_ in ["Velocity", "Duration"]:
-                            if current_note_id:
-                                token.note_id = current_note_id
-                                token.track_id = current_track_id
-                        else:
-                            token.note_id = None
-                            token.track_id = current_track_id
-        return tokens
-
-    elif tokenizer == "MIDILike":
-        active_notes = {}
-        current_note_id = None
-        i = -1
-        for token_list in tokens:
-            for token in token_list.events:
-                if token.type_ == "NoteOn":
-                    i += 1
-                    current_note_id = notes_ids[i] + 1
-                    current_track_id = note_to_track[i]
-                    active_notes[token.value] = current_note_id
-                    token.note_id = current_note_id
-                    token.track_id = current_track_id
-                elif token.type_ == "Velocity":
-                    if current_note_id:
-                        token.note_id = current_note_id
-                        token.track_id = current_track_id
-                elif token.type_ == "NoteOff":
-                    if token.value in active_notes:
-                        token.note_id = active_notes.pop(token.value)
-                        token.track_id = current_track_id
-                    else:
-                        token.note_id = None
-                        token.track_id = current_track_id
-                    current_note_id = None
-                else:
-                    token.note_id = None
-                    token.track_id = current_track_id
-        return tokens
-
-    elif tokenizer == "Octuple":
-        i = -1
-        for token_list in tokens:
-            current_note_id = None
-            for compound_token in token_list.events:
-                if compound_token[0].type_ in ["Pitch", "PitchDrum"]:
-                    for token in compound_token:
-                        if token.type_ == "Pitch":
-                            i += 1
-                            current_note_id = notes_ids[i] + 1
-                            current_track_id = note_to_track[i]
-                            token.note_id = current_note_id
-                            token.track_id = current_track_id
-                        elif token.type_ in ["Velocity", "Duration", "Position", "Bar"]:
-                            if current_note_id:
-                                token.note_id = current_note_id
-                                token.track_id = current_track_id
-                        else:
-                            token.note_id = None
-                            token.track_id = current_track_id
-        return tokens
-
-
-def add_notes_id_use_programs(tokens, notes, tokenizer):
-    notes_ids = []
-    i = 0
-    tracks_len = []
-
-    for row in notes:
-        tracks_len.append(len(row))
-        for _ in row:
-            notes_ids.append(i)
-            i += 1
-
-    note_to_track = []
-    current_track_id = 0
-
-    for track_len in tracks_len:
-        for _ in range(track_len):
-            note_to_track.append(current_track_id)
-        current_track_id += 1
-
-    if tokenizer in ["REMI", "Structured", "TSD"]:
-        i = -1
-        for token in tokens.events:
-            if token.type_ == "Pitch":
-                i += 1
-                current_note_id = notes_ids[i] + 1
-                current_track_id = note_to_track[i]
-                token.note_id = current_note_id
-                token.track_id = current_track_id
-            elif token.type_ in ["Velocity", "Duration", "MicroTiming"]:
-                if current_note_id is not None:
-                    token.note_id = current_note_id
-                    token.track_id = current_track_id
-            else:
-                token.note_id = None
-        return tokens
-
-    elif tokenizer == "CPWord":
-        i = -1
-        for token_list in tokens.events:
-            current_note_id = None
-            for token in token_list:
-                if token.type_ == "Pitch":
-                    i += 1
-                    current_note_id = notes_ids[i] + 1
-                    current_track_id = note_to_track[i]
-                    token.note_id = current_note_id
-                    token.track_id = current_track_id
-                elif token.type_ in ["Velocity", "Duration"]:
-                    if current_note_id is not None:
-                        token.note_id = current_note_id
-                        token.track_id = current_track_id
-                else:
-                    token.note_id = None
-                    token.track_id = current_track_id
-        return tokens
-
-    elif tokenizer == "MIDILike":
-        active_notes = {}
-        current_note_id = None
-        i = -1
-        for token in tokens.events:
-            if token.type_ == "NoteOn":
-                i += 1
-                current_note_id = notes_ids[i] + 1
-                current_track_id = note_to_track[i]
-                active_notes[token.value] = current_note_id
-                token.note_id = current_note_id
-                token.track_id = current_track_id
-            elif token.type_ == "Velocity":
-                if current_note_id:
-                    token.note_id = current_note_id
-                    token.track_id = current_track_id
-            elif token.type_ == "NoteOff":
-                if token.value in active_notes:
-                    token.note_id = active_notes.pop(token.value)
-                    token.track_id = current_track_id
-                else:
-                    token.note_id = None
-                    token.track_id = current_track_id
-                current_note_id = None
-            else:
-                token.note_id = None
-                token.track_id = current_track_id
-
-        return tokens
+    if 0 <= pitch < len(PITCH_NAMES):
+        return PITCH_NAMES[pitch]
+    return f"{NOTE_NAMES[pitch % 12]}{pitch // 12 - 1}"
@@ -0,0 +1,219 @@
+"""Links tokens to the notes they encode.
+
+Every tokenizer is described by a ``NoteIdDescriptor`` instead of its own loop: the token types starting a note, the
+types inheriting the note started last, the types closing a note by pitch (MIDILike) and, for compound tokens, the
+position of the pitch sub-token. Notes are numbered in the order of ``score_to_notes``, from 1 across all tracks, and
+the n-th note starting token gets the n-th note. Tracks follow from the prefix sums of the track lengths, so the
+tokens are walked once whatever the tokenizer.
+
+Tokens of a note get a ``note_id`` and a ``track_id`` attribute. The other single tokens only get a ``track_id``, the
+track of their sequence when there is one sequence per track and ``None`` when all programs share a single stream.
+Compound tokens not holding a note are left untouched. Both attributes serialize to ``null`` when missing.
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import accumulate
+from typing import TYPE_CHECKING, Any, Optional, Sequence
+
+from core.service.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    import miditok
+else:
+    miditok = lazy_import("miditok")
+
+
+_NOTE_ON, _INHERIT, _NOTE_OFF = 1, 2, 3
+
+
+@dataclass(frozen=True)
+class NoteIdDescriptor:
+    note_on: frozenset[str]
+    inherit: frozenset[str] = frozenset()
+    note_off: frozenset[str] = frozenset()
+    pitch_index: Optional[int] = None
+
+    @cached_property
+    def kinds(self) -> dict[str, int]:
+        return {
+            **{type_: _NOTE_OFF for type_ in self.note_off},
+            **{type_: _INHERIT for type_ in self.inherit},
+            **{type_: _NOTE_ON for type_ in self.note_on},
+        }
+
+
+_PITCHES = frozenset({"Pitch", "PitchDrum", "PitchIntervalTime", "PitchIntervalChord"})
+_FLAT = NoteIdDescriptor(_PITCHES, frozenset({"Velocity", "Duration", "MicroTiming"}))
+
+NOTE_ID_DESCRIPTORS: dict[str, NoteIdDescriptor] = {
+    "REMI": _FLAT,
+    "REMIPlus": _FLAT,
+    "TSD": _FLAT,
+    "Structured": _FLAT,
+    "PerTok": _FLAT,
+    "MMM": NoteIdDescriptor(
+        _PITCHES | {"NoteOn", "DrumOn"}, frozenset({"Velocity", "Duration", "MicroTiming"}), frozenset({"NoteOff"})
+    ),
+    "MIDILike": NoteIdDescriptor(
+        frozenset({"NoteOn", "DrumOn"}), frozenset({"Velocity"}), frozenset({"NoteOff", "DrumOff"})
+    ),
+    "CPWord": NoteIdDescriptor(_PITCHES, frozenset({"Velocity", "Duration"}), pitch_index=2),
+    "Octuple": NoteIdDescriptor(_PITCHES, frozenset({"Velocity", "Duration", "Position", "Bar"}), pitch_index=0),
+    "MuMIDI": NoteIdDescriptor(_PITCHES, frozenset({"Velocity", "Duration"}), pitch_index=0),
+}
+
+
+def assign_note_ids(tokens: Any, track_lengths: Sequence[int], tokenizer: str) -> Any:
+    """Set ``note_id`` and ``track_id`` on the events of ``tokens``, return ``tokens``.
+
+    ``tokens`` is the output of the tokenizer, a ``TokSequence`` for a single stream or a list with one per track,
+    ``track_lengths`` the number of notes of every track.
+    """
+    descriptor = NOTE_ID_DESCRIPTORS.get(tokenizer)
+    if descriptor is None:
+        raise ValueError(tokenizer)
+    per_track = isinstance(tokens, list)
+    numbering = _NoteNumbering(track_lengths)
+    for sequence in tokens if per_track else [tokens]:
+        events = sequence_events(sequence)
+        if events and isinstance(events[0], list):
+            _assign_compound(events, descriptor, numbering)
+        else:
+            _assign_single(events, descriptor, numbering, per_track)
+    return tokens
+
+
+def sequence_events(sequence: Any) -> list:
+    """Events of a token sequence, built from its token strings when the tokenizer only filled those (MuMIDI)."""
+    if not isinstance(sequence, miditok.TokSequence):
+        return sequence
+    if not sequence.events and sequence.tokens:
+        sequence.events = [
+            [_event_from_token(token) for token in entry] if isinstance(entry, list) else _event_from_token(entry)
+            for entry in sequence.tokens
+        ]
+    return sequence.events
+
+
+class _NoteNumbering:
+    """Position of the numbering across the sequences of a piece, the walks below advance it inline."""
+
+    def __init__(self, track_lengths: Sequence[int]) -> None:
+        # track t holds the notes numbered from track_starts[t] + 1 to track_starts[t + 1]
+        self.track_starts = list(accumulate(track_lengths, initial=0))
+        self.note_id = 0
+        self.track = 0
+
+    def track_of(self, note_id: int, track: int) -> int:
+        """Track of an already numbered note, searched backwards from ``track``."""
+        while note_id <= self.track_starts[track]:
+            track -= 1
+        return track
+
+
+def _assign_single(
+    events: "list[miditok.Event]", descriptor: NoteIdDescriptor, numbering: _NoteNumbering, per_track: bool
+) -> None:
+    kind_of = descriptor.kinds.get
+    note_on, inherit = _NOTE_ON, _INHERIT
+    closes_notes = bool(descriptor.note_off)
+    # the numbering is inlined in this loop, it runs once per token
+    track_starts = numbering.track_starts
+    note_count = track_starts[-1]
+    note_id = numbering.note_id
+    track = numbering.track
+    current_note = None
+    sequence_track = None
+    # notes waiting for their NoteOff by pitch, and by program when all programs share the sequence
+    active_notes: dict[Any, list[int]] = {}
+
+    for event in events:
+        kind = kind_of(event.type_)
+        if kind is None:
+            event.track_id = sequence_track
+        elif kind == note_on:
+            note_id += 1
+            if note_id > note_count:
+                current_note = None
+                event.track_id = sequence_track
+                continue
+            while note_id > track_starts[track + 1]:
+                track += 1
+            current_note = event.note_id = note_id
+            event.track_id = track
+            if per_track:
+                sequence_track = track
+            if closes_notes:
+                key = event.value if per_track else (event.program, event.value)
+                started = active_notes.get(key)
+                if started:
+                    started.append(note_id)
+                else:
+                    active_notes[key] = [note_id]
+        elif kind == inherit:
+            if current_note is not None:
+                event.note_id = current_note
+                event.track_id = track
+            else:
+                event.track_id = sequence_track
+        else:
+            started = active_notes.get(event.value if per_track else (event.program, event.value))
+            if started:
+                closed = event.note_id = started.pop(0)
+                event.track_id = track if closed > track_starts[track] else numbering.track_of(closed, track)
+            else:
+                event.track_id = sequence_track
+            current_note = None
+
+    numbering.note_id = note_id
+    numbering.track = track
+    if sequence_track is not None:
+        # tokens before the first note of a sequence belong to the track of that note
+        for event in events:
+            if kind_of(event.type_) == note_on:
+                break
+            event.track_id = sequence_track
+
+
+def _assign_compound(
+    groups: "list[list[miditok.Event]]", descriptor: NoteIdDescriptor, numbering: _NoteNumbering
+) -> None:
+    note_on = descriptor.note_on
+    inherit = descriptor.inherit
+    pitch_index = descriptor.pitch_index or 0
+    track_starts = numbering.track_starts
+    note_count = track_starts[-1]
+    note_id = numbering.note_id
+    track = numbering.track
+
+    for group in groups:
+        if len(group) <= pitch_index or group[pitch_index].type_ not in note_on:
+            continue
+        note_id += 1
+        if note_id > note_count:
+            continue
+        while note_id > track_starts[track + 1]:
+            track += 1
+        for event in group:
+            if event.type_ in inherit:
+                event.note_id = note_id
+            event.track_id = track
+        group[pitch_index].note_id = note_id
+
+    numbering.note_id = note_id
+    numbering.track = track
+
+
+def _event_from_token(token: str) -> "miditok.Event":
+    type_, _, value = token.partition("_")
+    return miditok.Event(type_, _parse_value(value))
+
+
+def _parse_value(value: str) -> Any:
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
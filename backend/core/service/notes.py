@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+from functools import cached_property
+from operator import attrgetter
+from typing import TYPE_CHECKING, Any, Iterable
+
+import numpy as np
+
+from core.api.model import Note
+
+if TYPE_CHECKING:
+    import symusic
+    from miditoolkit import MidiFile
+
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+# name of every MIDI pitch, e.g. PITCH_NAMES[60] == "C4"
+PITCH_NAMES = tuple(f"{NOTE_NAMES[pitch % 12]}{pitch // 12 - 1}" for pitch in range(128))
+
+NOTE_FIELDS = ("pitch", "start", "end", "velocity")
+_FIELD_DTYPES = {"pitch": np.uint8, "start": np.int64, "end": np.int64, "velocity": np.uint8}
+
+
+@dataclass
+class NoteStore:
+    """Notes of every track as one array per field, the notes of track t are the slice
+    ``track_starts[t]:track_starts[t + 1]`` of each array.
+
+    Note ids follow the array position: the note at index i has the id i + 1.
+    """
+
+    pitch: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    velocity: np.ndarray
+    track_lengths: np.ndarray
+
+    @classmethod
+    def from_midi(cls, midi: "MidiFile") -> "NoteStore":
+        track_notes = [instrument.notes for instrument in midi.instruments]
+        total = sum(len(notes) for notes in track_notes)
+        columns = {}
+        for name in NOTE_FIELDS:
+            getter = attrgetter(name)
+            values = (value for notes in track_notes for value in map(getter, notes))
+            columns[name] = np.fromiter(values, dtype=_FIELD_DTYPES[name], count=total)
+        return cls(**columns, track_lengths=np.array([len(notes) for notes in track_notes], dtype=np.int64))
+
+    @classmethod
+    def from_score(cls, score: "symusic.Score") -> "NoteStore":
+        """Notes of a symusic score, in its order. Each track hands its notes over as arrays, without note objects."""
+        tracks = [track.notes.numpy() for track in score.tracks]
+        columns = {
+            name: np.concatenate([track[name] for track in tracks]) if tracks else np.zeros(0, dtype=np.int64)
+            for name in ("pitch", "time", "duration", "velocity")
+        }
+        start = columns["time"].astype(np.int64)
+        return cls(
+            pitch=columns["pitch"].astype(np.uint8),
+            start=start,
+            end=start + columns["duration"],
+            velocity=columns["velocity"].astype(np.uint8),
+            track_lengths=np.array([len(track["time"]) for track in tracks], dtype=np.int64),
+        )
+
+    @classmethod
+    def from_notes(cls, notes: list[list[Note]]) -> "NoteStore":
+        columns = {
+            name: np.array([getattr(note, name) for track in notes for note in track], dtype=_FIELD_DTYPES[name])
+            for name in NOTE_FIELDS
+        }
+        return cls(**columns, track_lengths=np.array([len(track) for track in notes], dtype=np.int64))
+
+    @property
+    def track_count(self) -> int:
+        return len(self.track_lengths)
+
+    @cached_property
+    def track_starts(self) -> np.ndarray:
+        return np.concatenate((np.zeros(1, dtype=np.int64), np.cumsum(self.track_lengths, dtype=np.int64)))
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    def to_dicts(self, start: int = 0, stop: int | None = None) -> list[dict[str, Any]]:
+        """Notes ``start`` to ``stop`` (array positions) as dicts, in the order of the /process payload."""
+        part = slice(start, stop)
+        return self._dicts(part, range(start + 1, start + 1 + len(self.pitch[part])))
+
+    def take_dicts(self, positions: np.ndarray) -> list[dict[str, Any]]:
+        """Notes at the array ``positions`` as dicts, like ``to_dicts``."""
+        return self._dicts(positions, (positions + 1).tolist())
+
+    def _dicts(self, part: Any, note_ids: Iterable[int]) -> list[dict[str, Any]]:
+        names = PITCH_NAMES
+        return [
+            {
+                "pitch": pitch,
+                "name": names[pitch],
+                "start": begin,
+                "end": end,
+                "velocity": velocity,
+                "note_id": note_id,
+            }
+            for pitch, begin, end, velocity, note_id in zip(
+                self.pitch[part].tolist(),
+                self.start[part].tolist(),
+                self.end[part].tolist(),
+                self.velocity[part].tolist(),
+                note_ids,
+            )
+        ]
+
+    def track_dicts(self) -> list[list[dict[str, Any]]]:
+        notes = self.to_dicts()
+        starts = self.track_starts.tolist()
+        return [notes[starts[track] : starts[track + 1]] for track in range(self.track_count)]
+
+    def to_notes(self) -> list[list[Note]]:
+        return [
+            [Note(note["pitch"], note["name"], note["start"], note["end"], note["velocity"]) for note in track]
+            for track in self.track_dicts()
+        ]
@@ -0,0 +1,160 @@
+from typing import TYPE_CHECKING, Any, Callable, Sequence
+
+from core.api.model import ConfigModel, MusicInformationData
+from core.constants import STREAM_CHUNK_SIZE
+from core.service.columnar import ColumnarTokens, build_columnar_body, encode_columns
+from core.service.lazy_import import lazy_import
+from core.service.midi_parsing import ParsedMidi, parse_midi
+from core.service.midi_processing import retrieve_information_from_midi, tokenize_midi_file
+from core.service.serializer import render_ndjson_line, serialize_notes, serialize_tokens, tokens_to_builtins
+from core.service.timing import StageTimer
+
+if TYPE_CHECKING:
+    import miditok
+else:
+    miditok = lazy_import("miditok")
+
+
+JSON_FORMAT = "json"
+COLUMNAR_FORMAT = "columnar"
+
+# The public functions below run in the processing pool workers, so they only take and return picklable values.
+
+
+def tokens_stage(
+    config: ConfigModel, midi_bytes: bytes, output_format: str = JSON_FORMAT
+) -> tuple[Any, dict[str, float]]:
+    """Tokenize the upload, return the encoded tokens and notes with the stage timings.
+
+    Only the symusic score of the upload is loaded, so it can run next to ``metrics_stage`` in another worker.
+    """
+    timer = StageTimer()
+    with timer.stage("tokens_parse"):
+        parsed_midi = parse_midi(midi_bytes)
+        parsed_midi.score
+    return _encode_tokens(config, parsed_midi, timer, output_format), timer.timings
+
+
+def metrics_stage(midi_bytes: bytes, metric_names: Sequence[str] = ()) -> tuple[bytes, dict[str, float]]:
+    """Compute the music information of the upload with the extra ``metric_names``, return it serialized with the
+    stage timings.
+
+    Only the muspy view of the upload is built, so it can run next to ``tokens_stage`` in another worker.
+    """
+    timer = StageTimer()
+    with timer.stage("metrics_parse"):
+        parsed_midi = parse_midi(midi_bytes)
+        parsed_midi.music
+    metrics = _serialize_metrics(parsed_midi, timer, metric_names)
+    return metrics, timer.timings
+
+
+def process_midi(
+    config: ConfigModel, midi_bytes: bytes, output_format: str = JSON_FORMAT
+) -> tuple[bytes, dict[str, float]]:
+    """Run the whole /process pipeline on one parse, return the response body with the stage timings."""
+    timer = StageTimer()
+    with timer.stage("parse"):
+        parsed_midi = parse_midi(midi_bytes)
+    encoded_tokens = _encode_tokens(config, parsed_midi, timer, output_format)
+    metrics = _serialize_metrics(parsed_midi, timer, config.metrics)
+    return build_body(encoded_tokens, metrics, output_format), timer.timings
+
+
+def stream_stage(
+    send: Callable[[bytes], object], config: ConfigModel, midi_bytes: bytes, chunk_size: int = STREAM_CHUNK_SIZE
+) -> dict[str, float]:
+    """Compute what /process/stream sends and ``send`` it as newline-delimited JSON lines, each line as soon as it is
+    rendered, return the stage timings.
+
+    The metrics line comes first, then the tokens and notes of every track in chunks of ``chunk_size``, so only one
+    chunk is serialized at a time and clients can start rendering before the whole piece is sent::
+
+        {"type": "metrics", "data": {...}}
+        {"type": "tokens", "track": 0, "offset": 0, "data": [...]}
+        {"type": "notes", "track": 0, "offset": 0, "data": [...]}
+        {"type": "end"}
+
+    Tokenizers producing a single stream for all programs send all of their tokens as track 0.
+    """
+    timer = StageTimer()
+    with timer.stage("parse"):
+        parsed_midi = parse_midi(midi_bytes)
+    send(b'{"type":"metrics","data":%b}\n' % _serialize_metrics(parsed_midi, timer, config.metrics))
+    tokens, notes = tokenize_midi_file(config, parsed_midi, timer)
+    if tokens is None:
+        sequences = []
+    else:
+        sequences = tokens if isinstance(tokens, list) else [tokens]
+    track_starts = notes.track_starts.tolist()
+    with timer.stage("tokens_serialize"):
+        for track in range(max(len(sequences), notes.track_count)):
+            if track < len(sequences):
+                sequence = sequences[track]
+                events = sequence.events if isinstance(sequence, miditok.TokSequence) else sequence
+                for offset in range(0, len(events), chunk_size):
+                    send(
+                        render_ndjson_line(
+                            {
+                                "type": "tokens",
+                                "track": track,
+                                "offset": offset,
+                                "data": tokens_to_builtins(events[offset : offset + chunk_size]),
+                            }
+                        )
+                    )
+            if track < notes.track_count:
+                track_start, track_stop = track_starts[track], track_starts[track + 1]
+                for start in range(track_start, track_stop, chunk_size):
+                    send(
+                        render_ndjson_line(
+                            {
+                                "type": "notes",
+                                "track": track,
+                                "offset": start - track_start,
+                                "data": notes.to_dicts(start, min(start + chunk_size, track_stop)),
+                            }
+                        )
+                    )
+        send(b'{"type":"end"}\n')
+    return timer.timings
+
+
+def stream_midi(config: ConfigModel, midi_bytes: bytes, chunk_size: int = STREAM_CHUNK_SIZE) -> list[bytes]:
+    """Lines of ``stream_stage`` run in this process, a failure is reported as an error line."""
+    lines: list[bytes] = []
+    try:
+        stream_stage(lines.append, config, midi_bytes, chunk_size)
+    except Exception as e:
+        lines.append(render_ndjson_line({"type": "error", "error": str(e)}))
+    return lines
+
+
+def build_body(encoded_tokens: Any, metrics: bytes, output_format: str = JSON_FORMAT) -> bytes:
+    """Join the results of ``tokens_stage`` and ``metrics_stage`` into the response body."""
+    if output_format == COLUMNAR_FORMAT:
+        return build_columnar_body(encoded_tokens, metrics)
+    tokens, notes = encoded_tokens
+    return build_response_body(tokens, notes, metrics)
+
+
+def build_response_body(tokens: bytes, notes: bytes, metrics: bytes) -> bytes:
+    # same bytes as rendering the whole response dict at once, without decoding the parts again
+    return b'{"success":true,"data":{"tokens":%b,"notes":%b,"metrics":%b},"error":null}' % (tokens, notes, metrics)
+
+
+def _encode_tokens(
+    config: ConfigModel, parsed_midi: ParsedMidi, timer: StageTimer, output_format: str
+) -> tuple[bytes, bytes] | ColumnarTokens:
+    tokens, notes = tokenize_midi_file(config, parsed_midi, timer)
+    with timer.stage("tokens_serialize"):
+        if output_format == COLUMNAR_FORMAT:
+            return encode_columns(tokens, notes)
+        return serialize_tokens(tokens), serialize_notes(notes)
+
+
+def _serialize_metrics(parsed_midi: ParsedMidi, timer: StageTimer, metric_names: Sequence[str]) -> bytes:
+    with timer.stage("metrics"):
+        metrics: MusicInformationData = retrieve_information_from_midi(parsed_midi, metric_names)
+    with timer.stage("metrics_serialize"):
+        return metrics.model_dump_json().encode("utf-8")
@@ -0,0 +1,226 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Generic, Optional, Sequence, TypeVar
+
+from core.constants import (
+    PREWARM_TOKENIZERS,
+    PROCESS_POOL_MAX_PENDING,
+    PROCESS_POOL_START_METHOD,
+    PROCESS_POOL_TASK_TIMEOUT,
+    PROCESS_POOL_WORKERS,
+)
+from core.service.tokenizers.tokenizer_factory import warm_tokenizers
+
+T = TypeVar("T")
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+class ProcessingPool:
+    """Runs CPU-bound work off the event loop on a process pool with a bounded number of in-flight tasks.
+
+    Every worker process keeps its own warm ``TokenizerFactory`` cache. With ``max_workers=0`` tasks run on a
+    thread pool in this process instead, which is handy for development and tests. ``initializer`` runs in every
+    worker before its first task.
+
+    A worker that dies, e.g. killed for its memory, breaks the whole process pool. The tasks it had fail and the next
+    task starts a new pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        task_timeout: float,
+        start_method: str = "spawn",
+        initializer: Optional[Callable[..., object]] = None,
+        initargs: Sequence[Any] = (),
+    ) -> None:
+        self._max_workers = max_workers
+        self._max_pending = max_pending
+        self._task_timeout = task_timeout
+        self._start_method = start_method
+        self._initializer = initializer
+        self._initargs = tuple(initargs)
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def parallelism(self) -> int:
+        """Number of tasks that can make progress at the same time, threads share the GIL so they count as one."""
+        return max(self._max_workers, 1)
+
+    @property
+    def uses_processes(self) -> bool:
+        return self._max_workers > 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.uses_processes:
+                context = multiprocessing.get_context(self._start_method)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._max_workers,
+                    mp_context=context,
+                    initializer=self._initializer,
+                    initargs=self._initargs,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(initializer=self._initializer, initargs=self._initargs)
+        return self._executor
+
+    def _discard_executor(self, executor: Executor) -> None:
+        if self._executor is executor:
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, func: Callable[..., T], *args: Any) -> tuple[Executor, Future]:
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(func, *args)
+        except BrokenProcessPool:
+            # a worker died since the last task was done
+            self._discard_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(func, *args)
+
+    def acquire(self) -> None:
+        """Take one in-flight slot, work done outside the pool (e.g. streamed responses) must ``release`` it."""
+        with self._lock:
+            if self._pending >= self._max_pending:
+                raise PoolSaturatedError("Server is busy, try again later")
+            self._pending += 1
+
+    def release(self, _: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        self.acquire()
+        try:
+            executor, future = self._submit(func, *args)
+        except BaseException:
+            self.release()
+            raise
+        # the slot is only released once the worker is done, a timed out task keeps occupying it until it finishes
+        future.add_done_callback(self.release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._task_timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise
+
+    def stream(self, func: Callable[..., T], *args: Any) -> "TaskStream[T]":
+        """Run ``func(send, *args)`` like ``run``, the returned ``TaskStream`` yields every bytes passed to ``send``
+        while the task runs."""
+        return TaskStream(self, func, args)
+
+    async def warm_up(self) -> None:
+        """Start the workers now instead of on the first requests, their initializer included."""
+        executor = self._get_executor()
+        await asyncio.gather(*(asyncio.wrap_future(executor.submit(_ready)) for _ in range(self.parallelism)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class TaskStream(Generic[T]):
+    """Messages sent by a task running in a ``ProcessingPool``, received as they are sent.
+
+    The task writes its messages to a pipe drained by this async iterator, so neither process holds more than a few
+    of them. A task sending faster than they are read waits on the full pipe. The task keeps its in-flight slot and
+    timeout, and its errors are raised once the messages sent before them are received. ``result`` is what the task
+    returned once the iteration is over.
+
+    ``aclose`` closes the pipe, a task still sending stops on its next message.
+    """
+
+    def __init__(self, pool: ProcessingPool, func: Callable[..., T], args: tuple[Any, ...]) -> None:
+        self.result: Optional[T] = None
+        self._reader, self._writer = multiprocessing.Pipe(duplex=False)
+        self._started = False
+        self._task = asyncio.ensure_future(pool.run(_send_messages, func, self._writer, *args))
+        # a worker process gets its own end of the pipe, ours is closed once the task has it so that the pipe reports
+        # the end of the messages even if the worker dies, a thread shares ours and closes it itself
+        self._in_process = pool.uses_processes
+        if self._in_process:
+            self._task.add_done_callback(lambda _: self._writer.close())
+
+    def __aiter__(self) -> "TaskStream[T]":
+        return self
+
+    async def __anext__(self) -> bytes:
+        while not self._reader.closed:
+            if self._reader.poll():
+                try:
+                    message = self._reader.recv_bytes()
+                except (EOFError, OSError):
+                    # every end of the pipe the task could write to is closed
+                    break
+                if self._started:
+                    return message
+                # the first message only tells that the task has its end of the pipe
+                self._started = True
+                if self._in_process:
+                    self._writer.close()
+            elif self._task.done():
+                break
+            else:
+                await _readable(self._reader, self._task)
+        self._reader.close()
+        self.result = await self._task
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        self._reader.close()
+        if not self._task.done():
+            self._task.cancel()
+        elif not self._task.cancelled():
+            # errors of a task that is not iterated to its end are not raised
+            self._task.exception()
+
+
+async def _readable(reader: Connection, task: asyncio.Future) -> None:
+    """Wait until ``reader`` has something to receive or ``task`` is done."""
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+    loop.add_reader(reader.fileno(), lambda: readable.done() or readable.set_result(None))
+    try:
+        await asyncio.wait((readable, task), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        loop.remove_reader(reader.fileno())
+
+
+def _send_messages(func: Callable[..., T], writer: Connection, *args: Any) -> T:
+    with writer:
+        writer.send_bytes(b"")
+        return func(writer.send_bytes, *args)
+
+
+def _ready() -> None:
+    pass
+
+
+processing_pool = ProcessingPool(
+    PROCESS_POOL_WORKERS,
+    PROCESS_POOL_MAX_PENDING,
+    PROCESS_POOL_TASK_TIMEOUT,
+    PROCESS_POOL_START_METHOD,
+    initializer=warm_tokenizers if PREWARM_TOKENIZERS else None,
+    initargs=(PREWARM_TOKENIZERS,),
+)
@@ -0,0 +1,159 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from core.api.model import ConfigModel
+from core.constants import (
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_DISK,
+    RESULT_CACHE_DISK_MAX_BYTES,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_VERSION,
+)
+from core.service.cache import CacheStats, LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+def result_cache_key(midi_bytes: bytes, config: ConfigModel, variant: str = "json") -> str:
+    """Key of a cached response, ``variant`` tells apart different encodings of the same result."""
+    canonical_config = json.dumps(config.model_dump(), sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256()
+    digest.update(RESULT_CACHE_VERSION.encode("utf-8"))
+    digest.update(variant.encode("utf-8"))
+    digest.update(hashlib.sha256(midi_bytes).digest())
+    digest.update(canonical_config.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether ``If-None-Match`` lists ``etag``.
+
+    ``*`` is not a match, it would answer the first request for a result with an empty 304.
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+class DiskResultStore:
+    """Size-bounded directory of cached response bodies, the least recently used files are removed first.
+
+    Sizes and the order of use are kept in memory, the directory is only scanned when the store opens. A hit touches
+    its file, so a restarted store orders the files by their last use too. Server processes sharing a directory each
+    only count the files they wrote or found when they opened it.
+    """
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # size of every file by key, least recently used first
+        self._files: OrderedDict[str, int] = OrderedDict()
+        for key, size, _ in sorted(self._entries(), key=lambda entry: entry[2]):
+            self._files[key] = size
+        self._size = sum(self._files.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.body")
+
+    def _entries(self) -> list[tuple[str, int, float]]:
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".body"):
+                    stat = entry.stat()
+                    entries.append((entry.name.removesuffix(".body"), stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._size -= self._files.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._files:
+                self._files.move_to_end(key)
+        return body
+
+    def put(self, key: str, body: bytes) -> None:
+        if len(body) > self._max_bytes:
+            return
+        # written to a temporary file first so concurrent readers never see a partial body
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            with self._lock:
+                os.replace(tmp_path, self._path(key))
+                # a body written again for the same key replaces the old one instead of adding to it
+                self._size += len(body) - self._files.pop(key, 0)
+                self._files[key] = len(body)
+                self._prune()
+        except BaseException:
+            # a failed write or rename leaves no temporary file behind
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)
+            raise
+
+    def _prune(self) -> None:
+        while self._size > self._max_bytes:
+            key, size = self._files.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+
+class ResultCache:
+    """Content-addressed cache of serialized /process responses with an optional on-disk tier."""
+
+    def __init__(self, max_bytes: int, disk_store: Optional[DiskResultStore] = None) -> None:
+        self._memory: LRUCache[str, bytes] = LRUCache(max_bytes, weigher=len)
+        self._disk = disk_store
+
+    def get(self, key: str) -> Optional[bytes]:
+        body = self._memory.get(key)
+        if body is None and self._disk is not None:
+            body = self._disk.get(key)
+            if body is not None:
+                self._memory.put(key, body)
+        return body
+
+    def put(self, key: str, body: bytes) -> None:
+        self._memory.put(key, body)
+        if self._disk is not None:
+            try:
+                self._disk.put(key, body)
+            except OSError as e:
+                logger.warning({"message": "Couldn't write result to disk cache", "reason": e})
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> CacheStats:
+        return self._memory.stats()
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_MAX_BYTES,
+    DiskResultStore(RESULT_CACHE_DIR, RESULT_CACHE_DISK_MAX_BYTES) if RESULT_CACHE_DISK else None,
+)
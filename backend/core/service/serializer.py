@@ -1,18 +1,84 @@
 import json
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from miditok import Event, TokSequence
+import orjson
 
+from core.service.lazy_import import lazy_import
+from core.service.notes import NoteStore
 
-def get_serialized_tokens(tokens: list[TokSequence]) -> str:
+if TYPE_CHECKING:
+    import miditok
+else:
+    miditok = lazy_import("miditok")
+
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def get_serialized_tokens(tokens: "list[miditok.TokSequence]") -> str:
     return json.dumps(tokens, cls=TokSequenceEncoder)
 
 
+def render_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def serialize_tokens(tokens: Any) -> bytes:
+    """Serialize tokenizer output (a ``TokSequence``, a list of them, or nested lists of events) in one pass."""
+    return orjson.dumps(tokens_to_builtins(tokens), default=_default, option=ORJSON_OPTIONS)
+
+
+def serialize_notes(notes: NoteStore) -> bytes:
+    """Serialize the notes of every track, with note ids numbered from 1 across all tracks."""
+    return orjson.dumps(notes.track_dicts(), option=ORJSON_OPTIONS)
+
+
+def render_ndjson_line(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+def tokens_to_builtins(obj: Any) -> Any:
+    if isinstance(obj, miditok.TokSequence):
+        obj = obj.events
+    if isinstance(obj, list):
+        if obj and isinstance(obj[0], miditok.Event):
+            return [event_to_dict(event) for event in obj]
+        return [tokens_to_builtins(item) for item in obj]
+    if isinstance(obj, miditok.Event):
+        return event_to_dict(obj)
+    return obj
+
+
+def event_to_dict(event: "miditok.Event") -> dict[str, Any]:
+    # reads the instance dict directly, note_id and track_id are only set on events that belong to a note or a track
+    attributes = event.__dict__
+    return {
+        "type": attributes["type_"],
+        "value": attributes["value"],
+        "time": attributes["time"],
+        "program": attributes["program"],
+        "desc": attributes["desc"],
+        "note_id": attributes.get("note_id"),
+        "track_id": attributes.get("track_id"),
+    }
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (miditok.TokSequence, miditok.Event)):
+        return tokens_to_builtins(obj)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 class TokSequenceEncoder(json.JSONEncoder):
     def default(self, obj):
-        if isinstance(obj, TokSequence):
+        if isinstance(obj, miditok.TokSequence):
             return obj.events
-        if isinstance(obj, Event):
+        if isinstance(obj, miditok.Event):
             return {
                 "type": obj.type_,
                 "value": obj.value,
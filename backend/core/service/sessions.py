@@ -0,0 +1,265 @@
+"""Token sessions: a piece tokenized once and kept server side, served a window of the timeline at a time.
+
+``build_session`` runs in a processing pool worker and returns a ``TokenSession`` indexing the tokens of every
+sequence and the notes of every track by time, so a window is found with binary searches instead of a scan of the
+whole piece. Sessions are kept in ``session_store`` and expire ``SESSION_TTL`` seconds after their last use.
+"""
+
+import secrets
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+
+from core.api.model import ConfigModel
+from core.constants import SESSION_MAX_BYTES, SESSION_TTL
+from core.service.cache import LRUCache
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import retrieve_information_from_midi, tokenize_midi_file
+from core.service.note_ids import sequence_events
+from core.service.notes import NoteStore
+from core.service.serializer import render_json, tokens_to_builtins
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+
+if TYPE_CHECKING:
+    import symusic
+    from miditok import MusicTokenizer
+    from miditoolkit import MidiFile
+
+
+# rough in-memory size of a token dict and of a note, to bound the store by bytes
+_TOKEN_BYTES = 600
+_NOTE_BYTES = 40
+
+
+class SessionNotFoundError(Exception):
+    pass
+
+
+class SessionTooLargeError(Exception):
+    pass
+
+
+@dataclass
+class TrackNoteIndex:
+    """Positions of the notes of one track in the ``NoteStore`` arrays, in groups of notes whose durations share their
+    highest bit, each group sorted by start.
+
+    A window looks back in each group by the longest duration of the group, which is less than twice the shortest, so
+    one long note does not make the lookups of the short ones scan the whole track.
+    """
+
+    positions: list[np.ndarray]
+    starts: list[np.ndarray]
+    max_durations: list[int]
+
+    def overlapping(self, notes: NoteStore, start: int, end: int) -> np.ndarray:
+        """Positions of the notes sounding in ``[start, end)``, in order of start."""
+        found = [np.zeros(0, dtype=np.int64)]
+        for positions, starts, max_duration in zip(self.positions, self.starts, self.max_durations):
+            first, last = np.searchsorted(starts, (start - max_duration, end), side="left").tolist()
+            candidates = positions[first:last]
+            # notes without duration sound at their start
+            found.append(candidates[(notes.end[candidates] > start) | (notes.start[candidates] >= start)])
+        positions = np.sort(np.concatenate(found))
+        return positions[np.argsort(notes.start[positions], kind="stable")]
+
+
+@dataclass
+class TokenSession:
+    """Tokens and notes of a piece with the indexes answering window queries.
+
+    Token times are in the ticks of the tokenizer, which resamples the file to ``token_ticks_per_quarter``, windows
+    are asked in the ticks of the file like the notes.
+    """
+
+    tokens: list[list[Any]]
+    token_times: list[np.ndarray]
+    single_stream: bool
+    notes: NoteStore
+    note_indexes: list[TrackNoteIndex]
+    bar_starts: np.ndarray
+    ticks_per_quarter: int
+    token_ticks_per_quarter: int
+    metrics: bytes
+
+    @property
+    def bar_count(self) -> int:
+        return len(self.bar_starts) - 1
+
+    @property
+    def end_tick(self) -> int:
+        return int(self.bar_starts[-1])
+
+    def weight(self) -> int:
+        return sum(len(tokens) for tokens in self.tokens) * _TOKEN_BYTES + len(self.notes) * _NOTE_BYTES
+
+    def bar_range(self, start_bar: int, end_bar: int) -> tuple[int, int]:
+        """Ticks of the bars ``start_bar`` to ``end_bar`` (excluded), clamped to the piece."""
+        start_bar = min(max(start_bar, 0), self.bar_count)
+        end_bar = min(max(end_bar, start_bar), self.bar_count)
+        return int(self.bar_starts[start_bar]), int(self.bar_starts[end_bar])
+
+    def window(self, start: int, end: int) -> dict[str, Any]:
+        """Tokens and notes of every track in ``[start, end)`` ticks of the file.
+
+        Token lists start at ``token_offsets`` in their whole sequence, notes keep their ``note_id``.
+        """
+        # token ticks are coarser, a token is in the window when its time rounds into it
+        token_start = -(-start * self.token_ticks_per_quarter // self.ticks_per_quarter)
+        token_end = -(-end * self.token_ticks_per_quarter // self.ticks_per_quarter)
+        tokens, token_offsets = [], []
+        for sequence, times in zip(self.tokens, self.token_times):
+            first, last = np.searchsorted(times, (token_start, token_end), side="left").tolist()
+            tokens.append(sequence[first:last])
+            token_offsets.append(first)
+        notes = [self.notes.take_dicts(index.overlapping(self.notes, start, end)) for index in self.note_indexes]
+        if self.single_stream:
+            tokens, token_offsets = tokens[0], token_offsets[0]
+        return {"start": start, "end": end, "token_offsets": token_offsets, "tokens": tokens, "notes": notes}
+
+    def summary(self, session_id: str) -> bytes:
+        return b'{"session_id":%b,"ttl":%b,"ticks_per_quarter":%d,"bar_count":%d,"end_tick":%d,"metrics":%b}' % (
+            render_json(session_id),
+            render_json(SESSION_TTL),
+            self.ticks_per_quarter,
+            self.bar_count,
+            self.end_tick,
+            self.metrics,
+        )
+
+
+def build_session(config: ConfigModel, midi_bytes: bytes) -> TokenSession:
+    """Tokenize the upload and index the result, runs in a processing pool worker."""
+    parsed_midi = parse_midi(midi_bytes)
+    tokens, notes = tokenize_midi_file(config, parsed_midi)
+    metrics = retrieve_information_from_midi(parsed_midi, config.metrics).model_dump_json().encode("utf-8")
+    tokenizer = TokenizerFactory().get_cached_tokenizer(config)
+    token_ticks_per_quarter = resampled_ticks_per_quarter(tokenizer, parsed_midi.score)
+
+    single_stream = tokens is not None and not isinstance(tokens, list)
+    sequences = [] if tokens is None else (tokens if isinstance(tokens, list) else [tokens])
+    token_times = [
+        _token_times(sequence_events(sequence), notes, parsed_midi.midi, token_ticks_per_quarter)
+        for sequence in sequences
+    ]
+    return TokenSession(
+        tokens=[tokens_to_builtins(sequence) for sequence in sequences],
+        token_times=token_times,
+        single_stream=single_stream,
+        notes=notes,
+        note_indexes=note_indexes(notes),
+        bar_starts=bar_starts(parsed_midi.midi),
+        ticks_per_quarter=parsed_midi.midi.ticks_per_beat,
+        token_ticks_per_quarter=token_ticks_per_quarter,
+        metrics=metrics,
+    )
+
+
+def bar_starts(midi: "MidiFile") -> np.ndarray:
+    """Tick of the start of every bar, and of the end of the last one, following the time signature changes."""
+    ticks_per_quarter = midi.ticks_per_beat
+    signatures = [(change.time, change.numerator, change.denominator) for change in midi.time_signature_changes]
+    if not signatures or signatures[0][0] > 0:
+        signatures.insert(0, (0, 4, 4))
+    last_tick = midi.max_tick
+    starts = []
+    for (time, numerator, denominator), next_signature in zip(signatures, signatures[1:] + [None]):
+        bar_length = max(ticks_per_quarter * 4 * numerator // denominator, 1)
+        segment_end = next_signature[0] if next_signature is not None else last_tick + 1
+        starts.append(np.arange(time, max(segment_end, time + 1), bar_length))
+    bars = np.concatenate(starts)
+    return np.append(bars, bars[-1] + bar_length)
+
+
+def resampled_ticks_per_quarter(tokenizer: "MusicTokenizer", score: "symusic.Score") -> int:
+    """Ticks per quarter ``tokenizer`` resamples ``score`` to, found like ``preprocess_score`` does from the time
+    signatures the tokenizer supports, without preprocessing a copy of the score."""
+    config = tokenizer.config
+    if not config.use_time_signatures:
+        return config.max_num_pos_per_beat
+    signatures = [
+        (signature.time, signature.denominator)
+        for signature in score.time_signatures
+        if (signature.numerator, signature.denominator) in tokenizer.time_signatures
+    ]
+    # a score not starting with a supported time signature starts in 4/4
+    if not signatures or signatures[0][0] != 0:
+        signatures.insert(0, (0, 4))
+    return config.max_num_pos_per_beat * max(denominator for _, denominator in signatures) // 4
+
+
+def _token_times(events: list, notes: NoteStore, midi: "MidiFile", token_ticks_per_quarter: int) -> np.ndarray:
+    """Time of every token, in tokenizer ticks. Tokens built without a time (MuMIDI) take the start of their note
+    or the time of the token before them."""
+    times = np.array([(event[0] if isinstance(event, list) else event).time for event in events], dtype=np.int64)
+    if len(times) and times.min() < 0:
+        for position, event in enumerate(events):
+            if times[position] >= 0:
+                continue
+            note_id = _first_note_id(event)
+            if note_id is not None:
+                times[position] = notes.start[note_id - 1] * token_ticks_per_quarter // midi.ticks_per_beat
+            else:
+                times[position] = times[position - 1] if position else 0
+    # times only go forward within a sequence, the running maximum keeps the binary search valid if one does not
+    return np.maximum.accumulate(times) if len(times) else times
+
+
+def _first_note_id(event: Any) -> Optional[int]:
+    for sub_event in event if isinstance(event, list) else [event]:
+        note_id = sub_event.__dict__.get("note_id")
+        if note_id is not None:
+            return note_id
+    return None
+
+
+def note_indexes(notes: NoteStore) -> list[TrackNoteIndex]:
+    indexes = []
+    track_starts = notes.track_starts.tolist()
+    for track in range(notes.track_count):
+        positions = np.arange(track_starts[track], track_starts[track + 1])
+        starts = notes.start[positions]
+        durations = notes.end[positions] - starts
+        # the exponent of frexp is the bit length of the duration
+        groups = np.frexp(durations)[1]
+        order = np.lexsort((starts, groups))
+        splits = np.flatnonzero(np.diff(groups[order])) + 1
+        group_orders = np.split(order, splits) if len(order) else []
+        indexes.append(
+            TrackNoteIndex(
+                positions=[positions[group] for group in group_orders],
+                starts=[starts[group] for group in group_orders],
+                max_durations=[int(durations[group].max()) for group in group_orders],
+            )
+        )
+    return indexes
+
+
+class SessionStore:
+    """Sessions by id, bounded by their estimated size. Each use restarts the ttl of a session."""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self._max_bytes = max_bytes
+        self._sessions: LRUCache[str, TokenSession] = LRUCache(max_bytes, weigher=TokenSession.weight, ttl=ttl)
+
+    def add(self, session: TokenSession) -> str:
+        if session.weight() > self._max_bytes:
+            raise SessionTooLargeError("The piece is too large to be kept in a session")
+        session_id = secrets.token_urlsafe(16)
+        self._sessions.put(session_id, session)
+        return session_id
+
+    def get(self, session_id: str) -> TokenSession:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError("Session not found or expired")
+        self._sessions.put(session_id, session)
+        return session
+
+    def remove(self, session_id: str) -> None:
+        if self._sessions.pop(session_id) is None:
+            raise SessionNotFoundError("Session not found or expired")
+
+
+session_store = SessionStore(SESSION_MAX_BYTES, SESSION_TTL)
@@ -0,0 +1,181 @@
+"""Multi-resolution piano-roll tiles of the notes of a piece.
+
+Every track gets a pyramid of occupancy grids: one row per MIDI pitch and one column per ``ticks_per_column`` ticks,
+a cell holding the share of the column the pitch sounds in, from 0 to 255. The finest zoom level has a column per
+sixteenth note, every coarser level averages pairs of columns of the level below, and zoom 0 fits the whole piece in
+one tile. Pieces longer than ``TILE_MAX_COLUMNS`` sixteenths get wider columns at the finest level, so the memory of
+a pyramid does not grow with how late the last note ends. Levels are cut in tiles of ``TILE_COLUMNS`` columns, the
+last one padded with empty columns.
+
+Tiles are encoded once when the pyramid is built. Layout of a tile::
+
+    magic     4 bytes      b"MTKT"
+    length    uint32 LE    byte length of the header
+    header    JSON         {"version", "track", "zoom", "index", "start_tick", "ticks_per_column", "columns"}
+    data                   zlib stream of the uint8 grid, 128 rows of ``columns`` cells, pitch 0 first
+"""
+
+import hashlib
+import math
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any
+
+import numpy as np
+import orjson
+
+from core.constants import TILE_CACHE_MAX_BYTES, TILE_COLUMNS, TILE_MAX_COLUMNS
+from core.service.cache import LRUCache
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import score_to_notes
+from core.service.notes import NoteStore
+from core.service.serializer import render_json
+
+TILE_MEDIA_TYPE = "application/vnd.miditok.tile"
+TILE_MAGIC = b"MTKT"
+TILE_VERSION = 1
+# columns of the finest zoom level per quarter note
+_FINEST_COLUMNS_PER_QUARTER = 4
+_PITCHES = 128
+
+
+@dataclass
+class TilePyramid:
+    ticks_per_quarter: int
+    end_tick: int
+    track_count: int
+    # ticks per column of every zoom level, zoom 0 first
+    ticks_per_column: list[int]
+    tiles: dict[tuple[int, int, int], bytes] = field(default_factory=dict)
+
+    @property
+    def max_zoom(self) -> int:
+        return len(self.ticks_per_column) - 1
+
+    def weight(self) -> int:
+        return sum(len(tile) for tile in self.tiles.values())
+
+    def summary(self, tiles_id: str) -> dict[str, Any]:
+        return {
+            "tiles_id": tiles_id,
+            "ticks_per_quarter": self.ticks_per_quarter,
+            "end_tick": self.end_tick,
+            "track_count": self.track_count,
+            "tile_columns": TILE_COLUMNS,
+            "levels": [
+                {
+                    "zoom": zoom,
+                    "ticks_per_column": ticks_per_column,
+                    "tile_count": _tile_count(self.end_tick, ticks_per_column),
+                }
+                for zoom, ticks_per_column in enumerate(self.ticks_per_column)
+            ],
+        }
+
+
+tile_cache: LRUCache[str, TilePyramid] = LRUCache(TILE_CACHE_MAX_BYTES, weigher=TilePyramid.weight)
+
+
+def tiles_id_for(midi_bytes: bytes) -> str:
+    """Tiles only depend on the file, identical uploads share their pyramid."""
+    digest = hashlib.sha256(midi_bytes)
+    digest.update(b"%d:%d:%d" % (TILE_VERSION, TILE_COLUMNS, TILE_MAX_COLUMNS))
+    return digest.hexdigest()
+
+
+def build_tiles(midi_bytes: bytes) -> TilePyramid:
+    """Parse the upload and build its tile pyramid, runs in a processing pool worker."""
+    score = parse_midi(midi_bytes).score
+    return build_pyramid(score_to_notes(score), score.ticks_per_quarter)
+
+
+def build_pyramid(notes: NoteStore, ticks_per_quarter: int) -> TilePyramid:
+    end_tick = max(int(notes.end.max(initial=0)), 1)
+    finest_ticks = _finest_ticks(end_tick, ticks_per_quarter)
+    finest_tiles = _tile_count(end_tick, finest_ticks)
+    max_zoom = math.ceil(math.log2(finest_tiles)) if finest_tiles > 1 else 0
+    ticks_per_column = [finest_ticks << (max_zoom - zoom) for zoom in range(max_zoom + 1)]
+    pyramid = TilePyramid(ticks_per_quarter, end_tick, notes.track_count, ticks_per_column)
+
+    track_starts = notes.track_starts.tolist()
+    for track in range(notes.track_count):
+        part = slice(track_starts[track], track_starts[track + 1])
+        # the finest grid covers a power of two of tiles so every coarser level halves it exactly
+        occupancy = occupancy_grid(
+            notes.start[part], notes.end[part], notes.pitch[part], finest_ticks, TILE_COLUMNS << max_zoom
+        )
+        for zoom in range(max_zoom, -1, -1):
+            _encode_level(pyramid, track, zoom, occupancy)
+            occupancy = (occupancy[:, 0::2] + occupancy[:, 1::2]) / 2
+    return pyramid
+
+
+def occupancy_grid(
+    start: np.ndarray, end: np.ndarray, pitch: np.ndarray, ticks_per_column: int, columns: int
+) -> np.ndarray:
+    """Share of every column each pitch sounds in, a ``(128, columns)`` float array.
+
+    Overlapping notes of the same pitch add up, the share is capped at 1.
+    """
+    sounding = end > start
+    start, end, pitch = start[sounding].astype(np.int64), end[sounding].astype(np.int64), pitch[sounding]
+    first, last = start // ticks_per_column, (end - 1) // ticks_per_column
+    size = _PITCHES * (columns + 1)
+    row = pitch.astype(np.int64) * (columns + 1)
+
+    # ticks of every note in its first and last column, the single column of short notes counted once
+    covered = np.bincount(row + first, weights=np.minimum(end, (first + 1) * ticks_per_column) - start, minlength=size)
+    spans = last > first
+    covered += np.bincount(
+        row[spans] + last[spans], weights=end[spans] - last[spans] * ticks_per_column, minlength=size
+    )
+    # whole columns between the first and the last, as a difference array summed along time
+    steps = np.bincount(row[spans] + first[spans] + 1, minlength=size) - np.bincount(
+        row[spans] + last[spans], minlength=size
+    )
+    covered += np.cumsum(steps.reshape(_PITCHES, columns + 1), axis=1).reshape(-1) * ticks_per_column
+    return np.minimum(covered.reshape(_PITCHES, columns + 1)[:, :columns] / ticks_per_column, 1.0)
+
+
+def decode_tile(body: bytes) -> tuple[dict[str, Any], np.ndarray]:
+    """Header and ``(128, columns)`` uint8 grid of an encoded tile."""
+    if body[:4] != TILE_MAGIC:
+        raise ValueError("Not a piano-roll tile")
+    (header_length,) = struct.unpack_from("<I", body, 4)
+    header = orjson.loads(body[8 : 8 + header_length])
+    grid = np.frombuffer(zlib.decompress(body[8 + header_length :]), dtype=np.uint8)
+    return header, grid.reshape(_PITCHES, header["columns"])
+
+
+def _encode_level(pyramid: TilePyramid, track: int, zoom: int, occupancy: np.ndarray) -> None:
+    ticks_per_column = pyramid.ticks_per_column[zoom]
+    cells = np.rint(occupancy * 255).astype(np.uint8)
+    for index in range(_tile_count(pyramid.end_tick, ticks_per_column)):
+        header = render_json(
+            {
+                "version": TILE_VERSION,
+                "track": track,
+                "zoom": zoom,
+                "index": index,
+                "start_tick": index * TILE_COLUMNS * ticks_per_column,
+                "ticks_per_column": ticks_per_column,
+                "columns": TILE_COLUMNS,
+            }
+        )
+        data = np.ascontiguousarray(cells[:, index * TILE_COLUMNS : (index + 1) * TILE_COLUMNS]).tobytes()
+        pyramid.tiles[track, zoom, index] = TILE_MAGIC + struct.pack("<I", len(header)) + header + zlib.compress(data)
+
+
+def _finest_ticks(end_tick: int, ticks_per_quarter: int) -> int:
+    """Ticks per column of the finest level, a sixteenth note doubled until the level fits in ``TILE_MAX_COLUMNS``."""
+    ticks_per_column = max(ticks_per_quarter // _FINEST_COLUMNS_PER_QUARTER, 1)
+    # a power of two of tiles, the finest grid is padded to one
+    max_tiles = 1 << max(TILE_MAX_COLUMNS // TILE_COLUMNS, 1).bit_length() - 1
+    while _tile_count(end_tick, ticks_per_column) > max_tiles:
+        ticks_per_column *= 2
+    return ticks_per_column
+
+
+def _tile_count(end_tick: int, ticks_per_column: int) -> int:
+    return max(-(-end_tick // (ticks_per_column * TILE_COLUMNS)), 1)
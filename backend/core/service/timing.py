@@ -0,0 +1,26 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StageTimer:
+    """Collects wall times of named pipeline stages, in seconds."""
+
+    def __init__(self) -> None:
+        self.timings: dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def update(self, timings: dict[str, float]) -> None:
+        for name, duration in timings.items():
+            self.timings[name] = self.timings.get(name, 0.0) + duration
+
+
+def server_timing_header(timings: dict[str, float]) -> str:
+    return ", ".join(f"{name};dur={duration * 1000:.1f}" for name, duration in timings.items())
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING
+
+from core.api.model import ConfigModel
+from core.service.lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    import miditok
+else:
+    miditok = lazy_import("miditok")
+
+
+# ConfigModel fields that end up in the TokenizerConfig, anything else does not change the built tokenizer
+TOKENIZER_CONFIG_FIELDS = frozenset(
+    {
+        "pitch_range",
+        "num_velocities",
+        "special_tokens",
+        "use_chords",
+        "use_rests",
+        "use_tempos",
+        "use_time_signatures",
+        "use_sustain_pedals",
+        "use_pitch_bends",
+        "nb_tempos",
+        "tempo_range",
+        "log_tempos",
+        "delete_equal_successive_tempo_changes",
+        "sustain_pedal_duration",
+        "pitch_bend_range",
+        "delete_equal_successive_time_sig_changes",
+        "use_programs",
+        "use_microtiming",
+        "ticks_per_quarter",
+        "max_microtiming_shift",
+        "num_microtiming_bins",
+    }
+)
+
+
+def build_tokenizer_config(user_config: ConfigModel) -> "miditok.TokenizerConfig":
+    tokenizer_params = {
+        "pitch_range": tuple(user_config.pitch_range),
+        "beat_res": {(0, 4): 8, (4, 12): 4},
+        "num_velocities": user_config.num_velocities,
+        "special_tokens": user_config.special_tokens,
+        "use_chords": user_config.use_chords,
+        "use_rests": user_config.use_rests,
+        "use_tempos": user_config.use_tempos,
+        "use_time_signatures": user_config.use_time_signatures,
+        "use_sustain_pedals": user_config.use_sustain_pedals,
+        "use_pitch_bends": user_config.use_pitch_bends,
+        "nb_tempos": user_config.nb_tempos,
+        "tempo_range": tuple(user_config.tempo_range),
+        "log_tempos": user_config.log_tempos,
+        "delete_equal_successive_tempo_changes": user_config.delete_equal_successive_tempo_changes,
+        "sustain_pedal_duration": user_config.sustain_pedal_duration,
+        "pitch_bend_range": user_config.pitch_bend_range,
+        "delete_equal_successive_time_sig_changes": user_config.delete_equal_successive_time_sig_changes,
+        # added for pertok
+        "use_programs": user_config.use_programs,
+        "use_microtiming": user_config.use_microtiming,
+        "ticks_per_quarter": user_config.ticks_per_quarter,
+        "max_microtiming_shift": user_config.max_microtiming_shift,
+        "num_microtiming_bins": user_config.num_microtiming_bins,
+        # TODO: dynamic config preparation as not all tokenizers are compatible with program parameters
+        # "programs": list(range(user_config.programs[0], user_config.programs[1])),
+        # "one_token_stream_for_programs": user_config.one_token_stream_for_programs,
+        # "program_changes": user_config.program_changes,
+    }
+    return miditok.TokenizerConfig(**tokenizer_params)
+
+
+def tokenizer_cache_key(user_config: ConfigModel) -> str:
+    normalized = user_config.model_dump(include=set(TOKENIZER_CONFIG_FIELDS))
+    canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return f"{user_config.tokenizer}:{digest}"
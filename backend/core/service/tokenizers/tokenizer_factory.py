@@ -1,36 +1,56 @@
-from miditok import MusicTokenizer, TokenizerConfig
+import importlib
+import logging
+from typing import TYPE_CHECKING, Sequence
 
-from core.service.tokenizers.cpword_tokenizer import CPWordTokenizer
-from core.service.tokenizers.midilike_tokenizer import MIDILikeTokenizer
-from core.service.tokenizers.MMM_tokenizer import MMMTokenizer
-from core.service.tokenizers.muMIDI_tokenizer import MuMIDITokenizer
-from core.service.tokenizers.octuple_tokenizer import OctupleTokenizer
-from core.service.tokenizers.perTok_tokenizer import PerTokTokenizer
-from core.service.tokenizers.remi_tokenizer import REMITokenizer
-from core.service.tokenizers.structured_tokenizer import StructuredTokenizer
-from core.service.tokenizers.tsd_tokenizer import TSDTokenizer
+from core.api.model import ConfigModel
+from core.constants import DEFAULT_TOKENIZER_PARAMS, TOKENIZER_CACHE_SIZE
+from core.service.cache import LRUCache
+from core.service.tokenizers.tokenizer_config import build_tokenizer_config, tokenizer_cache_key
+
+if TYPE_CHECKING:
+    from miditok import MusicTokenizer, TokenizerConfig
+
+logger = logging.getLogger(__name__)
+
+# module and class of every tokenizer, imported with miditok when the first tokenizer of the kind is built
+TOKENIZER_CLASSES = {
+    "REMI": ("core.service.tokenizers.remi_tokenizer", "REMITokenizer"),
+    "MIDILike": ("core.service.tokenizers.midilike_tokenizer", "MIDILikeTokenizer"),
+    "TSD": ("core.service.tokenizers.tsd_tokenizer", "TSDTokenizer"),
+    "Structured": ("core.service.tokenizers.structured_tokenizer", "StructuredTokenizer"),
+    "CPWord": ("core.service.tokenizers.cpword_tokenizer", "CPWordTokenizer"),
+    "Octuple": ("core.service.tokenizers.octuple_tokenizer", "OctupleTokenizer"),
+    "MuMIDI": ("core.service.tokenizers.muMIDI_tokenizer", "MuMIDITokenizer"),  # Not used by frontend
+    "MMM": ("core.service.tokenizers.MMM_tokenizer", "MMMTokenizer"),  # Not used by frontend
+    "PerTok": ("core.service.tokenizers.perTok_tokenizer", "PerTokTokenizer"),
+}
 
 
 class TokenizerFactory:
-    def get_tokenizer(self, tokenizer_type: str, config: TokenizerConfig) -> MusicTokenizer:
-        match tokenizer_type:
-            case "REMI":
-                return REMITokenizer(config)
-            case "MIDILike":
-                return MIDILikeTokenizer(config)
-            case "TSD":
-                return TSDTokenizer(config)
-            case "Structured":
-                return StructuredTokenizer(config)
-            case "CPWord":
-                return CPWordTokenizer(config)
-            case "Octuple":
-                return OctupleTokenizer(config)
-            case "MuMIDI":
-                return MuMIDITokenizer(config)  # Not used by frontend
-            case "MMM":
-                return MMMTokenizer(config)  # Not used by frontend
-            case "PerTok":
-                return PerTokTokenizer(config)
-            case _:
-                raise ValueError(tokenizer_type)
+    # shared by all factory instances, tokenizers are only read after construction
+    cache: "LRUCache[str, MusicTokenizer]" = LRUCache(TOKENIZER_CACHE_SIZE)
+
+    def get_cached_tokenizer(self, user_config: ConfigModel) -> "MusicTokenizer":
+        return self.cache.get_or_create(
+            tokenizer_cache_key(user_config),
+            lambda: self.get_tokenizer(user_config.tokenizer, build_tokenizer_config(user_config)),
+        )
+
+    def get_tokenizer(self, tokenizer_type: str, config: "TokenizerConfig") -> "MusicTokenizer":
+        if tokenizer_type not in TOKENIZER_CLASSES:
+            raise ValueError(tokenizer_type)
+        module_name, class_name = TOKENIZER_CLASSES[tokenizer_type]
+        return getattr(importlib.import_module(module_name), class_name)(config)
+
+
+def warm_tokenizers(names: Sequence[str]) -> None:
+    """Build the ``names`` tokenizers with the default settings ahead of the first request.
+
+    Runs as the initializer of the pool workers, a failure is logged instead of breaking the pool.
+    """
+    factory = TokenizerFactory()
+    for name in names:
+        try:
+            factory.get_cached_tokenizer(ConfigModel(tokenizer=name, **DEFAULT_TOKENIZER_PARAMS))
+        except Exception as e:
+            logger.warning("Could not pre-build tokenizer %s: %s", name, e)
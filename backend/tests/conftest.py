@@ -0,0 +1,19 @@
+import copy
+
+import pytest
+
+from core.api.model import ConfigModel
+from core.constants import DEFAULT_TOKENIZER_PARAMS
+
+DEFAULT_CONFIG = {"tokenizer": "REMI", **DEFAULT_TOKENIZER_PARAMS}
+
+
+@pytest.fixture
+def config_dict() -> dict:
+    # the lists are shared with DEFAULT_TOKENIZER_PARAMS, tests get their own
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+
+@pytest.fixture
+def config(config_dict) -> ConfigModel:
+    return ConfigModel(**config_dict)
@@ -0,0 +1,201 @@
+"""The per-tokenizer note id loops replaced by ``core.service.note_ids``, kept as the reference of the equivalence
+tests."""
+
+
+def add_notes_id(tokens, notes, tokenizer):
+    notes_ids = []
+    i = 0
+    tracks_len = []
+    for row in notes:
+        tracks_len.append(len(row))
+        for _ in row:
+            notes_ids.append(i)
+            i += 1
+
+    note_to_track = []
+    current_track_id = 0
+    for track_len in tracks_len:
+        for _ in range(track_len):
+            note_to_track.append(current_track_id)
+        current_track_id += 1
+
+    if tokenizer in ["REMI", "PerTok", "Structured", "TSD"]:
+        i = -1
+        current_track_id = 0
+        for token_list in tokens:
+            for token in token_list.events:
+                if token.type_ == "Pitch":
+                    i += 1
+                    current_note_id = notes_ids[i] + 1
+                    current_track_id = note_to_track[i]
+                    token.note_id = current_note_id
+                    token.track_id = current_track_id
+                elif token.type_ in ["Velocity", "Duration", "MicroTiming"]:
+                    if current_note_id is not None:
+                        token.note_id = current_note_id
+                        token.track_id = current_track_id
+                else:
+                    token.note_id = None
+                    token.track_id = current_track_id
+        return tokens
+
+    elif tokenizer == "CPWord":
+        i = -1
+        for token_list in tokens:
+            current_note_id = None
+            for compound_token in token_list.events:
+                if compound_token[0].value == "Note":
+                    for token in compound_token:
+                        if token.type_ == "Pitch":
+                            i += 1
+                            current_note_id = notes_ids[i] + 1
+                            current_track_id = note_to_track[i]
+                            token.note_id = current_note_id
+                            token.track_id = current_track_id
+                        elif token.type_ in ["Velocity", "Duration"]:
+                            if current_note_id:
+                                token.note_id = current_note_id
+                                token.track_id = current_track_id
+                        else:
+                            token.note_id = None
+                            token.track_id = current_track_id
+        return tokens
+
+    elif tokenizer == "MIDILike":
+        active_notes = {}
+        current_note_id = None
+        i = -1
+        for token_list in tokens:
+            for token in token_list.events:
+                if token.type_ == "NoteOn":
+                    i += 1
+                    current_note_id = notes_ids[i] + 1
+                    current_track_id = note_to_track[i]
+                    active_notes[token.value] = current_note_id
+                    token.note_id = current_note_id
+                    token.track_id = current_track_id
+                elif token.type_ == "Velocity":
+                    if current_note_id:
+                        token.note_id = current_note_id
+                        token.track_id = current_track_id
+                elif token.type_ == "NoteOff":
+                    if token.value in active_notes:
+                        token.note_id = active_notes.pop(token.value)
+                        token.track_id = current_track_id
+                    else:
+                        token.note_id = None
+                        token.track_id = current_track_id
+                    current_note_id = None
+                else:
+                    token.note_id = None
+                    token.track_id = current_track_id
+        return tokens
+
+    elif tokenizer == "Octuple":
+        i = -1
+        for token_list in tokens:
+            current_note_id = None
+            for compound_token in token_list.events:
+                if compound_token[0].type_ in ["Pitch", "PitchDrum"]:
+                    for token in compound_token:
+                        if token.type_ == "Pitch":
+                            i += 1
+                            current_note_id = notes_ids[i] + 1
+                            current_track_id = note_to_track[i]
+                            token.note_id = current_note_id
+                            token.track_id = current_track_id
+                        elif token.type_ in ["Velocity", "Duration", "Position", "Bar"]:
+                            if current_note_id:
+                                token.note_id = current_note_id
+                                token.track_id = current_track_id
+                        else:
+                            token.note_id = None
+                            token.track_id = current_track_id
+        return tokens
+
+
+def add_notes_id_use_programs(tokens, notes, tokenizer):
+    notes_ids = []
+    i = 0
+    tracks_len = []
+
+    for row in notes:
+        tracks_len.append(len(row))
+        for _ in row:
+            notes_ids.append(i)
+            i += 1
+
+    note_to_track = []
+    current_track_id = 0
+
+    for track_len in tracks_len:
+        for _ in range(track_len):
+            note_to_track.append(current_track_id)
+        current_track_id += 1
+
+    if tokenizer in ["REMI", "Structured", "TSD"]:
+        i = -1
+        for token in tokens.events:
+            if token.type_ == "Pitch":
+                i += 1
+                current_note_id = notes_ids[i] + 1
+                current_track_id = note_to_track[i]
+                token.note_id = current_note_id
+                token.track_id = current_track_id
+            elif token.type_ in ["Velocity", "Duration", "MicroTiming"]:
+                if current_note_id is not None:
+                    token.note_id = current_note_id
+                    token.track_id = current_track_id
+            else:
+                token.note_id = None
+        return tokens
+
+    elif tokenizer == "CPWord":
+        i = -1
+        for token_list in tokens.events:
+            current_note_id = None
+            for token in token_list:
+                if token.type_ == "Pitch":
+                    i += 1
+                    current_note_id = notes_ids[i] + 1
+                    current_track_id = note_to_track[i]
+                    token.note_id = current_note_id
+                    token.track_id = current_track_id
+                elif token.type_ in ["Velocity", "Duration"]:
+                    if current_note_id is not None:
+                        token.note_id = current_note_id
+                        token.track_id = current_track_id
+                else:
+                    token.note_id = None
+                    token.track_id = current_track_id
+        return tokens
+
+    elif tokenizer == "MIDILike":
+        active_notes = {}
+        current_note_id = None
+        i = -1
+        for token in tokens.events:
+            if token.type_ == "NoteOn":
+                i += 1
+                current_note_id = notes_ids[i] + 1
+                current_track_id = note_to_track[i]
+                active_notes[token.value] = current_note_id
+                token.note_id = current_note_id
+                token.track_id = current_track_id
+            elif token.type_ == "Velocity":
+                if current_note_id:
+                    token.note_id = current_note_id
+                    token.track_id = current_track_id
+            elif token.type_ == "NoteOff":
+                if token.value in active_notes:
+                    token.note_id = active_notes.pop(token.value)
+                    token.track_id = current_track_id
+                else:
+                    token.note_id = None
+                    token.track_id = current_track_id
+                current_note_id = None
+            else:
+                token.note_id = None
+                token.track_id = current_track_id
+
+        return tokens
@@ -1,8 +1,12 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
 
+import core.api.api
 from core.api.api import app
 from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.processing_pool import ProcessingPool
 
 client = TestClient(app)
 
@@ -22,3 +26,45 @@ async def test_upload_file():
         form_data = {"file": file}
         response = client.post("/process", files=form_data)
         assert response.status_code == 422
+
+
+def test_process_stream(config_dict):
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as file:
+        response = client.post(
+            "/process/stream",
+            files={"file": ("example.mid", file, "audio/midi")},
+            data={"config": json.dumps(config_dict)},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.iter_lines()]
+    assert lines[0]["type"] == "metrics"
+    assert lines[-1] == {"type": "end"}
+    assert "upload" in response.headers["server-timing"]
+    assert core.api.api.processing_pool.pending == 0
+
+
+@pytest.mark.parametrize(
+    "midi_bytes, max_pending, task_timeout, status_code",
+    [
+        (b"MThd\x00\x00\x00\x06\x00\x01\x00\x01\x00\x60MTrk\x00\x00\x10\x00\x00\x90", 1, 5, 500),
+        (None, 0, 5, 503),
+        (None, 1, 0, 504),
+    ],
+)
+def test_process_stream_errors(monkeypatch, config_dict, midi_bytes, max_pending, task_timeout, status_code):
+    pool = ProcessingPool(max_workers=0, max_pending=max_pending, task_timeout=task_timeout)
+    monkeypatch.setattr(core.api.api, "processing_pool", pool)
+    if midi_bytes is None:
+        with open(EXAMPLE_MIDI_FILE_PATH, "rb") as file:
+            midi_bytes = file.read()
+
+    response = client.post(
+        "/process/stream",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    )
+
+    assert response.status_code == status_code
+    assert response.json()["success"] is False
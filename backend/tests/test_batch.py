@@ -0,0 +1,133 @@
+import asyncio
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+import core.api.api
+from core.api.api import app, read_batch
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service import batch
+from core.service.batch import BatchTooLargeError, process_batch, unpack_zip
+from core.service.processing_pool import ProcessingPool
+from core.service.result_cache import ResultCache
+
+client = TestClient(app)
+# a MIDI header without the tracks it announces
+BROKEN_MIDI = b"MThd\x00\x00\x00\x06\x00\x01\x00\x01\x00\x60"
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _zip(entries: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, data in entries.items():
+            zip_file.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _post_batch(config_dict, files):
+    return client.post("/process/batch", files=files, data={"config": json.dumps(config_dict)})
+
+
+def test_unpack_zip_keeps_midi_files_only(midi_bytes):
+    archive = _zip({"a.mid": midi_bytes, "notes.txt": b"x", "dir/b.MIDI": midi_bytes})
+
+    assert unpack_zip(archive) == [("a.mid", midi_bytes), ("dir/b.MIDI", midi_bytes)]
+
+
+def test_unpack_zip_checks_declared_size(monkeypatch, midi_bytes):
+    monkeypatch.setattr(batch, "BATCH_MAX_BYTES", len(midi_bytes))
+
+    with pytest.raises(BatchTooLargeError):
+        unpack_zip(_zip({"a.mid": midi_bytes, "b.mid": midi_bytes}))
+
+
+def test_process_batch(config_dict, midi_bytes):
+    expected = client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    ).json()
+
+    response = _post_batch(
+        config_dict,
+        [
+            ("files", ("example.mid", midi_bytes, "audio/midi")),
+            ("files", ("more.zip", _zip({"copy.mid": midi_bytes, "broken.mid": BROKEN_MIDI}), "application/zip")),
+        ],
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = {line["index"]: line for line in map(json.loads, response.iter_lines())}
+    assert sorted(lines) == [0, 1, 2]
+    assert [lines[index]["filename"] for index in range(3)] == ["example.mid", "copy.mid", "broken.mid"]
+    assert lines[0]["result"] == expected
+    assert lines[1]["result"] == expected
+    assert lines[2]["result"]["success"] is False
+
+
+@pytest.mark.parametrize(
+    "files",
+    [
+        [("files", ("a.mid", b"not a midi file", "audio/midi"))],
+        [("files", ("a.zip", _zip({"a.mid": b"not a midi file"}), "application/zip"))],
+    ],
+)
+def test_process_batch_rejects_files_that_are_not_midi(config_dict, files):
+    response = _post_batch(config_dict, files)
+
+    assert response.status_code == 400
+    assert response.json()["error"] == "a.mid: Not a MIDI file"
+
+
+def test_process_batch_waits_for_a_saturated_pool(config, midi_bytes):
+    pool = ProcessingPool(max_workers=0, max_pending=1, task_timeout=30)
+    cache = ResultCache(0)
+
+    async def process():
+        # another request holds the only slot for a moment
+        pool.acquire()
+        asyncio.get_running_loop().call_later(0.2, pool.release)
+        return [json.loads(line) async for line in process_batch(config, [("a.mid", midi_bytes)], pool, cache)]
+
+    (line,) = asyncio.run(process())
+    assert line["result"]["success"] is True
+
+
+def test_process_batch_rejects_unsupported_files(config_dict):
+    response = _post_batch(config_dict, [("files", ("a.txt", b"x", "text/plain"))])
+
+    assert response.status_code == 415
+
+
+def test_process_batch_rejects_too_many_files(monkeypatch, config_dict, midi_bytes):
+    monkeypatch.setattr(batch, "BATCH_MAX_FILES", 1)
+
+    response = _post_batch(config_dict, [("files", (f"{i}.mid", midi_bytes, "audio/midi")) for i in range(2)])
+
+    assert response.status_code == 413
+
+
+def test_read_batch_stops_at_the_byte_limit(monkeypatch, midi_bytes):
+    monkeypatch.setattr(core.api.api, "BATCH_MAX_BYTES", len(midi_bytes) * 3 // 2)
+    files = [
+        UploadFile(io.BytesIO(midi_bytes), filename=f"{i}.mid", headers=Headers({"content-type": "audio/midi"}))
+        for i in range(3)
+    ]
+
+    with pytest.raises(BatchTooLargeError):
+        asyncio.run(read_batch(files))
+
+    # reading stopped at the second file
+    assert files[2].file.tell() == 0
@@ -0,0 +1,96 @@
+import pytest
+
+from core.service.cache import LRUCache
+
+
+def test_lru_evicts_least_recently_used():
+    cache: LRUCache[str, int] = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_lru_counters():
+    cache: LRUCache[str, int] = LRUCache(1)
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.get("a")
+    cache.put("b", 2)
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.size, stats.capacity) == (1, 1, 1, 1, 1)
+
+
+def test_lru_get_or_create_calls_factory_once():
+    cache: LRUCache[str, object] = LRUCache(4)
+    calls = []
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    first = cache.get_or_create("key", factory)
+    second = cache.get_or_create("key", factory)
+    assert first is second
+    assert len(calls) == 1
+
+
+def test_lru_zero_capacity_disables_cache():
+    cache: LRUCache[str, int] = LRUCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_lru_negative_capacity():
+    with pytest.raises(ValueError):
+        LRUCache(-1)
+
+
+def test_lru_expires_entries_after_ttl():
+    now = [0.0]
+    cache: LRUCache[str, int] = LRUCache(4, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    now[0] = 5
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    now[0] = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    # putting again restarts the ttl
+    cache.put("b", 2)
+    now[0] = 19
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+
+def test_lru_contains_ignores_expired_entries():
+    now = [0.0]
+    cache: LRUCache[str, int] = LRUCache(4, weigher=lambda value: value, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    now[0] = 5
+    # putting again moves the entry behind the ones that expire first
+    cache.put("a", 1)
+
+    now[0] = 10
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.stats().weight == 1
+    now[0] = 15
+    assert "a" not in cache
+    assert cache.stats().weight == 0
+
+
+def test_lru_pop():
+    cache: LRUCache[str, int] = LRUCache(4, weigher=lambda value: value)
+    cache.put("a", 3)
+
+    assert cache.pop("a") == 3
+    assert cache.pop("a") is None
+    assert cache.stats().weight == 0
@@ -0,0 +1,68 @@
+import json
+
+import miditok
+import pytest
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.columnar import COLUMNAR_MEDIA_TYPE, build_columnar_body, decode_columnar, encode_columns
+from core.service.notes import NoteStore
+from core.service.pipeline import COLUMNAR_FORMAT, process_midi
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize(
+    "tokenizer,use_programs",
+    [("REMI", False), ("MIDILike", False), ("CPWord", False), ("Octuple", False), ("TSD", True), ("MuMIDI", False)],
+)
+def test_columnar_round_trip(config_dict, midi_bytes, tokenizer, use_programs):
+    config = ConfigModel(**{**config_dict, "tokenizer": tokenizer, "use_programs": use_programs})
+    json_body, _ = process_midi(config, midi_bytes)
+    columnar_body, _ = process_midi(config, midi_bytes, COLUMNAR_FORMAT)
+
+    assert decode_columnar(columnar_body) == json.loads(json_body)["data"]
+    assert len(columnar_body) < len(json_body)
+
+
+def test_values_equal_across_types_keep_their_type():
+    events = [miditok.Event("Pitch", value, 0, desc=desc) for value, desc in [(1, 1), (1.0, 1.0), (True, True)]]
+    notes = NoteStore.from_notes([])
+
+    tokens = decode_columnar(build_columnar_body(encode_columns(miditok.TokSequence(events=events), notes), b"{}"))[
+        "tokens"
+    ]
+
+    assert [(type(token["value"]), type(token["desc"])) for token in tokens] == [
+        (int, int),
+        (float, float),
+        (bool, bool),
+    ]
+    assert [token["value"] for token in tokens] == [1, 1.0, True]
+
+
+def test_decode_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        decode_columnar(b'{"success":true}')
+
+
+def test_process_negotiates_columnar_format(config_dict, midi_bytes):
+    response = client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+        headers={"Accept": COLUMNAR_MEDIA_TYPE},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    assert "Accept" in response.headers["Vary"]
+    assert decode_columnar(response.content)["metrics"]["resolution"] > 0
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.api.model import CompareModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.compare import compare_midi, prepare_comparison, tokenize_stage
+from core.service.pipeline import process_midi
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _post_compare(config_dict, tokenizers, midi_bytes):
+    return client.post(
+        "/process/compare",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict), "tokenizers": json.dumps(tokenizers)},
+    )
+
+
+def test_compare_model_configs(config):
+    compare = CompareModel.model_validate('["TSD", {"tokenizer": "MIDILike", "use_programs": true}]')
+
+    configs = compare.configs(config)
+
+    assert [c.tokenizer for c in configs] == ["TSD", "MIDILike"]
+    assert [c.use_programs for c in configs] == [False, True]
+    assert configs[0].pitch_range == config.pitch_range
+
+
+def test_process_compare_rejects_invalid_overrides(config_dict, midi_bytes):
+    response = _post_compare(config_dict, ["TSD", {"tokenizer": "REMI", "num_velocities": 1000}], midi_bytes)
+
+    assert response.status_code == 422
+    assert response.json() == {"success": False, "data": None, "error": "Invalid request parameters"}
+
+
+def test_compare_model_limits_tokenizers():
+    with pytest.raises(ValueError):
+        CompareModel.model_validate([])
+    with pytest.raises(ValueError):
+        CompareModel.model_validate(["BPE"])
+
+
+@pytest.mark.parametrize("tokenizer, use_programs", [("REMI", False), ("MIDILike", True), ("CPWord", False)])
+def test_tokenize_stage_matches_process(config, midi_bytes, tokenizer, use_programs):
+    config = config.model_copy(update={"tokenizer": tokenizer, "use_programs": use_programs})
+    expected = json.loads(process_midi(config, midi_bytes)[0])["data"]
+    score, track_lengths, notes, metrics, _ = prepare_comparison(midi_bytes)
+
+    entry, _ = tokenize_stage(config, score, track_lengths)
+    entry = json.loads(entry)
+
+    assert entry["tokens"] == expected["tokens"]
+    assert json.loads(notes) == expected["notes"]
+    assert json.loads(metrics) == expected["metrics"]
+    assert entry["summary"]["tokenizer"] == tokenizer
+    assert entry["summary"]["sequence_length"] == sum(entry["summary"]["sequence_lengths"])
+    assert entry["summary"]["vocab_size"] > 0
+
+
+def test_shared_score_is_not_modified(config, midi_bytes):
+    score, track_lengths, _, _, _ = prepare_comparison(midi_bytes)
+    before = score.dumps_midi()
+
+    tokenize_stage(config, score, track_lengths)
+
+    assert score.dumps_midi() == before
+
+
+def test_compare_midi_keeps_config_order(config, midi_bytes):
+    configs = CompareModel.model_validate(["TSD", "REMI", "TSD"]).configs(config)
+
+    body, timings = compare_midi(configs, midi_bytes)
+
+    results = json.loads(body)["data"]["results"]
+    assert [result["config"]["tokenizer"] for result in results] == ["TSD", "REMI", "TSD"]
+    assert results[0]["tokens"] == results[2]["tokens"]
+    assert {"parse", "notes", "metrics", "tokenize"} <= set(timings)
+
+
+def test_process_compare(config_dict, midi_bytes):
+    response = _post_compare(config_dict, ["REMI", {"tokenizer": "Octuple"}], midi_bytes)
+
+    assert response.status_code == 200
+    assert "Server-Timing" in response.headers
+    data = response.json()["data"]
+    assert [result["summary"]["tokenizer"] for result in data["results"]] == ["REMI", "Octuple"]
+    expected = _post_process(config_dict, midi_bytes)["data"]
+    assert data["results"][0]["tokens"] == expected["tokens"]
+    assert data["notes"] == expected["notes"]
+
+
+def test_process_compare_rejects_unsupported_files(config_dict):
+    response = client.post(
+        "/process/compare",
+        files={"file": ("a.txt", b"x", "text/plain")},
+        data={"config": json.dumps(config_dict), "tokenizers": '["REMI"]'},
+    )
+
+    assert response.status_code == 415
+
+
+def _post_process(config_dict, midi_bytes):
+    return client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    ).json()
@@ -0,0 +1,34 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+
+from core.api.errors import error_response
+from core.api.uploads import UploadTooLargeError
+from core.service.processing_pool import PoolSaturatedError
+
+
+def _body(response) -> dict:
+    return json.loads(response.body)
+
+
+def test_known_errors_get_their_status():
+    response = error_response(UploadTooLargeError("Uploads are limited to 1 bytes"))
+
+    assert response.status_code == 413
+    assert _body(response) == {"success": False, "data": None, "error": "Uploads are limited to 1 bytes"}
+
+
+def test_busy_and_timed_out():
+    busy = error_response(PoolSaturatedError("Server is busy, try again later"))
+    timed_out = error_response(asyncio.TimeoutError())
+
+    assert busy.status_code == 503 and busy.headers["retry-after"].isdigit()
+    assert timed_out.status_code == 504 and _body(timed_out)["error"] == "Processing timed out"
+
+
+def test_http_and_unknown_errors():
+    assert error_response(HTTPException(status_code=415, detail="Unsupported file type")).status_code == 415
+    response = error_response(ValueError("Unknown metric: loudness"))
+    assert response.status_code == 500
+    assert _body(response)["error"] == "Unknown metric: loudness"
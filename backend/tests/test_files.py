@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.files import FileStore, prepared_files, tokenize_file
+from core.service.result_cache import result_cache
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _upload(midi_bytes: bytes) -> str:
+    response = client.post("/files", files={"file": ("example.mid", midi_bytes, "audio/midi")})
+    assert response.status_code == 201
+    return response.json()["data"]["file_id"]
+
+
+def _process(midi_bytes: bytes, config_dict: dict) -> dict:
+    return client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    ).json()
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [{}, {"use_chords": False}, {"num_velocities": 8}, {"tokenizer": "TSD"}, {"metrics": ["pitch_entropy"]}],
+)
+def test_file_process_matches_process(config_dict, midi_bytes, changes):
+    file_id = _upload(midi_bytes)
+    config_dict = {**config_dict, **changes}
+    result_cache.clear()
+
+    response = client.post(f"/files/{file_id}/process", json=config_dict)
+
+    assert response.status_code == 200
+    assert "tokenize" in response.headers["server-timing"]
+    result_cache.clear()
+    assert response.json() == _process(midi_bytes, config_dict)
+
+
+def test_file_process_shares_etag_with_process(config_dict, midi_bytes):
+    file_id = _upload(midi_bytes)
+    etag = client.post(f"/files/{file_id}/process", json=config_dict).headers["etag"]
+
+    response = client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+        headers={"If-None-Match": etag},
+    )
+
+    assert response.status_code == 304
+
+
+def test_upload_and_delete(midi_bytes):
+    file_id = _upload(midi_bytes)
+    assert file_id == hashlib.sha256(midi_bytes).hexdigest()
+
+    assert client.delete(f"/files/{file_id}").status_code == 200
+    assert client.delete(f"/files/{file_id}").status_code == 404
+
+
+def test_unknown_file(config_dict):
+    response = client.post("/files/unknown/process", json=config_dict)
+
+    assert response.status_code == 404
+    assert response.json() == {"success": False, "data": None, "error": "File not found or expired"}
+
+
+def test_tokenize_file_parses_once(config, midi_bytes):
+    prepared_files.clear()
+
+    *_, timings = tokenize_file("abc", midi_bytes, config, True, [])
+    assert "parse" in timings and "metrics" in timings
+    tokens, notes, metrics, timings = tokenize_file(
+        "abc", midi_bytes, ConfigModel(**{**config.model_dump(), "use_chords": False}), False, None
+    )
+
+    assert "parse" not in timings and "metrics" not in timings
+    assert notes is None and metrics is None
+    assert json.loads(tokens)
+
+
+def test_file_store_keeps_results(midi_bytes):
+    store = FileStore(1024 * 1024, 60)
+    file_id, stored = store.add(midi_bytes)
+
+    store.add_results(file_id, b"[]", (), b"{}")
+    store.add_results(file_id, None, ("pitch_entropy",), b'{"a":1}')
+
+    stored = store.get(file_id)
+    assert stored.notes == b"[]"
+    assert stored.metrics == {(): b"{}", ("pitch_entropy",): b'{"a":1}'}
+    assert store._files.stats().weight == stored.weight()
@@ -0,0 +1,58 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.instrumentation import Counter, Histogram
+from core.service.result_cache import result_cache
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("stage_seconds", "Stage time.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "parse")
+    histogram.observe(0.1, "parse")
+    histogram.observe(3.0, "parse")
+
+    assert histogram.render() == [
+        "# HELP stage_seconds Stage time.",
+        "# TYPE stage_seconds histogram",
+        'stage_seconds_bucket{stage="parse",le="0.1"} 2',
+        'stage_seconds_bucket{stage="parse",le="1.0"} 2',
+        'stage_seconds_bucket{stage="parse",le="+Inf"} 3',
+        'stage_seconds_sum{stage="parse"} 3.15',
+        'stage_seconds_count{stage="parse"} 3',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("lookups_total", "Lookups.", ("result",))
+    counter.inc('a "b"')
+    counter.inc('a "b"', amount=2)
+
+    assert counter.render()[-1] == 'lookups_total{result="a \\"b\\""} 3.0'
+
+
+def test_process_reports_stages(config_dict):
+    result_cache.clear()
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        response = client.post(
+            "/process",
+            files={"file": ("example.mid", f.read(), "audio/midi")},
+            data={"config": json.dumps({**config_dict, "num_velocities": 31})},
+        )
+    assert response.status_code == 200
+    stages = {entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")}
+    assert {"upload", "parse", "tokenize", "note_ids", "metrics", "tokens_serialize", "total"} <= stages
+    assert stages & {"tokenizer_hit", "tokenizer_miss"}
+
+    metrics = client.get("/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = metrics.text.splitlines()
+    assert any(
+        line.startswith('miditok_stage_duration_seconds_count{endpoint="process",stage="note_ids"}') for line in lines
+    )
+    assert any(line.startswith("miditok_tokenizer_cache_lookups_total{") for line in lines)
+    assert 'miditok_request_duration_seconds_count{method="POST",route="/process",status="200"}' in metrics.text
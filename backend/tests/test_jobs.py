@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import core.api.api
+from core.api.api import app
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.jobs import (
+    DONE,
+    FAILED,
+    DiskJobStore,
+    Job,
+    JobRunner,
+    JobTooLargeError,
+    MemoryJobStore,
+    TooManyJobsError,
+)
+from core.service.processing_pool import ProcessingPool, processing_pool
+from core.service.result_cache import ResultCache, result_cache
+
+# a valid header chunk followed by a track chunk that ends too early
+BROKEN_MIDI = b"MThd\x00\x00\x00\x06\x00\x01\x00\x01\x00\x60MTrk\x00\x00\x10\x00\x00\x90"
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # the lifespan builds a runner for the event loop of every client
+    monkeypatch.setattr(
+        core.api.api,
+        "make_job_runner",
+        lambda: JobRunner(MemoryJobStore(1024 * 1024 * 1024, 60), processing_pool, result_cache, max_active=10),
+    )
+    # the lifespan keeps one event loop for the whole test, so jobs keep running between requests
+    with TestClient(app) as client:
+        yield client
+
+
+def _submit(client: TestClient, config_dict: dict, midi_bytes: bytes):
+    return client.post(
+        "/jobs",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    )
+
+
+def _wait(client: TestClient, job_id: str, timeout: float = 60) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        data = client.get(f"/jobs/{job_id}").json()["data"]
+        if data["status"] in (DONE, FAILED) or time.monotonic() > deadline:
+            return data
+        time.sleep(0.05)
+
+
+def test_job_returns_process_result(client, config_dict, midi_bytes):
+    result_cache.clear()
+    response = _submit(client, config_dict, midi_bytes)
+
+    assert response.status_code == 202
+    job = response.json()["data"]
+    assert job["status"] in ("queued", "running")
+    assert response.headers["location"] == f"/jobs/{job['job_id']}"
+
+    data = _wait(client, job["job_id"])
+    assert data["status"] == DONE
+    assert data["error"] is None
+    assert [stage["status"] for stage in data["stages"].values()] == [DONE, DONE]
+    assert "tokenize" in data["timings"]
+    expected = client.post(
+        "/process",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    ).json()
+    assert data["result"] == expected
+
+
+def test_job_of_cached_result_is_done_at_once(client, config_dict, midi_bytes):
+    _wait(client, _submit(client, config_dict, midi_bytes).json()["data"]["job_id"])
+
+    response = _submit(client, config_dict, midi_bytes)
+
+    assert response.json()["data"]["status"] == DONE
+    assert _wait(client, response.json()["data"]["job_id"])["result"]["success"] is True
+
+
+def test_failed_job(client, config_dict):
+    job_id = _submit(client, config_dict, BROKEN_MIDI).json()["data"]["job_id"]
+
+    data = _wait(client, job_id)
+
+    assert data["status"] == FAILED
+    assert data["error"] is not None
+    assert "result" not in data
+    # the other stage may still be running in its worker, it reports its own end
+    deadline = time.monotonic() + 60
+    while "running" in [stage["status"] for stage in data["stages"].values()] and time.monotonic() < deadline:
+        time.sleep(0.05)
+        data = client.get(f"/jobs/{job_id}").json()["data"]
+    assert FAILED in [stage["status"] for stage in data["stages"].values()]
+    assert "running" not in [stage["status"] for stage in data["stages"].values()]
+
+
+def test_unknown_job(client):
+    response = client.get("/jobs/unknown")
+
+    assert response.status_code == 404
+    assert response.json() == {"success": False, "data": None, "error": "Job not found or expired"}
+
+
+def test_job_encoding_round_trip():
+    job = Job("abc", status=DONE, timings={"tokenize": 0.5}, result=b'{"success":true}')
+
+    assert Job.decode(job.encode()) == job
+    assert json.loads(job.summary())["result"] == {"success": True}
+    assert Job.decode(Job("abc").encode()) == Job("abc")
+
+
+def test_disk_store_is_shared_and_expires(tmp_path):
+    now = [time.time()]
+    writer = DiskJobStore(str(tmp_path), ttl=60, clock=lambda: now[0])
+    reader = DiskJobStore(str(tmp_path), ttl=60, clock=lambda: now[0])
+    job = Job("abc", result=b"{}")
+
+    writer.put(job)
+    assert reader.get("abc") == job
+
+    os.utime(tmp_path / "abc.job", (now[0] - 61, now[0] - 61))
+    assert reader.get("abc") is None
+    # expired files are removed on a later write
+    now[0] += 10
+    writer.put(Job("def"))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["def.job"]
+
+
+def test_disk_store_removes_the_temporary_file_of_a_failed_write(monkeypatch, tmp_path):
+    store = DiskJobStore(str(tmp_path), ttl=60)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        store.put(Job("abc"))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_runner_limits_active_jobs(config, midi_bytes):
+    runner = JobRunner(MemoryJobStore(1024 * 1024, 60), ProcessingPool(0, 1, 5), ResultCache(1024), max_active=0)
+
+    async def submit():
+        runner.submit(config, midi_bytes)
+
+    with pytest.raises(TooManyJobsError):
+        asyncio.run(submit())
+
+
+def test_result_too_large_for_the_store_fails_the_job(config, midi_bytes):
+    store = MemoryJobStore(4096, 60)
+    runner = JobRunner(store, ProcessingPool(0, 2, 30), ResultCache(1024), max_active=1)
+
+    async def run():
+        job = runner.submit(config, midi_bytes)
+        await asyncio.gather(*runner._tasks)
+        return runner.get(job.job_id)
+
+    job = asyncio.run(run())
+
+    assert job.status == FAILED
+    assert job.error == "Job result is too large to keep"
+    assert job.result is None
+    with pytest.raises(JobTooLargeError):
+        store.put(Job("abc", result=b"x" * 4096))
+
+
+def test_memory_store_returns_snapshots(config: ConfigModel):
+    store = MemoryJobStore(1024 * 1024, 60)
+    job = Job("abc")
+    store.put(job)
+
+    job.status = DONE
+
+    assert store.get("abc").status == "queued"
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import threading
+
+from core.api.logging_middleware import LoggingMiddleware, QueuedLogging
+
+
+class ListHandler(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+        self.threads: set[int] = set()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+        self.threads.add(threading.get_ident())
+
+
+def _logger(name: str) -> tuple[logging.Logger, ListHandler]:
+    logger = logging.getLogger(name)
+    handler = ListHandler()
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger, handler
+
+
+def _call(app, logger: logging.Logger, sent: list[dict]) -> None:
+    scope = {"type": "http", "method": "GET", "path": "/x", "query_string": b"a=1", "client": ("1.2.3.4", 5)}
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        sent.append(message)
+
+    asyncio.run(LoggingMiddleware(app, logger=logger)(scope, receive, send))
+
+
+def test_body_chunks_are_passed_through_as_sent():
+    logger, handler = _logger("test.middleware.stream")
+    sent: list[dict] = []
+    forwarded_before_next_chunk = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"first", "more_body": True})
+        forwarded_before_next_chunk.append(len(sent))
+        await send({"type": "http.response.body", "body": b"second", "more_body": False})
+
+    _call(app, logger, sent)
+
+    assert forwarded_before_next_chunk == [2]
+    assert [message.get("body") for message in sent[1:]] == [b"first", b"second"]
+    assert any(name == b"x-api-request-id" for name, _ in sent[0]["headers"])
+    logged = handler.records[-1].msg
+    assert logged["request"] == {"method": "GET", "path": "/x?a=1", "ip": "1.2.3.4"}
+    assert logged["response"]["status_code"] == 200
+
+
+def test_unhandled_error_becomes_500():
+    logger, handler = _logger("test.middleware.error")
+
+    async def app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    sent: list[dict] = []
+    _call(app, logger, sent)
+
+    assert sent[0]["status"] == 500
+    assert handler.records[0].levelno == logging.ERROR
+    assert handler.records[-1].msg["response"]["status"] == "failed"
+
+
+def test_queued_logging_emits_on_listener_thread():
+    logger, handler = _logger("test.middleware.queue")
+    queued_logging = QueuedLogging(["test.middleware.queue"])
+    queued_logging.start()
+
+    logger.info("hello")
+    queued_logging.stop()
+
+    assert [record.getMessage() for record in handler.records] == ["hello"]
+    assert threading.get_ident() not in handler.threads
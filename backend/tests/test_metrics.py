@@ -0,0 +1,193 @@
+import json
+import math
+import random
+from typing import get_args
+
+import muspy
+import pytest
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.api.model import MetricName
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.metrics import BASE_METRICS, INTERMEDIATES
+from core.service.metrics import METRICS as REGISTERED_METRICS
+from core.service.metrics import (
+    Computation,
+    MetricContext,
+    MusicNotes,
+    compute_metrics,
+    drum_pattern_consistency,
+    empty_beat_rate,
+    n_pitches_used,
+    pitch_range,
+    polyphony,
+    polyphony_rate,
+)
+
+METRICS = [
+    (pitch_range, muspy.pitch_range),
+    (n_pitches_used, muspy.n_pitches_used),
+    (polyphony, muspy.polyphony),
+    (empty_beat_rate, muspy.empty_beat_rate),
+    (drum_pattern_consistency, muspy.drum_pattern_consistency),
+]
+EXTENDED_METRICS = {
+    "pitch_entropy": lambda music, _: muspy.pitch_entropy(music),
+    "pitch_class_entropy": lambda music, _: muspy.pitch_class_entropy(music),
+    "scale_consistency": lambda music, _: muspy.scale_consistency(music),
+    "polyphony_rate": lambda music, _: muspy.polyphony_rate(music),
+    "empty_measure_rate": muspy.empty_measure_rate,
+    "groove_consistency": muspy.groove_consistency,
+}
+
+client = TestClient(app)
+
+
+def _random_music(seed: int, resolution: int = 24) -> muspy.Music:
+    rng = random.Random(seed)
+    tracks = []
+    for _ in range(rng.randint(1, 4)):
+        notes = [
+            # overlapping, repeated, zero length and negative length notes are all in there
+            muspy.Note(rng.randrange(0, 400), rng.choice([60, 61, rng.randrange(128)]), rng.randint(-3, 60), 64)
+            for _ in range(rng.randrange(0, 60))
+        ]
+        tracks.append(muspy.Track(is_drum=rng.random() < 0.3, notes=notes))
+    music = muspy.Music(resolution=resolution, tracks=tracks)
+    if rng.random() < 0.3:
+        # lyrics past the last note lengthen the piece
+        tracks[0].lyrics.append(muspy.Lyric(500, "la"))
+    return music
+
+
+def _same(value, expected) -> bool:
+    if isinstance(expected, float) and math.isnan(expected):
+        return math.isnan(value)
+    return value == expected
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_metrics_match_muspy(seed):
+    music = _random_music(seed, resolution=random.Random(seed).choice([1, 6, 24, 480]))
+    notes = MusicNotes.from_music(music)
+
+    for metric, muspy_metric in METRICS:
+        assert _same(metric(notes), muspy_metric(music)), metric.__name__
+
+
+def test_metrics_match_muspy_on_example_file():
+    music = muspy.read(EXAMPLE_MIDI_FILE_PATH)
+    notes = MusicNotes.from_music(music)
+
+    for metric, muspy_metric in METRICS:
+        assert _same(metric(notes), muspy_metric(music)), metric.__name__
+
+
+def test_metrics_without_notes():
+    music = muspy.Music(resolution=24, tracks=[muspy.Track(), muspy.Track(is_drum=True)])
+
+    metrics = compute_metrics(music)
+
+    assert (metrics.pitch_range, metrics.n_pitches_used) == (0, 0)
+    assert (metrics.polyphony, metrics.empty_beat_rate, metrics.drum_pattern_consistency) == (0.0, 0.0, 0.0)
+
+
+def test_drums_only_pitch_range():
+    music = muspy.Music(resolution=24, tracks=[muspy.Track(is_drum=True, notes=[muspy.Note(0, 36, 10)])])
+
+    assert pitch_range(MusicNotes.from_music(music)) == muspy.pitch_range(music) == -127
+
+
+def test_music_without_tracks_raises_like_muspy():
+    with pytest.raises(ValueError):
+        compute_metrics(muspy.Music(resolution=24))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_extended_metrics_match_muspy(seed):
+    music = _random_music(seed, resolution=random.Random(seed).choice([1, 6, 24, 480]))
+    context = MetricContext(music)
+    measure_resolution = context.get("beat_grid").measure_resolution
+
+    values = context.evaluate(EXTENDED_METRICS)
+
+    for name, muspy_metric in EXTENDED_METRICS.items():
+        assert _same(values[name], muspy_metric(music, measure_resolution)), name
+
+
+def test_every_requestable_metric_is_registered():
+    assert set(get_args(MetricName)) == set(REGISTERED_METRICS) - set(BASE_METRICS)
+
+
+def test_intermediates_are_built_once(monkeypatch):
+    calls = []
+    beat_grid = INTERMEDIATES["beat_grid"]
+    monkeypatch.setitem(
+        INTERMEDIATES,
+        "beat_grid",
+        Computation(lambda *args: calls.append(1) or beat_grid.func(*args), beat_grid.requires),
+    )
+    context = MetricContext(muspy.read(EXAMPLE_MIDI_FILE_PATH))
+
+    context.base_metrics()
+    assert calls == []
+    context.evaluate(["empty_measure_rate", "groove_consistency"])
+    assert calls == [1]
+
+
+def test_polyphony_rate_of_a_late_note():
+    music = muspy.Music(resolution=96, tracks=[muspy.Track(notes=[muspy.Note(50_000_000, 60, 96)])])
+
+    assert polyphony_rate(MusicNotes.from_music(music)) == 0.0
+
+
+def test_unknown_metric():
+    with pytest.raises(ValueError):
+        MetricContext(muspy.read(EXAMPLE_MIDI_FILE_PATH)).evaluate(["loudness"])
+
+
+def test_note_density_and_track_stats():
+    music = muspy.Music(
+        resolution=4,
+        tracks=[
+            muspy.Track(program=1, notes=[muspy.Note(0, 60, 4), muspy.Note(2, 64, 2), muspy.Note(20, 62, 2)]),
+            muspy.Track(program=0, is_drum=True),
+        ],
+    )
+
+    values = MetricContext(music).evaluate(["note_density", "track_stats"])
+
+    # 4/4 at 4 ticks per beat: 16 ticks per measure
+    assert values["note_density"] == [2, 1]
+    assert values["track_stats"][0] == {
+        "name": None,
+        "program": 1,
+        "is_drum": False,
+        "note_count": 3,
+        "pitch_min": 60,
+        "pitch_max": 64,
+        "pitch_mean": 62.0,
+        "duration_mean": 8 / 3,
+    }
+    assert values["track_stats"][1]["note_count"] == 0
+    assert values["track_stats"][1]["pitch_mean"] is None
+
+
+def test_process_returns_requested_metrics_only(config_dict):
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        midi_bytes = f.read()
+
+    def process(requested):
+        response = client.post(
+            "/process",
+            files={"file": ("example.mid", midi_bytes, "audio/midi")},
+            data={"config": json.dumps({**config_dict, "metrics": requested})},
+        )
+        return response.json()["data"]["metrics"]
+
+    assert "extended_metrics" not in process([])
+    assert set(process(["scale_consistency", "note_density"])["extended_metrics"]) == {
+        "scale_consistency",
+        "note_density",
+    }
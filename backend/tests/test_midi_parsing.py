@@ -0,0 +1,71 @@
+from io import BytesIO
+
+import muspy
+import pytest
+import symusic
+from miditoolkit import MidiFile
+from mido import MidiFile as MidoMidiFile
+
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.midi_parsing import parse_midi, sort_notes
+from core.service.midi_processing import tokenize_midi_file
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _notes(midi: MidiFile) -> list[list[tuple[int, int, int, int]]]:
+    return [[(n.pitch, n.start, n.end, n.velocity) for n in inst.notes] for inst in midi.instruments]
+
+
+def test_miditoolkit_view_matches_direct_parse(midi_bytes):
+    expected = MidiFile(file=BytesIO(midi_bytes))
+    midi = parse_midi(midi_bytes).midi
+
+    assert midi.ticks_per_beat == expected.ticks_per_beat
+    assert midi.max_tick == expected.max_tick
+    assert [(t.tempo, t.time) for t in midi.tempo_changes] == [(t.tempo, t.time) for t in expected.tempo_changes]
+    assert [(i.program, i.is_drum, i.name) for i in midi.instruments] == [
+        (i.program, i.is_drum, i.name) for i in expected.instruments
+    ]
+    assert _notes(midi) == _notes(expected)
+
+
+@pytest.mark.parametrize("build_midi_first", [False, True])
+def test_muspy_view_matches_direct_parse(midi_bytes, build_midi_first):
+    expected = muspy.from_mido(MidoMidiFile(file=BytesIO(midi_bytes)))
+    parsed_midi = parse_midi(midi_bytes)
+    if build_midi_first:
+        # the miditoolkit conversion must leave the shared mido object untouched
+        parsed_midi.midi
+
+    assert parsed_midi.music.to_ordered_dict() == expected.to_ordered_dict()
+
+
+def test_score_is_loaded_from_the_upload(midi_bytes):
+    parsed_midi = parse_midi(midi_bytes)
+
+    expected = symusic.Score.from_midi(midi_bytes)
+    sort_notes(expected)
+    assert parsed_midi.score == expected
+    assert parsed_midi._mido is None
+
+
+def test_score_notes_are_sorted_like_the_tokenizers_sort_them(config):
+    score = symusic.Score(96)
+    track = symusic.Track("piano")
+    # symusic loads notes starting together in the order the file ends them, the shorter one first
+    track.notes.extend([symusic.Note(0, 96, 64, 90), symusic.Note(0, 48, 62, 100), symusic.Note(0, 96, 60, 80)])
+    score.tracks.append(track)
+    config = config.model_copy(update={"tokenizer": "REMI"})
+
+    parsed_midi = parse_midi(score.dumps_midi())
+    tokens, notes = tokenize_midi_file(config, parsed_midi)
+
+    notes = [(note.start, note.pitch, note.end, note.velocity) for note in notes.to_notes()[0]]
+    assert notes == sorted(notes)
+    pitches = {event.note_id: event.value for event in tokens[0].events if event.type_ == "Pitch"}
+    assert [pitches[note_id] for note_id in sorted(pitches)] == [pitch for _, pitch, _, _ in notes]
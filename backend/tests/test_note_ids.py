@@ -0,0 +1,118 @@
+import glob
+import os
+
+import pytest
+from miditok import Event, TokSequence
+
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH, ROOT_DIR
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes
+from core.service.note_ids import NOTE_ID_DESCRIPTORS, assign_note_ids
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+from tests.legacy_note_ids import add_notes_id, add_notes_id_use_programs
+
+EXAMPLE_PATHS = sorted(glob.glob(os.path.join(ROOT_DIR, "..", "..", "example_files", "*.mid"))) + [
+    EXAMPLE_MIDI_FILE_PATH
+]
+# combinations the legacy loops annotated, the others returned None
+LEGACY_COMBINATIONS = [
+    (tokenizer, False) for tokenizer in ["REMI", "MIDILike", "TSD", "Structured", "CPWord", "Octuple", "PerTok"]
+] + [(tokenizer, True) for tokenizer in ["REMI", "MIDILike", "TSD", "Structured", "CPWord"]]
+
+
+def _tokenize(config: ConfigModel, midi_bytes: bytes):
+    midi = parse_midi(midi_bytes).midi
+    tokens = TokenizerFactory().get_cached_tokenizer(config)(midi)
+    return tokens, midi_to_notes(midi)
+
+
+def _flatten(tokens) -> list[Event]:
+    sequences = tokens if isinstance(tokens, list) else [tokens]
+    events = []
+    for sequence in sequences:
+        for entry in sequence.events:
+            events.extend(entry if isinstance(entry, list) else [entry])
+    return events
+
+
+@pytest.mark.parametrize("path", EXAMPLE_PATHS, ids=os.path.basename)
+@pytest.mark.parametrize("tokenizer,use_programs", LEGACY_COMBINATIONS)
+def test_note_ids_match_legacy(config_dict, path, tokenizer, use_programs):
+    config = ConfigModel(**{**config_dict, "tokenizer": tokenizer, "use_programs": use_programs})
+    with open(path, "rb") as f:
+        midi_bytes = f.read()
+    legacy = add_notes_id_use_programs if use_programs else add_notes_id
+
+    tokens, notes = _tokenize(config, midi_bytes)
+    expected = _flatten(legacy(tokens, notes.to_notes(), tokenizer))
+    tokens, notes = _tokenize(config, midi_bytes)
+    actual = _flatten(assign_note_ids(tokens, notes.track_lengths.tolist(), tokenizer))
+
+    assert [(e.type_, e.value) for e in actual] == [(e.type_, e.value) for e in expected]
+    # the legacy loop closed overlapping notes of the same pitch from the newest one and lost the oldest
+    compared = [i for i, e in enumerate(actual) if e.type_ != "NoteOff"]
+    assert [_note_id(actual[i]) for i in compared] == [_note_id(expected[i]) for i in compared]
+    # track ids of tokens outside notes are only consistent in the new engine
+    assert [actual[i].track_id for i in compared if _note_id(actual[i]) is not None] == [
+        expected[i].track_id for i in compared if _note_id(expected[i]) is not None
+    ]
+    note_on_pitches = {_note_id(e): e.value for e in actual if e.type_ == "NoteOn"}
+    assert all(note_on_pitches[_note_id(e)] == e.value for e in actual if e.type_ == "NoteOff" and _note_id(e))
+
+
+@pytest.mark.parametrize("tokenizer", ["Octuple", "PerTok", "MuMIDI"])
+def test_single_stream_tokenizers_are_annotated(config_dict, tokenizer):
+    config = ConfigModel(**{**config_dict, "tokenizer": tokenizer, "use_programs": True})
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        tokens, notes = _tokenize(config, f.read())
+
+    events = _flatten(assign_note_ids(tokens, notes.track_lengths.tolist(), tokenizer))
+
+    note_ids = [_note_id(e) for e in events if e.type_ == "Pitch"]
+    assert note_ids == list(range(1, len(note_ids) + 1))
+    assert {e.track_id for e in events if _note_id(e) is not None} == {0}
+
+
+def test_tokens_before_first_note_belong_to_its_track():
+    tokens = [
+        _sequence([Event("Bar", "None"), Event("Pitch", 60), Event("Velocity", 90)]),
+        _sequence([Event("Tempo", 120.0), Event("Pitch", 62), Event("TimeShift", "1.0.8"), Event("Pitch", 64)]),
+    ]
+
+    events = _flatten(assign_note_ids(tokens, [1, 2], "TSD"))
+
+    assert [(_note_id(e), e.track_id) for e in events] == [
+        (None, 0),
+        (1, 0),
+        (1, 0),
+        (None, 1),
+        (2, 1),
+        (None, 1),
+        (3, 1),
+    ]
+
+
+def test_note_off_closes_the_oldest_note_of_its_pitch():
+    tokens = _sequence(
+        [Event("NoteOn", 60), Event("NoteOn", 60), Event("NoteOff", 60), Event("NoteOff", 60), Event("NoteOff", 62)]
+    )
+
+    events = _flatten(assign_note_ids(tokens, [2], "MIDILike"))
+
+    assert [_note_id(e) for e in events] == [1, 2, 1, 2, None]
+
+
+def test_every_factory_tokenizer_has_a_descriptor():
+    assert {"REMI", "MIDILike", "TSD", "Structured", "CPWord", "Octuple", "MuMIDI", "MMM", "PerTok"} <= set(
+        NOTE_ID_DESCRIPTORS
+    )
+
+
+def _note_id(event: Event):
+    # events outside notes are left without a note id
+    return getattr(event, "note_id", None)
+
+
+def _sequence(events: list[Event]):
+    return TokSequence(events=events)
@@ -0,0 +1,78 @@
+import pytest
+from miditoolkit import Instrument, MidiFile
+from miditoolkit import Note as MidiNote
+
+from core.api.model import Note
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes, score_to_notes
+from core.service.notes import PITCH_NAMES, NoteStore
+
+
+def _legacy_notes(midi: MidiFile) -> list[list[Note]]:
+    names = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+    return [
+        [
+            Note(note.pitch, f"{names[note.pitch % 12]}{note.pitch // 12 - 1}", note.start, note.end, note.velocity)
+            for note in instrument.notes
+        ]
+        for instrument in midi.instruments
+    ]
+
+
+@pytest.fixture
+def midi() -> MidiFile:
+    midi = MidiFile()
+    for program, pitches in [(0, [60, 64]), (33, []), (40, [0, 127, 21])]:
+        instrument = Instrument(program)
+        instrument.notes = [MidiNote(100 - i, pitch, 10 * i, 10 * i + 5) for i, pitch in enumerate(pitches)]
+        midi.instruments.append(instrument)
+    return midi
+
+
+def test_pitch_names():
+    assert PITCH_NAMES[0] == "C-1"
+    assert PITCH_NAMES[60] == "C4"
+    assert PITCH_NAMES[127] == "G9"
+
+
+def test_note_store_matches_note_objects(midi):
+    notes = midi_to_notes(midi)
+
+    assert notes.track_count == 3
+    assert notes.track_starts.tolist() == [0, 2, 2, 5]
+    assert notes.to_notes() == _legacy_notes(midi)
+
+
+def test_note_store_on_example_file():
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        midi = parse_midi(f.read()).midi
+
+    assert midi_to_notes(midi).to_notes() == _legacy_notes(midi)
+
+
+def test_score_notes_match_midi_notes():
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        parsed_midi = parse_midi(f.read())
+
+    score_notes = score_to_notes(parsed_midi.score)
+    midi_notes = midi_to_notes(parsed_midi.midi)
+
+    assert score_notes.track_starts.tolist() == midi_notes.track_starts.tolist()
+    # simultaneous notes are ordered by duration and pitch in the score, by note off in the miditoolkit view
+    assert [sorted(map(vars, track), key=str) for track in score_notes.to_notes()] == [
+        sorted(map(vars, track), key=str) for track in midi_notes.to_notes()
+    ]
+
+
+def test_to_dicts_numbers_notes_by_position(midi):
+    notes = midi_to_notes(midi)
+
+    assert notes.to_dicts(3, 4) == [{"pitch": 127, "name": "G9", "start": 10, "end": 15, "velocity": 99, "note_id": 4}]
+    assert [[note["note_id"] for note in track] for track in notes.track_dicts()] == [[1, 2], [], [3, 4, 5]]
+
+
+def test_from_notes_round_trip(midi):
+    notes = _legacy_notes(midi)
+
+    assert NoteStore.from_notes(notes).to_notes() == notes
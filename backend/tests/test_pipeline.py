@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service import pipeline
+from core.service.pipeline import (
+    build_body,
+    build_response_body,
+    metrics_stage,
+    process_midi,
+    stream_midi,
+    tokens_stage,
+)
+from core.service.serializer import render_json
+from core.service.timing import StageTimer, server_timing_header
+
+
+def test_concurrent_stages_match_sequential_pipeline(config):
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        midi_bytes = f.read()
+
+    encoded_tokens, tokens_timings = tokens_stage(config, midi_bytes)
+    metrics, metrics_timings = metrics_stage(midi_bytes)
+    body, timings = process_midi(config, midi_bytes)
+
+    assert build_body(encoded_tokens, metrics) == body
+    assert {"tokens_parse", "tokenize", "tokens_serialize"} <= tokens_timings.keys()
+    assert {"metrics_parse", "metrics", "metrics_serialize"} <= metrics_timings.keys()
+    assert {"parse", "tokenize", "metrics"} <= timings.keys()
+
+
+def test_concurrent_stages_build_different_views(monkeypatch, config):
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        midi_bytes = f.read()
+    parsed = []
+    parse_midi = pipeline.parse_midi
+    monkeypatch.setattr(pipeline, "parse_midi", lambda data: parsed.append(parse_midi(data)) or parsed[-1])
+
+    tokens_stage(config, midi_bytes)
+    metrics_stage(midi_bytes)
+
+    tokens_midi, metrics_midi = parsed
+    assert tokens_midi._score is not None and tokens_midi._mido is None
+    assert metrics_midi._mido is not None and metrics_midi._score is None
+
+
+def test_build_response_body_matches_rendering_whole_response():
+    body = build_response_body(render_json([[{"a": 1}]]), render_json([[]]), render_json({"title": "ż"}))
+    expected = render_json(
+        {"success": True, "data": {"tokens": [[{"a": 1}]], "notes": [[]], "metrics": {"title": "ż"}}, "error": None}
+    )
+    assert body == expected
+    assert json.loads(body)["data"]["metrics"]["title"] == "ż"
+
+
+def test_stage_timer():
+    timer = StageTimer()
+    with timer.stage("parse"):
+        pass
+    timer.update({"parse": 1.0, "tokenize": 0.5})
+
+    assert timer.timings["parse"] >= 1.0
+    assert server_timing_header({"tokenize": 0.5}) == "tokenize;dur=500.0"
+
+
+@pytest.mark.parametrize("tokenizer,use_programs", [("REMI", False), ("CPWord", False), ("TSD", True)])
+def test_stream_matches_whole_response(config_dict, tokenizer, use_programs):
+    config = ConfigModel(**{**config_dict, "tokenizer": tokenizer, "use_programs": use_programs})
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        midi_bytes = f.read()
+    expected = json.loads(process_midi(config, midi_bytes)[0])["data"]
+
+    lines = [json.loads(line) for line in stream_midi(config, midi_bytes, chunk_size=100)]
+    assert lines[0] == {"type": "metrics", "data": expected["metrics"]}
+    assert lines[-1] == {"type": "end"}
+
+    tokens: dict[int, list] = {}
+    notes: dict[int, list] = {}
+    for line in lines[1:-1]:
+        target = tokens if line["type"] == "tokens" else notes
+        assert len(target.setdefault(line["track"], [])) == line["offset"]
+        target[line["track"]].extend(line["data"])
+
+    expected_tokens = expected["tokens"] if not use_programs else [expected["tokens"]]
+    assert [tokens[track] for track in sorted(tokens)] == expected_tokens
+    assert [notes.get(track, []) for track in range(len(expected["notes"]))] == expected["notes"]
+
+
+def test_stream_reports_errors(config):
+    lines = [json.loads(line) for line in stream_midi(config, b"MThd not a midi file")]
+    assert lines[-1]["type"] == "error"
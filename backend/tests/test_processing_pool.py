@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from fastapi.testclient import TestClient
+
+import core.api.api
+from core.api.api import app
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.processing_pool import PoolSaturatedError, ProcessingPool
+
+client = TestClient(app)
+
+
+def test_run_in_worker_process():
+    pool = ProcessingPool(max_workers=1, max_pending=1, task_timeout=30)
+    try:
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    finally:
+        pool.shutdown()
+
+
+def test_dead_worker_only_fails_its_task():
+    pool = ProcessingPool(max_workers=1, max_pending=1, task_timeout=30)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(pool.run(os._exit, 1))
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+
+        # a worker killed between tasks
+        os.kill(asyncio.run(pool.run(os.getpid)), signal.SIGKILL)
+        time.sleep(0.5)
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def _send_numbers(send, count, stop=None):
+    for number in range(count):
+        if number == stop:
+            os._exit(1)
+        send(b"%d" % number)
+    return count
+
+
+async def _receive(stream, count=None):
+    received = []
+    async for message in stream:
+        received.append(message)
+        if len(received) == count:
+            break
+    return received
+
+
+@pytest.mark.parametrize("max_workers", [0, 1])
+def test_stream_messages_while_the_task_runs(max_workers):
+    pool = ProcessingPool(max_workers=max_workers, max_pending=1, task_timeout=30)
+
+    async def receive():
+        stream = pool.stream(_send_numbers, 3)
+        return await _receive(stream), stream.result
+
+    try:
+        assert asyncio.run(receive()) == ([b"0", b"1", b"2"], 3)
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("max_workers", [0, 1])
+def test_closed_stream_stops_its_task(max_workers):
+    pool = ProcessingPool(max_workers=max_workers, max_pending=1, task_timeout=30)
+
+    async def receive():
+        stream = pool.stream(_send_numbers, 10**9)
+        received = await _receive(stream, 2)
+        await stream.aclose()
+        return received
+
+    try:
+        # the task would send far more than a pipe can hold
+        assert asyncio.run(receive()) == [b"0", b"1"]
+        deadline = time.monotonic() + 10
+        while pool.pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_stream_of_a_dead_worker_ends_with_its_error():
+    pool = ProcessingPool(max_workers=1, max_pending=1, task_timeout=30)
+    received = []
+
+    async def receive():
+        async for message in pool.stream(_send_numbers, 5, 2):
+            received.append(message)
+
+    try:
+        with pytest.raises(BrokenProcessPool):
+            asyncio.run(receive())
+        assert received == [b"0", b"1"]
+    finally:
+        pool.shutdown()
+
+
+def test_run_in_threads():
+    pool = ProcessingPool(max_workers=0, max_pending=1, task_timeout=5)
+    assert asyncio.run(pool.run(sum, [1, 2, 3])) == 6
+    assert pool.pending == 0
+
+
+def test_saturated_pool_rejects_tasks():
+    pool = ProcessingPool(max_workers=0, max_pending=1, task_timeout=5)
+
+    async def run_two():
+        first = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(time.sleep, 0)
+        await first
+
+    asyncio.run(run_two())
+    assert pool.pending == 0
+
+
+def test_task_timeout():
+    pool = ProcessingPool(max_workers=0, max_pending=1, task_timeout=0.05)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pool.run(time.sleep, 0.5))
+
+
+def test_health():
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_process_returns_503_when_saturated(monkeypatch, config_dict):
+    monkeypatch.setattr(core.api.api, "processing_pool", ProcessingPool(max_workers=0, max_pending=0, task_timeout=5))
+    core.api.api.result_cache.clear()
+
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as file:
+        response = client.post(
+            "/process",
+            files={"file": ("example.mid", file, "audio/midi")},
+            data={"config": json.dumps(config_dict)},
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"].isdigit()
+    assert response.json()["success"] is False
+
+
+def test_warm_up_runs_initializer():
+    calls = []
+    pool = ProcessingPool(max_workers=0, max_pending=1, task_timeout=5, initializer=calls.append, initargs=("ready",))
+    try:
+        asyncio.run(pool.warm_up())
+        assert calls == ["ready"]
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,120 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from core.api.api import app
+from core.api.model import ConfigModel
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.result_cache import (
+    DiskResultStore,
+    ResultCache,
+    etag_for,
+    etag_matches,
+    result_cache,
+    result_cache_key,
+)
+
+client = TestClient(app)
+
+
+def test_result_cache_key(config_dict):
+    config = ConfigModel(**config_dict)
+    assert result_cache_key(b"MThd", config) == result_cache_key(b"MThd", ConfigModel(**config_dict))
+    assert result_cache_key(b"MThd", config) != result_cache_key(b"MThd!", config)
+    assert result_cache_key(b"MThd", config) != result_cache_key(
+        b"MThd", ConfigModel(**{**config_dict, "tokenizer": "TSD"})
+    )
+
+
+def test_etag_matches():
+    etag = etag_for("abc")
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"other", "abc"', etag)
+    assert not etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_result_cache_memory_size_bound():
+    cache = ResultCache(max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"123456")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"123456"
+
+
+def test_result_cache_disk_tier(tmp_path):
+    cache = ResultCache(max_bytes=1024, disk_store=DiskResultStore(str(tmp_path), max_bytes=1024))
+    cache.put("key", b"body")
+
+    # a fresh memory tier is refilled from disk
+    restarted = ResultCache(max_bytes=1024, disk_store=DiskResultStore(str(tmp_path), max_bytes=1024))
+    assert restarted.get("key") == b"body"
+
+
+def test_disk_store_prunes_oldest(tmp_path):
+    store = DiskResultStore(str(tmp_path), max_bytes=8)
+    store.put("old", b"12345")
+    store.put("new", b"67890")
+    assert store.get("new") == b"67890"
+    assert store.get("old") is None
+
+
+def test_disk_store_prunes_least_recently_used(tmp_path):
+    store = DiskResultStore(str(tmp_path), max_bytes=10)
+    store.put("a", b"12345")
+    store.put("b", b"12345")
+    os.utime(tmp_path / "a.body", (0, 0))
+    os.utime(tmp_path / "b.body", (1, 1))
+
+    # the hit touches the file, a restarted store keeps it over the one not read since
+    assert store.get("a") == b"12345"
+    restarted = DiskResultStore(str(tmp_path), max_bytes=10)
+    restarted.put("c", b"12345")
+
+    assert restarted.get("a") == b"12345"
+    assert restarted.get("b") is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.body", "c.body"]
+
+
+def test_disk_store_size_counts_rewrites_once(tmp_path):
+    store = DiskResultStore(str(tmp_path), max_bytes=8)
+    for _ in range(3):
+        store.put("key", b"12345")
+
+    assert store._size == 5
+    assert store.get("key") == b"12345"
+
+
+def test_process_served_from_cache(config_dict):
+    result_cache.clear()
+
+    def post(headers=None):
+        with open(EXAMPLE_MIDI_FILE_PATH, "rb") as file:
+            return client.post(
+                "/process",
+                files={"file": ("example.mid", file, "audio/midi")},
+                data={"config": json.dumps(config_dict)},
+                headers=headers or {},
+            )
+
+    first = post()
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = post()
+    assert second.status_code == 200
+    assert second.headers["ETag"] == etag
+    assert second.content == first.content
+    assert result_cache.stats().hits == 1
+
+    not_modified = post({"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    result_cache.clear()
+    wildcard = post({"If-None-Match": "*"})
+    assert wildcard.status_code == 200
+    assert wildcard.content == first.content
@@ -0,0 +1,40 @@
+import json
+
+import numpy as np
+import pytest
+from miditok import Event
+
+from core.api.model import ConfigModel, Note
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.midi_processing import tokenize_midi_file
+from core.service.notes import NoteStore
+from core.service.serializer import TokSequenceEncoder, render_json, serialize_notes, serialize_tokens
+
+
+@pytest.mark.parametrize("tokenizer", ["REMI", "MIDILike", "CPWord", "Octuple"])
+def test_serialize_tokens_matches_encoder(config_dict, tokenizer):
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        tokens, _ = tokenize_midi_file(ConfigModel(**{**config_dict, "tokenizer": tokenizer}), f.read())
+
+    assert json.loads(serialize_tokens(tokens)) == json.loads(json.dumps(tokens, cls=TokSequenceEncoder))
+
+
+def test_serialize_event_with_note_id():
+    event = Event("Pitch", 60, time=0, program=0, desc="")
+    event.note_id = 1
+
+    assert json.loads(serialize_tokens([event])) == [
+        {"type": "Pitch", "value": 60, "time": 0, "program": 0, "desc": "", "note_id": 1, "track_id": None}
+    ]
+
+
+def test_serialize_notes_numbers_notes_across_tracks():
+    notes = [[Note(60, "C4", 0, 10, 100)], [Note(62, "D4", 0, 10, 90), Note(64, "E4", 10, 20, 80)]]
+    serialized = json.loads(serialize_notes(NoteStore.from_notes(notes)))
+
+    assert [[note["note_id"] for note in track] for track in serialized] == [[1], [2, 3]]
+    assert serialized[0][0] == {"pitch": 60, "name": "C4", "start": 0, "end": 10, "velocity": 100, "note_id": 1}
+
+
+def test_render_json_numpy_values():
+    assert render_json({"value": np.int64(3), "rate": np.float32(0.5)}) == b'{"value":3,"rate":0.5}'
@@ -0,0 +1,129 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from miditoolkit import MidiFile, TimeSignature
+
+from core.api.api import app
+from core.api.model import Note
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+from core.service.midi_parsing import parse_midi
+from core.service.notes import NoteStore
+from core.service.pipeline import process_midi
+from core.service.sessions import (
+    SessionNotFoundError,
+    SessionStore,
+    bar_starts,
+    build_session,
+    note_indexes,
+    resampled_ticks_per_quarter,
+)
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _overlapping(notes, start, end):
+    # notes without duration sound at their start
+    return [note for note in notes if note["start"] < end and (note["end"] > start or note["start"] >= start)]
+
+
+@pytest.mark.parametrize(
+    "tokenizer, use_programs", [("REMI", False), ("MIDILike", False), ("CPWord", False), ("TSD", True)]
+)
+def test_window_matches_whole_result(config, midi_bytes, tokenizer, use_programs):
+    config = config.model_copy(update={"tokenizer": tokenizer, "use_programs": use_programs})
+    whole = json.loads(process_midi(config, midi_bytes)[0])["data"]
+    session = build_session(config, midi_bytes)
+    start, end = session.bar_range(10, 14)
+
+    window = json.loads(json.dumps(session.window(start, end)))
+
+    for track, notes in enumerate(whole["notes"]):
+        expected = sorted(_overlapping(notes, start, end), key=lambda note: note["start"])
+        assert sorted(window["notes"][track], key=lambda note: note["start"]) == expected
+    sequences = [whole["tokens"]] if use_programs else whole["tokens"]
+    windows = [window["tokens"]] if use_programs else window["tokens"]
+    offsets = [window["token_offsets"]] if use_programs else window["token_offsets"]
+    assert any(windows)
+    for sequence, tokens, offset in zip(sequences, windows, offsets):
+        assert tokens == sequence[offset : offset + len(tokens)]
+
+
+def test_windows_cover_every_token_once(config, midi_bytes):
+    session = build_session(config, midi_bytes)
+
+    tokens = []
+    for bar in range(session.bar_count):
+        tokens.extend(session.window(*session.bar_range(bar, bar + 1))["tokens"][0])
+
+    assert tokens == session.tokens[0]
+
+
+def test_bar_starts_follow_time_signatures():
+    midi = MidiFile(ticks_per_beat=4)
+    midi.time_signature_changes = [TimeSignature(3, 4, 0), TimeSignature(6, 8, 24)]
+    midi.max_tick = 40
+
+    # 3/4 bars of 12 ticks until 24, then 6/8 bars of 12 ticks
+    assert bar_starts(midi).tolist() == [0, 12, 24, 36, 48]
+
+
+def test_session_store(config, midi_bytes):
+    store = SessionStore(max_bytes=1 << 30, ttl=60)
+    session_id = store.add(build_session(config, midi_bytes))
+
+    assert store.get(session_id).bar_count > 0
+    store.remove(session_id)
+    with pytest.raises(SessionNotFoundError):
+        store.get(session_id)
+
+
+def test_session_endpoints(config_dict, midi_bytes):
+    response = client.post(
+        "/sessions",
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    )
+    assert response.status_code == 201
+    summary = response.json()["data"]
+    session_id = summary["session_id"]
+    assert summary["bar_count"] > 0
+    assert "pitch_range" in summary["metrics"]
+
+    by_bar = client.get(f"/sessions/{session_id}/window", params={"start_bar": 2, "end_bar": 4}).json()["data"]
+    by_tick = client.get(
+        f"/sessions/{session_id}/window", params={"start": by_bar["start"], "end": by_bar["end"]}
+    ).json()["data"]
+    assert by_bar == by_tick
+    assert client.get(f"/sessions/{session_id}/window", params={"start": 0}).status_code == 400
+
+    assert client.delete(f"/sessions/{session_id}").status_code == 200
+    assert client.get(f"/sessions/{session_id}/window", params={"start": 0, "end": 10}).status_code == 404
+
+
+def test_note_windows_with_one_long_note():
+    short_notes = [Note(60 + index % 12, "", index * 10, index * 10 + 5, 100) for index in range(1000)]
+    notes = NoteStore.from_notes([[Note(40, "", 0, 10_000, 100), *short_notes]])
+    (index,) = note_indexes(notes)
+
+    # the short notes are looked up on their own, without going back to the long one
+    assert sorted(index.max_durations) == [5, 10_000]
+    for start, end in [(0, 10), (4_995, 5_030), (9_990, 10_000), (20_000, 30_000)]:
+        expected = _overlapping(notes.to_dicts(), start, end)
+        assert notes.take_dicts(index.overlapping(notes, start, end)) == expected
+
+
+@pytest.mark.parametrize("use_time_signatures", [False, True])
+def test_resampled_ticks_per_quarter(config, midi_bytes, use_time_signatures):
+    config = config.model_copy(update={"use_time_signatures": use_time_signatures})
+    tokenizer = TokenizerFactory().get_cached_tokenizer(config)
+    score = parse_midi(midi_bytes).score
+
+    assert resampled_ticks_per_quarter(tokenizer, score) == tokenizer.preprocess_score(score).ticks_per_quarter
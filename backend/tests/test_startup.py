@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+from core.api.model import ConfigModel
+from core.constants import DEFAULT_TOKENIZER_PARAMS
+from core.service.lazy_import import LazyModule
+from core.service.tokenizers.tokenizer_config import tokenizer_cache_key
+from core.service.tokenizers.tokenizer_factory import TokenizerFactory, warm_tokenizers
+
+# the server imported in about 2.5 s when it imported every library up front, the bare import takes about 0.5 s
+IMPORT_TIME_BUDGET = 1.5
+HEAVY_MODULES = ["muspy", "miditok", "miditoolkit", "mido", "symusic"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import core.api.api
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(name for name in {modules!r} if name in sys.modules))
+"""
+
+
+def test_api_import_is_fast_and_skips_heavy_modules():
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(modules=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed, loaded = result.stdout.splitlines()[-2:]
+    assert loaded == ""
+    assert float(elapsed) < IMPORT_TIME_BUDGET
+
+
+def test_lazy_module_imports_on_first_access():
+    module = LazyModule("json")
+    assert "not loaded" in repr(module)
+    assert module.loads("[1]") == [1]
+    assert "(loaded)" in repr(module)
+    assert module.dumps is sys.modules["json"].dumps
+
+
+def test_warm_tokenizers_fills_cache():
+    TokenizerFactory.cache.clear()
+    warm_tokenizers(["TSD", "NotATokenizer"])
+    config = ConfigModel(tokenizer="TSD", **DEFAULT_TOKENIZER_PARAMS)
+    assert tokenizer_cache_key(config) in TokenizerFactory.cache
+    assert len(TokenizerFactory.cache) == 1
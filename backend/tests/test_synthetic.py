@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from benchmarks.common import midi_to_bytes
+from benchmarks.synthetic import SyntheticSpec, generate_midi
+from core.service.pipeline import process_midi
+
+FULL_SPEC = SyntheticSpec(
+    notes=1_001,
+    tracks=3,
+    seed=7,
+    polyphony=4,
+    drums=True,
+    tempo_changes=5,
+    time_signature_changes=3,
+    pedals=True,
+    pitch_bends=True,
+)
+
+
+def test_generator_is_deterministic():
+    assert midi_to_bytes(generate_midi(FULL_SPEC)) == midi_to_bytes(generate_midi(FULL_SPEC))
+    assert midi_to_bytes(generate_midi(FULL_SPEC)) != midi_to_bytes(generate_midi(SyntheticSpec(notes=1_001, seed=8)))
+
+
+def test_generator_follows_spec():
+    midi = generate_midi(FULL_SPEC)
+
+    assert sum(len(instrument.notes) for instrument in midi.instruments) == FULL_SPEC.notes
+    assert [instrument.is_drum for instrument in midi.instruments] == [False, False, True]
+    assert len(midi.tempo_changes) == 6
+    assert len(midi.time_signature_changes) == 4
+    assert all(instrument.control_changes and instrument.pitch_bends for instrument in midi.instruments[:2])
+    onsets = {}
+    for note in midi.instruments[0].notes:
+        onsets[note.start] = onsets.get(note.start, 0) + 1
+    assert 1 < max(onsets.values()) <= FULL_SPEC.polyphony
+
+
+@pytest.mark.parametrize("tokenizer", ["REMI", "TSD", "MIDILike"])
+def test_pipeline_handles_every_feature(config, tokenizer):
+    config = config.model_copy(
+        update={
+            "tokenizer": tokenizer,
+            "use_programs": True,
+            "use_time_signatures": True,
+            "use_sustain_pedals": True,
+            "use_pitch_bends": True,
+        }
+    )
+    data = json.loads(process_midi(config, midi_to_bytes(generate_midi(FULL_SPEC)))[0])["data"]
+
+    assert sum(map(len, data["notes"])) == FULL_SPEC.notes
+    assert {"Pedal", "PitchBend", "TimeSig", "Tempo"} <= {token["type"] for token in data["tokens"]}
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from miditoolkit import Instrument, MidiFile
+from miditoolkit import Note as MidiNote
+
+from benchmarks.common import midi_to_bytes
+from core.api.api import app
+from core.constants import EXAMPLE_MIDI_FILE_PATH, TILE_COLUMNS, TILE_MAX_COLUMNS
+from core.service.midi_parsing import parse_midi
+from core.service.midi_processing import midi_to_notes
+from core.service.tiles import TILE_MEDIA_TYPE, build_tiles, decode_tile, occupancy_grid
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _brute_force_grid(start, end, pitch, ticks_per_column, columns):
+    ticks = np.zeros((128, columns * ticks_per_column))
+    for note_start, note_end, note_pitch in zip(start, end, pitch):
+        ticks[note_pitch, note_start:note_end] += 1
+    return np.minimum(ticks.reshape(128, columns, ticks_per_column).sum(axis=2) / ticks_per_column, 1.0)
+
+
+def test_occupancy_grid_matches_brute_force():
+    rng = np.random.default_rng(0)
+    start = rng.integers(0, 900, 300)
+    end = start + rng.integers(0, 100, 300)
+    pitch = rng.integers(40, 50, 300)
+
+    grid = occupancy_grid(start, end, pitch, 10, 100)
+
+    np.testing.assert_allclose(grid, _brute_force_grid(start, end, pitch, 10, 100))
+
+
+def test_pyramid_levels(midi_bytes):
+    pyramid = build_tiles(midi_bytes)
+    midi = parse_midi(midi_bytes).midi
+    notes = midi_to_notes(midi)
+
+    assert pyramid.track_count == notes.track_count
+    assert pyramid.ticks_per_column[-1] == midi.ticks_per_beat // 4
+    assert (0, 0, 1) not in pyramid.tiles
+    finest_tiles = pyramid.summary("")["levels"][-1]["tile_count"]
+    for track in range(pyramid.track_count):
+        finest = np.concatenate(
+            [decode_tile(pyramid.tiles[track, pyramid.max_zoom, index])[1] for index in range(finest_tiles)], axis=1
+        )
+        part = slice(*notes.track_starts[track : track + 2])
+        expected = occupancy_grid(
+            notes.start[part], notes.end[part], notes.pitch[part], pyramid.ticks_per_column[-1], finest.shape[1]
+        )
+        np.testing.assert_array_equal(finest, np.rint(expected * 255))
+
+        header, whole = decode_tile(pyramid.tiles[track, 0, 0])
+        assert header["ticks_per_column"] == pyramid.ticks_per_column[0]
+        assert whole.shape == (128, TILE_COLUMNS)
+        # zoom 0 averages the finest level, rounding aside
+        assert abs(int(whole.sum()) * 2**pyramid.max_zoom - int(finest.sum())) < finest.size // 2
+
+
+def test_tile_endpoints(midi_bytes):
+    response = client.post("/tiles", files={"file": ("example.mid", midi_bytes, "audio/midi")})
+    assert response.status_code == 200
+    summary = response.json()["data"]
+    assert summary["levels"][0]["tile_count"] == 1
+    tiles_id = summary["tiles_id"]
+
+    tile = client.get(f"/tiles/{tiles_id}/0/1/0")
+    assert tile.status_code == 200
+    assert tile.headers["content-type"] == TILE_MEDIA_TYPE
+    assert decode_tile(tile.content)[0]["zoom"] == 1
+    assert client.get(f"/tiles/{tiles_id}/0/1/0", headers={"If-None-Match": tile.headers["etag"]}).status_code == 304
+
+    assert client.get(f"/tiles/{tiles_id}/0/0/1").status_code == 404
+    assert client.get("/tiles/unknown/0/0/0").status_code == 404
+    assert client.post("/tiles", files={"file": ("example.txt", b"text", "text/plain")}).status_code == 415
+
+
+def test_late_note_keeps_the_pyramid_small():
+    midi = MidiFile(ticks_per_beat=96)
+    instrument = Instrument(0)
+    instrument.notes.append(MidiNote(100, 60, 50_000_000, 50_000_096))
+    midi.instruments.append(instrument)
+
+    pyramid = build_tiles(midi_to_bytes(midi))
+
+    finest_tiles = pyramid.summary("")["levels"][-1]["tile_count"]
+    assert finest_tiles * TILE_COLUMNS <= TILE_MAX_COLUMNS
+    assert pyramid.ticks_per_column[-1] * TILE_MAX_COLUMNS >= pyramid.end_tick
+    _, grid = decode_tile(pyramid.tiles[0, pyramid.max_zoom, finest_tiles - 1])
+    assert grid[60].any()
@@ -1,6 +1,8 @@
 import pytest
 from miditok import TokenizerConfig
 
+from core.api.model import ConfigModel
+from core.service.tokenizers.tokenizer_config import tokenizer_cache_key
 from core.service.tokenizers.tokenizer_factory import TokenizerFactory
 
 
@@ -49,3 +51,25 @@ def test_get_tokenizer_fail():
         tokenizer_factory = TokenizerFactory()
         config = TokenizerConfig()
         tokenizer_factory.get_tokenizer("SomeRandomString", config)
+
+
+def test_get_cached_tokenizer(config_dict):
+    factory = TokenizerFactory()
+    factory.cache.clear()
+
+    first = factory.get_cached_tokenizer(ConfigModel(**config_dict))
+    # fields that do not reach the TokenizerConfig share the cached instance
+    second = factory.get_cached_tokenizer(ConfigModel(**{**config_dict, "program_changes": True}))
+    assert first is second
+
+    other = factory.get_cached_tokenizer(ConfigModel(**{**config_dict, "use_chords": False}))
+    assert other is not first
+
+    stats = factory.cache.stats()
+    assert (stats.hits, stats.misses) == (1, 2)
+
+
+def test_tokenizer_cache_key_depends_on_tokenizer(config_dict):
+    remi_key = tokenizer_cache_key(ConfigModel(**config_dict))
+    tsd_key = tokenizer_cache_key(ConfigModel(**{**config_dict, "tokenizer": "TSD"}))
+    assert remi_key != tsd_key
@@ -0,0 +1,77 @@
+import asyncio
+import io
+import json
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+
+from core.api import uploads
+from core.api.api import app
+from core.api.uploads import InvalidMidiError, UploadTooLargeError, read_midi_upload, read_upload
+from core.constants import EXAMPLE_MIDI_FILE_PATH
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def midi_bytes() -> bytes:
+    with open(EXAMPLE_MIDI_FILE_PATH, "rb") as f:
+        return f.read()
+
+
+def _upload(data: bytes, declare_size: bool = True) -> UploadFile:
+    return UploadFile(io.BytesIO(data), size=len(data) if declare_size else None)
+
+
+def test_read_midi_upload(monkeypatch, midi_bytes):
+    monkeypatch.setattr(uploads, "UPLOAD_CHUNK_SIZE", 100)
+    assert asyncio.run(read_midi_upload(_upload(midi_bytes))) == midi_bytes
+
+
+def test_read_upload_stops_past_limit():
+    # the size is not known ahead, so the limit is only crossed while reading
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(read_upload(_upload(b"x" * 100, declare_size=False), 99))
+    assert asyncio.run(read_upload(_upload(b"x" * 100, declare_size=False), 100)) == b"x" * 100
+
+
+def test_read_upload_rejects_declared_size():
+    file = _upload(b"x" * 100)
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(read_upload(file, 99))
+    # nothing was read
+    assert file.file.tell() == 0
+
+
+@pytest.mark.parametrize(
+    "data", [b"", b"MThd", b"RIFF\x00\x00\x00\x00RMIDdata", b"MThd\x00\x00\x00\x02\x00\x00\x00\x01\x00\x60"]
+)
+def test_read_midi_upload_rejects_invalid_header(data):
+    with pytest.raises(InvalidMidiError):
+        asyncio.run(read_midi_upload(_upload(data)))
+
+
+def test_process_rejects_invalid_midi(config_dict):
+    response = client.post(
+        "/process",
+        files={"file": ("a.mid", b"not a midi file", "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"success": False, "data": None, "error": "Not a MIDI file"}
+
+
+@pytest.mark.parametrize("path", ["/process", "/process/stream", "/sessions", "/tiles"])
+def test_endpoints_reject_large_uploads(monkeypatch, config_dict, midi_bytes, path):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_BYTES", len(midi_bytes) - 1)
+
+    response = client.post(
+        path,
+        files={"file": ("example.mid", midi_bytes, "audio/midi")},
+        data={"config": json.dumps(config_dict)},
+    )
+
+    assert response.status_code == 413
+    assert response.json()["error"] == f"Uploads are limited to {len(midi_bytes) - 1} bytes"